@@ -1,5 +1,7 @@
 from celery import Celery
+from celery.signals import worker_process_shutdown
 from app.config import settings
+from app.utils.metrics import mark_process_dead
 
 class TaskRouter:
     def route_for_task(self, task_name, args=None, kwargs=None):
@@ -85,6 +87,11 @@ celery_app.conf.update(
     result_backend_transport='redis',
 )
 
+@worker_process_shutdown.connect
+def _mark_metrics_process_dead(pid=None, **kwargs):
+    """worker 子进程退出（包括达到 max-tasks-per-child 后被替换）时清理其指标文件"""
+    mark_process_dead(pid)
+
 # 自动发现任务
 celery_app.autodiscover_tasks(['app'])
 __all__ = ['celery_app', 'broker_url', 'result_backend']
@@ -21,12 +21,23 @@ class Settings(BaseSettings):
     SCENE_DETECTION_API_PORT: int = 5000  # 场景分割服务端口
     AUDIO_SEPARATION_API_PORT: int = 5001  # 音频分离服务端口
     AUDIO_TRANSCRIPTION_API_PORT: int = 5002  # 语音转写服务端口
+    TRANSCRIPTION_USE_PCM: bool = True  # 音频分离同时输出 16kHz PCM，转写服务直接读取而不再解码
+    TRANSCRIPTION_SUBTITLE_FORMATS: str = "srt,vtt,json"  # 转写服务导出并上传的字幕格式，逗号分隔，为空时不导出
+    TRANSCRIPTION_TOKEN_TIMESTAMPS: bool = False  # 转写分段中是否包含 token 级时间戳，只支持 ASR_ENGINE=torch，onnx 引擎会拒绝该请求
 
     # API超时配置（单位：秒）
     SCENE_DETECTION_TIMEOUT: int = 1800  # 场景分割超时时间
     AUDIO_SEPARATION_TIMEOUT: int = 1800  # 音频分离超时时间
     AUDIO_TRANSCRIPTION_TIMEOUT: int = 1800  # 语音转写超时时间
 
+    # 媒体服务就绪检查配置
+    SERVICE_READY_TIMEOUT: float = 600  # 调用服务前等待其 /readyz 就绪的最长时间（秒），超时后任务失败
+    SERVICE_READY_POLL_INTERVAL: float = 2  # 轮询 /readyz 的间隔（秒）
+    SERVICE_READY_CACHE_TTL: float = 30  # 就绪结果的缓存时间（秒），期间不再重复检查
+    SERVICE_RETRY_MAX_ATTEMPTS: int = 3  # 服务返回 429、503 等可重试状态时最多重试的次数，用完后任务失败
+    SERVICE_RETRY_DELAY: float = 10  # 响应没有 Retry-After 时的重试等待时间（秒）
+    SERVICE_RETRY_MAX_DELAY: float = 300  # 单次重试的最长等待时间（秒），Retry-After 更大时按此值等待
+
     # 文件存储路径配置
     DATA_DIR: str  # 数据根目录
     UPLOAD_DIR: str  # 上传文件存储目录
@@ -40,6 +51,13 @@ class Settings(BaseSettings):
     MAX_VIDEO_SIZE: int  # 最大视频文件大小（字节）
     ALLOWED_VIDEO_TYPES: Set[str]  # 允许的视频文件类型集合
 
+    # 视频URL探测配置
+    VIDEO_PROBE_CONNECT_TIMEOUT: float = 3  # 连接超时（秒）
+    VIDEO_PROBE_READ_TIMEOUT: float = 5  # 读取超时（秒）
+    VIDEO_PROBE_CACHE_TTL: float = 60  # 探测结果缓存时间（秒）
+    VIDEO_PROBE_CACHE_SIZE: int = 1024  # 探测结果缓存条数
+    VIDEO_PROBE_MAX_CONNECTIONS: int = 100  # 连接池最大连接数
+
     # MySQL配置
     MYSQL_HOST: str  # MySQL主机地址
     MYSQL_PORT: int  # MySQL端口
@@ -52,6 +70,8 @@ class Settings(BaseSettings):
     REDIS_HOST: str  # Redis主机地址
     REDIS_PORT: int  # Redis端口
     REDIS_PASSWORD: str  # Redis密码
+    BROKER_HEALTH_CHECK_INTERVAL: float = 5  # broker 健康检查间隔（秒）
+    BROKER_HEALTH_STALE_AFTER: float = 15  # broker 检查结果有效期（秒），超时视为不可用
 
     # 火山引擎配置
     VOLC_AK: str  # 火山引擎访问密钥ID
@@ -72,6 +92,15 @@ class Settings(BaseSettings):
     LOG_FILE_PREFIX: str  # 日志文件名前缀
     LOG_FILE_MAX_BYTES: int  # 单个日志文件最大大小
     LOG_FILE_BACKUP_COUNT: int  # 日志文件备份数量
+    LOG_LEVELS: str = ""  # 按模块设置日志级别，如 "celery_tasks=DEBUG,video_tasks=WARNING"，未设置的模块使用 LOG_LEVEL
+    LOG_QUEUE_SIZE: int = 10000  # 日志队列容量，队列满时丢弃新日志而不阻塞调用方
+    LOG_FIELD_MAX_LENGTH: int = 2048  # 结构化日志中单个字段的最大长度，超出部分截断
+
+    # 链路追踪配置
+    TRACING_EXPORTER: str = "none"  # 追踪数据导出方式：none（关闭）/ otlp / file
+    TRACING_SERVICE_NAME: str = "media-symphony"  # 上报的服务名称
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"  # OTLP HTTP 接收地址
+    TRACING_FILE_PATH: str = "log/traces.jsonl"  # file 导出方式的输出文件，每行一个 span
 
     class Config:
         """配置类设置
@@ -2,10 +2,14 @@ from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from app.config import settings
 from app.routers import video_tasks
 from app.utils.logger import Logger
+from app.utils.celery_check import broker_monitor
+from app.utils.video_probe import video_probe
+from app.utils.metrics import HTTP_REQUESTS_TOTAL, HTTP_REQUEST_DURATION, render_metrics
+import time
 import logging
 from typing import Any
 from typing import List
@@ -18,6 +22,19 @@ app = FastAPI(
     debug=settings.DEBUG,  # 设置调试模式
 )
 
+# 应用启动时开始后台检查 broker 状态
+@app.on_event("startup")
+async def start_broker_monitor():
+    broker_monitor.start()
+
+
+# 应用关闭时停止后台检查并释放连接池
+@app.on_event("shutdown")
+async def stop_broker_monitor():
+    broker_monitor.stop()
+    await video_probe.aclose()
+
+
 # 配置 uvicorn 访问日志级别
 logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
 
@@ -68,11 +85,36 @@ app.include_router(
     tags=["视频处理任务"],  # 设置API文档标签
 )
 
+class MetricsMiddleware(BaseHTTPMiddleware):
+    """记录请求数量和耗时
+
+    path 标签使用路由模板（如 /api/v1/video-tasks/{task_id}），避免标签基数随参数膨胀。
+    """
+
+    async def dispatch(self, request: Request, call_next):
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            route = request.scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            HTTP_REQUESTS_TOTAL.labels(request.method, path, status).inc()
+            HTTP_REQUEST_DURATION.labels(request.method, path).observe(
+                time.perf_counter() - start
+            )
+
+
 app.add_middleware(
     AuthMiddleware,
-    exclude_paths=[]  # 排除 Swagger 文档路径
+    exclude_paths=["/metrics"]  # 排除 Prometheus 指标路径
 )
 
+# 指标中间件放在最外层，鉴权失败的请求也会被统计
+app.add_middleware(MetricsMiddleware)
+
 # 参数验证异常处理
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -212,3 +254,15 @@ async def root():
         dict: 包含欢迎信息的字典
     """
     return {"message": f"Welcome to {settings.APP_NAME}!"}
+
+
+# Prometheus 指标
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """输出 Prometheus 指标
+
+    Returns:
+        Response: Prometheus 文本格式的指标
+    """
+    content, content_type = render_metrics(broker_monitor.client)
+    return Response(content=content, media_type=content_type)
@@ -1,5 +1,6 @@
 from app.utils.celery_check import check_celery_connection
 from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, constr, validator
 from typing import Optional, Dict, Any
 from enum import Enum
@@ -16,6 +17,8 @@ from app.utils.logger import Logger
 from app.services.mysql.video_tasks_db import VideoTasksDB
 from app.tasks import process_video
 from app.utils.tos_client import TOSClient
+from app.utils.video_probe import video_probe
+from app.utils.tracing import start_span, inject_headers
 
 router = APIRouter()
 logger = Logger("video_tasks")
@@ -23,6 +26,9 @@ logger = Logger("video_tasks")
 # 初始化数据库连接
 tasks_db = VideoTasksDB()
 
+# 上传文件分块读取大小（字节）
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
 
 class TaskStatus(str, Enum):
     """任务状态枚举类
@@ -93,47 +99,46 @@ async def validate_video_size_and_type(video_url: str, task_id: str) -> None:
     ALLOWED_VIDEO_TYPES = settings.ALLOWED_VIDEO_TYPES
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.head(video_url)
-            content_length = int(response.headers.get("content-length", 0))
-            content_type = response.headers.get("content-type", "").lower()
-
-            # 验证文件大小
-            if content_length > settings.MAX_VIDEO_SIZE:
-                logger.warning(
-                    "视频文件大小超过限制",
-                    {
-                        "content_length": content_length,
-                        "max_size": settings.MAX_VIDEO_SIZE,
-                        "task_id": task_id,
-                    },
-                )
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"视频文件大小超过限制：{content_length} > {settings.MAX_VIDEO_SIZE} 字节",
-                )
-
-            # 验证文件类型
-            if not any(
-                video_type in content_type for video_type in ALLOWED_VIDEO_TYPES
-            ):
-                logger.warning(
-                    "不支持的视频文件类型",
-                    {"content_type": content_type, "task_id": task_id},
-                )
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"不支持的视频文件类型,支持的类型：MP4, AVI, MOV, MKV, WebM",
-                )
-
-            logger.info(
-                "视频验证通过",
+        probe_result = await video_probe.probe(video_url)
+        content_length = probe_result.content_length
+        content_type = probe_result.content_type
+
+        # 验证文件大小
+        if content_length > settings.MAX_VIDEO_SIZE:
+            logger.warning(
+                "视频文件大小超过限制",
                 {
-                    "task_id": task_id,
                     "content_length": content_length,
-                    "content_type": content_type,
+                    "max_size": settings.MAX_VIDEO_SIZE,
+                    "task_id": task_id,
                 },
             )
+            raise HTTPException(
+                status_code=400,
+                detail=f"视频文件大小超过限制：{content_length} > {settings.MAX_VIDEO_SIZE} 字节",
+            )
+
+        # 验证文件类型
+        if not any(
+            video_type in content_type for video_type in ALLOWED_VIDEO_TYPES
+        ):
+            logger.warning(
+                "不支持的视频文件类型",
+                {"content_type": content_type, "task_id": task_id},
+            )
+            raise HTTPException(
+                status_code=400,
+                detail=f"不支持的视频文件类型,支持的类型：MP4, AVI, MOV, MKV, WebM",
+            )
+
+        logger.info(
+            "视频验证通过",
+            {
+                "task_id": task_id,
+                "content_length": content_length,
+                "content_type": content_type,
+            },
+        )
     except httpx.RequestError as e:
         logger.error("视频URL访问失败", {"task_id": task_id, "error": str(e)})
         raise HTTPException(status_code=400, detail="视频URL访问失败")
@@ -194,15 +199,17 @@ async def create_task(request: CreateTaskRequest):
             "error": None,
         }
 
-        # 启动异步任务
-        process_video.apply_async(
-            kwargs={
-                'task_id': task_id,
-                'video_url': request.video_url,
-                'uid': request.uid,
-                'video_split_audio_mode': request.video_split_audio_mode
-            }
-        )
+        # 启动异步任务，追踪上下文随消息头传递给 worker
+        with start_span("create_task", {"task_id": task_id, "uid": request.uid}):
+            process_video.apply_async(
+                kwargs={
+                    'task_id': task_id,
+                    'video_url': request.video_url,
+                    'uid': request.uid,
+                    'video_split_audio_mode': request.video_split_audio_mode
+                },
+                headers=inject_headers(),
+            )
 
         logger.log_response(200, "/api/v1/video-tasks/create", {"task_id": task_id})
         return TaskResponse(**task)
@@ -292,24 +299,28 @@ async def upload_video(file: UploadFile = File(...), uid: str = None):
     )
 
     try:
-        # 验证文件大小
-        content = await file.read()
-        file_size = len(content)
-        if file_size > settings.MAX_VIDEO_SIZE:
-            raise HTTPException(
-                status_code=400,
-                detail=f"视频文件大小超过限制：{file_size} > {settings.MAX_VIDEO_SIZE} 字节",
-            )
-
-        # 保存文件到临时目录
+        # 分块保存文件到临时目录，边写入边校验文件大小，避免整个文件读入内存
         video_path = f"data/download/{task_id}.mp4"
+        os.makedirs(os.path.dirname(video_path), exist_ok=True)
+        file_size = 0
         async with aiofiles.open(video_path, "wb") as out_file:
-            await out_file.write(content)
-
-        # 上传文件到TOS
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                file_size += len(chunk)
+                if file_size > settings.MAX_VIDEO_SIZE:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"视频文件大小超过限制：> {settings.MAX_VIDEO_SIZE} 字节",
+                    )
+                await out_file.write(chunk)
+
+        # 上传文件到TOS，阻塞的上传操作放到线程池中执行（大文件自动使用分片上传）
         tos_client = TOSClient()
         object_key = f"videos/{task_id}/{file.filename}"
-        upload_result = tos_client.upload_file(
+        upload_result = await run_in_threadpool(
+            tos_client.upload_file,
             local_file_path=video_path,
             object_key=object_key,
             metadata={"uid": uid} if uid else None,
@@ -407,6 +418,10 @@ def format_task_result(task: dict) -> dict:
     # 获取封面列表
     cover_list = task_result.get("cover_list", {}).get("output", [])
     cover_dict = {str(i+1): item for i, item in enumerate(cover_list)}
+
+    # 获取各场景的转写文本，与非静音场景一一对应
+    scene_texts = task_result.get("scene_texts", {}).get("output") or []
+    scene_text_dict = {str(i+1): text for i, text in enumerate(scene_texts)}
     
     # 获取静音和非静音视频
     mute_videos = {
@@ -430,7 +445,8 @@ def format_task_result(task: dict) -> dict:
             "mute_video_url": mute_video.get("key", ""),
             "un_mute_video_url": unmute_video.get("key", ""),
             "cover_url": cover_info.get("key", ""),
-            "meta_data": cover_info.get("meta_data", {})
+            "meta_data": cover_info.get("meta_data", {}),
+            "text": scene_text_dict.get(index, "")
         }
         formatted_result["result"]["video_list"].append(video_pair)
     
@@ -0,0 +1,112 @@
+"""分离前的音频预分析
+
+以 16kHz 单声道解码音频，逐帧计算能量、过零率和频谱平坦度，再按 1 秒窗口汇总
+语音/音乐的区分特征，据此决定处理路径：
+- skip: 静音，不需要分离和转写
+- bypass: 干净的人声（以说话为主，没有明显的背景音乐或噪声），直接使用原始音频
+- separate: 其余情况，执行人声分离
+
+使用的特征：
+- low_energy_ratio: 窗口内能量低于窗口平均能量一半的帧占比。语音有音节间的停顿，
+  该值明显高于持续发声的音乐
+- hzcrr: 窗口内过零率高于窗口平均值 1.5 倍的帧占比。语音清音和浊音交替，该值较高
+- flatness: 有声帧的平均频谱平坦度，越接近 1 越像噪声，用于排除噪声较大的录音
+"""
+
+from typing import Dict, Optional
+import numpy as np
+from config import settings
+
+# 分析使用的采样率和帧长（32ms）
+ANALYSIS_SAMPLE_RATE = 16000
+FRAME_SIZE = 512
+# 汇总特征的窗口长度（帧），约 1 秒
+WINDOW_FRAMES = ANALYSIS_SAMPLE_RATE // FRAME_SIZE
+
+_EPS = 1e-10
+_HANN = np.hanning(FRAME_SIZE).astype(np.float32)
+
+
+class FeatureAccumulator:
+    """逐块累积帧级特征，内存占用只与帧数有关"""
+
+    def __init__(self):
+        self._rms = []
+        self._zcr = []
+        self._flatness = []
+        self._sum_squares = 0.0
+        self.samples = 0
+
+    def add(self, samples: np.ndarray):
+        """加入一段单声道采样，长度不足一帧的尾部会被丢弃"""
+        frames = samples[:len(samples) // FRAME_SIZE * FRAME_SIZE].reshape(-1, FRAME_SIZE)
+        if len(frames) == 0:
+            return
+        squares = np.square(frames, dtype=np.float64)
+        self._sum_squares += float(squares.sum())
+        self.samples += frames.size
+
+        self._rms.append(np.sqrt(squares.mean(axis=1)))
+        signs = np.signbit(frames)
+        self._zcr.append((signs[:, 1:] != signs[:, :-1]).mean(axis=1))
+        power = np.square(np.abs(np.fft.rfft(frames * _HANN, axis=1))) + _EPS
+        self._flatness.append(np.exp(np.log(power).mean(axis=1)) / power.mean(axis=1))
+
+    def summarize(self) -> Dict[str, float]:
+        """汇总为整段音频的特征"""
+        if not self._rms:
+            return {
+                "rms_dbfs": -120.0,
+                "active_ratio": 0.0,
+                "low_energy_ratio": 0.0,
+                "hzcrr": 0.0,
+                "flatness": 0.0,
+            }
+        rms = np.concatenate(self._rms)
+        zcr = np.concatenate(self._zcr)
+        flatness = np.concatenate(self._flatness)
+
+        active = 20 * np.log10(rms + _EPS) > settings.ANALYSIS_SILENCE_DBFS
+        features = {
+            "rms_dbfs": 10 * np.log10(self._sum_squares / self.samples + _EPS),
+            "active_ratio": active.mean(),
+            "flatness": flatness[active].mean() if active.any() else 0.0,
+            "low_energy_ratio": 0.0,
+            "hzcrr": 0.0,
+        }
+
+        # 按 1 秒窗口统计，只使用包含有声帧的窗口
+        windows = len(rms) // WINDOW_FRAMES
+        if windows > 0:
+            size = windows * WINDOW_FRAMES
+            rms_windows = rms[:size].reshape(windows, WINDOW_FRAMES)
+            zcr_windows = zcr[:size].reshape(windows, WINDOW_FRAMES)
+            voiced = active[:size].reshape(windows, WINDOW_FRAMES).any(axis=1)
+            if voiced.any():
+                rms_windows = rms_windows[voiced]
+                zcr_windows = zcr_windows[voiced]
+                low_energy = rms_windows < 0.5 * rms_windows.mean(axis=1, keepdims=True)
+                high_zcr = zcr_windows > 1.5 * zcr_windows.mean(axis=1, keepdims=True)
+                features["low_energy_ratio"] = low_energy.mean()
+                features["hzcrr"] = high_zcr.mean()
+
+        return {key: round(float(value), 4) for key, value in features.items()}
+
+
+def decide_route(features: Dict[str, float]) -> Dict[str, Optional[str]]:
+    """根据特征决定处理路径
+
+    Args:
+        features: FeatureAccumulator.summarize 的结果
+
+    Returns:
+        dict: route（skip / bypass / separate）和 reason
+    """
+    if (features["rms_dbfs"] <= settings.ANALYSIS_SILENCE_DBFS
+            or features["active_ratio"] < settings.ANALYSIS_MIN_ACTIVE_RATIO):
+        return {"route": "skip", "reason": "silence"}
+    if (features["low_energy_ratio"] >= settings.ANALYSIS_SPEECH_LOW_ENERGY_RATIO
+            and features["hzcrr"] >= settings.ANALYSIS_SPEECH_HZCRR
+            and features["flatness"] <= settings.ANALYSIS_SPEECH_MAX_FLATNESS):
+        return {"route": "bypass", "reason": "speech"}
+    return {"route": "separate", "reason": "music_or_noise"}
@@ -17,5 +17,43 @@ class Settings:
     ALLOWED_EXTENSIONS = {'.mp3', '.wav', '.flac', '.m4a', '.ogg'}
     # 服务运行端口,确保端口是整数
     PORT = int(os.getenv("PORT", 5001))
+    # 启动时是否用合成音频预热模型
+    WARMUP_ON_START = os.getenv("WARMUP_ON_START", "true").lower() == "true"
+    # 模型加载或预热失败后首次重试的等待时间（秒），之后每次翻倍
+    MODEL_LOAD_RETRY_SECONDS = float(os.getenv("MODEL_LOAD_RETRY_SECONDS", 5))
+    # 模型加载重试的最长等待时间（秒）
+    MODEL_LOAD_RETRY_MAX_SECONDS = float(os.getenv("MODEL_LOAD_RETRY_MAX_SECONDS", 300))
+    # 分块分离的窗口长度（秒）
+    CHUNK_SECONDS = float(os.getenv("CHUNK_SECONDS", 60))
+    # 相邻窗口的重叠长度（秒），重叠部分做线性交叉淡化拼接
+    CHUNK_OVERLAP_SECONDS = float(os.getenv("CHUNK_OVERLAP_SECONDS", 2))
+    # 音频时长超过该值（秒）时自动使用分块分离
+    CHUNK_THRESHOLD_SECONDS = float(os.getenv("CHUNK_THRESHOLD_SECONDS", 600))
+    # 分离前是否做预分析，静音跳过、干净人声直接使用原始音频
+    ANALYSIS_ENABLED = os.getenv("ANALYSIS_ENABLED", "true").lower() == "true"
+    # 低于该电平（dBFS）的帧视为静音
+    ANALYSIS_SILENCE_DBFS = float(os.getenv("ANALYSIS_SILENCE_DBFS", -50))
+    # 有声帧占比低于该值时视为静音
+    ANALYSIS_MIN_ACTIVE_RATIO = float(os.getenv("ANALYSIS_MIN_ACTIVE_RATIO", 0.01))
+    # 低能量帧占比不低于该值时才可能判定为纯人声
+    ANALYSIS_SPEECH_LOW_ENERGY_RATIO = float(os.getenv("ANALYSIS_SPEECH_LOW_ENERGY_RATIO", 0.3))
+    # 高过零率帧占比不低于该值时才可能判定为纯人声
+    ANALYSIS_SPEECH_HZCRR = float(os.getenv("ANALYSIS_SPEECH_HZCRR", 0.1))
+    # 频谱平坦度超过该值视为噪声较大，仍需分离
+    ANALYSIS_SPEECH_MAX_FLATNESS = float(os.getenv("ANALYSIS_SPEECH_MAX_FLATNESS", 0.3))
+    # 分离任务工作线程数，0 表示按设备自动确定
+    WORKERS = int(os.getenv("WORKERS", 0))
+    # 等待队列长度，排队任务超过该值时返回 429
+    MAX_QUEUE = int(os.getenv("MAX_QUEUE", 8))
+    # 已完成任务的结果保留时间（秒）
+    JOB_TTL_SECONDS = float(os.getenv("JOB_TTL_SECONDS", 3600))
+    # 链路追踪导出方式：none（关闭）/ otlp / file
+    TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none")
+    # 上报的服务名称
+    TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "audio-separation")
+    # OTLP HTTP 接收地址
+    TRACING_OTLP_ENDPOINT = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    # file 导出方式的输出文件，每行一个 span
+    TRACING_FILE_PATH = os.getenv("TRACING_FILE_PATH", "log/traces.jsonl")
 
 settings = Settings()
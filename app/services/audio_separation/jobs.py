@@ -0,0 +1,160 @@
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+import logger
+from metrics import SEPARATION_JOBS_PENDING, SEPARATION_JOBS_REJECTED_TOTAL
+
+new_logger = logger.CustomLogger()
+
+
+class QueueFullError(Exception):
+    """等待队列已满，调用方应在 retry_after 秒后重试"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"分离任务队列已满，请在 {retry_after} 秒后重试")
+        self.retry_after = retry_after
+
+
+class Job:
+    """一次分离任务的执行状态"""
+
+    def __init__(self, job_id: str, future: Future):
+        self.job_id = job_id
+        self.future = future
+        self.status = "queued"  # queued / running / success / error
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "job_id": self.job_id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+        if self.started_at is not None:
+            data["queued_seconds"] = round(self.started_at - self.created_at, 3)
+        if self.finished_at is not None and self.started_at is not None:
+            data["run_seconds"] = round(self.finished_at - self.started_at, 3)
+        return data
+
+
+def default_worker_count() -> int:
+    """根据设备确定工作线程数
+
+    模型推理本身由处理器内部的锁串行化，GPU 上用两个线程让一个任务推理时
+    另一个任务可以同时做解码、探测和写文件；CPU 推理会占满核心，只用一个线程。
+    """
+    try:
+        import onnxruntime
+
+        if "CUDAExecutionProvider" in onnxruntime.get_available_providers():
+            return 2
+    except Exception:
+        pass
+    try:
+        import torch
+
+        if torch.cuda.is_available():
+            return 2
+    except Exception:
+        pass
+    return 1
+
+
+class JobManager:
+    """有界的分离任务执行器
+
+    任务在固定大小的线程池中执行，不占用事件循环；排队和执行中的任务总数超过
+    workers + max_queue 时拒绝新任务并给出建议的重试时间。已完成的任务保留 job_ttl 秒供查询。
+    """
+
+    def __init__(self, workers: int, max_queue: int, job_ttl: float):
+        self.workers = workers
+        self.capacity = workers + max_queue
+        self.job_ttl = job_ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="separation")
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+        self._pending = 0
+        # 最近任务执行耗时的指数移动平均，用于估算 Retry-After
+        self._avg_run_seconds = 60.0
+
+    def _retry_after(self) -> int:
+        waves = (self._pending - self.workers) // self.workers + 1
+        return max(1, int(self._avg_run_seconds * waves))
+
+    def _cleanup(self):
+        """清理超过保留时间的已完成任务（调用方需持有锁）"""
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.job_ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def submit(self, fn: Callable[[], Any]) -> Job:
+        """提交任务
+
+        Args:
+            fn: 在工作线程中执行的无参函数，返回值即任务结果
+
+        Returns:
+            Job: 任务对象，可通过 job.future 等待结果
+
+        Raises:
+            QueueFullError: 队列已满时抛出
+        """
+        with self._lock:
+            self._cleanup()
+            if self._pending >= self.capacity:
+                SEPARATION_JOBS_REJECTED_TOTAL.inc()
+                raise QueueFullError(self._retry_after())
+            self._pending += 1
+            SEPARATION_JOBS_PENDING.set(self._pending)
+
+            job_id = uuid.uuid4().hex
+            future: Future = Future()
+            job = Job(job_id, future)
+            self._jobs[job_id] = job
+
+        def run():
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                job.result = fn()
+                job.status = "success"
+                future.set_result(job.result)
+            except Exception as e:
+                job.status = "error"
+                job.error = str(e)
+                new_logger.error(f"分离任务执行失败 - job_id: {job_id}, error: {str(e)}")
+                future.set_exception(e)
+            finally:
+                job.finished_at = time.time()
+                with self._lock:
+                    self._pending -= 1
+                    SEPARATION_JOBS_PENDING.set(self._pending)
+                    run_seconds = job.finished_at - job.started_at
+                    self._avg_run_seconds = 0.8 * self._avg_run_seconds + 0.2 * run_seconds
+
+        self._executor.submit(run)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """查询任务，不存在或已过期时返回 None"""
+        with self._lock:
+            self._cleanup()
+            return self._jobs.get(job_id)
+
+    def shutdown(self):
+        """停止接收新任务并等待已提交的任务完成"""
+        self._executor.shutdown(wait=True)
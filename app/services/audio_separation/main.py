@@ -2,7 +2,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import os
-from routes import router
+from routes import router, job_manager
 from config import settings
 
 # 初始化 fastapi
@@ -20,6 +20,11 @@ app.add_middleware(
 # 引用路由
 app.include_router(router)
 
+# 服务关闭时等待已提交的分离任务完成
+@app.on_event("shutdown")
+def shutdown_job_manager():
+    job_manager.shutdown()
+
 # 确保目录存在
 dirs_to_check = [
     settings.MODEL_DIR,
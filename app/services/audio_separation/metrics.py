@@ -0,0 +1,49 @@
+"""音频分离服务的 Prometheus 指标"""
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# 分离请求总数
+SEPARATION_REQUESTS_TOTAL = Counter(
+    "audio_separation_requests_total",
+    "音频分离请求总数",
+    ["status"],
+)
+
+# 模型推理耗时
+SEPARATION_INFERENCE_SECONDS = Histogram(
+    "audio_separation_inference_seconds",
+    "音频分离模型推理耗时（秒）",
+    buckets=(1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600, 1200),
+)
+
+# 实时率：推理耗时 / 音频时长，小于 1 表示快于实时
+SEPARATION_REALTIME_FACTOR = Histogram(
+    "audio_separation_realtime_factor",
+    "音频分离实时率（推理耗时 / 音频时长）",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5),
+)
+
+# ffmpeg 备选方案的使用次数
+SEPARATION_FALLBACK_TOTAL = Counter(
+    "audio_separation_ffmpeg_fallback_total",
+    "音频分离失败后使用 ffmpeg 提取原始音频的次数",
+)
+
+# 预分析选择的处理路径：skip / bypass / separate / fallback
+SEPARATION_ROUTE_TOTAL = Counter(
+    "audio_separation_route_total",
+    "按处理路径统计的音频分离请求数",
+    ["route"],
+)
+
+# 排队和执行中的分离任务数
+SEPARATION_JOBS_PENDING = Gauge(
+    "audio_separation_jobs_pending",
+    "排队和执行中的音频分离任务数",
+)
+
+# 因队列已满被拒绝的任务数
+SEPARATION_JOBS_REJECTED_TOTAL = Counter(
+    "audio_separation_jobs_rejected_total",
+    "因队列已满被拒绝的音频分离任务数",
+)
@@ -3,101 +3,479 @@ from audio_separator.separator import Separator
 import os
 import subprocess
 import shutil
+import tempfile
+import threading
+import time
+import numpy as np
+import soundfile as sf
 import logger
+from tracing import start_span
+from analysis import ANALYSIS_SAMPLE_RATE, FeatureAccumulator, decide_route
+from media_info import resolve_media_info
+from metrics import (
+    SEPARATION_INFERENCE_SECONDS,
+    SEPARATION_REALTIME_FACTOR,
+    SEPARATION_FALLBACK_TOTAL,
+)
 
 new_logger = logger.CustomLogger()
 
+# 分块分离时解码和输出使用的采样率（与分离模型一致）
+CHUNK_SAMPLE_RATE = 44100
+# 输出给转写服务的 PCM 采样率（与转写模型一致）
+PCM_SAMPLE_RATE = 16000
+
 class AudioSeparatorProcessor:
     def __init__(self):
-        self.separator = Separator(
-            output_single_stem="Vocals",
-            model_file_dir=settings.MODEL_DIR
-        )
+        # Separator 的输出目录是实例状态，同一时间只允许一个请求使用
+        self._lock = threading.Lock()
+        self.separator = None
+
         # 检查ffmpeg是否可用
         self.ffmpeg_available = self._check_ffmpeg_available()
         if not self.ffmpeg_available:
             new_logger.warning("ffmpeg不可用，备选方案将无法使用")
 
-    def _check_audio_stream(self, file_path):
+        # 模型加载并预热完成后设置，/readyz 据此判断服务是否就绪
+        self._ready = threading.Event()
+        # 最近一次加载或预热失败的原因，就绪检查接口返回给调用方
+        self.load_error = None
+
+        # 启动时在后台线程加载模型并预热，服务先开始监听，后续请求复用同一个模型实例
+        threading.Thread(target=self._prepare, name="model-warmup", daemon=True).start()
+
+    @property
+    def ready(self) -> bool:
+        """模型是否已加载并预热"""
+        return self._ready.is_set()
+
+    def _prepare(self):
+        """加载模型并预热，成功后标记为就绪
+
+        失败时记录原因并按指数退避在本线程中重试，直到成功；模型已加载、只是预热失败时只重试预热。
+        调用方在服务就绪前不会发送请求，重试不能依赖请求触发。
+        """
+        delay = settings.MODEL_LOAD_RETRY_SECONDS
+        while True:
+            try:
+                with self._lock:
+                    self._ensure_model()
+                if settings.WARMUP_ON_START:
+                    self._warm_up()
+                break
+            except Exception as e:
+                self.load_error = str(e)
+                new_logger.error(f"模型加载或预热失败，{delay:.0f} 秒后重试: {str(e)}")
+                time.sleep(delay)
+                delay = min(delay * 2, settings.MODEL_LOAD_RETRY_MAX_SECONDS)
+        self.load_error = None
+        self._ready.set()
+
+    def _ensure_model(self):
+        """加载模型，已加载时直接返回（调用方需持有锁）"""
+        if self.separator is not None:
+            return
+        with start_span("audio_separation.load_model", {"model": settings.MODEL_FILENAME}):
+            separator = Separator(
+                output_single_stem="Vocals",
+                model_file_dir=settings.MODEL_DIR,
+                output_dir=settings.OUTPUT_DIR
+            )
+            new_logger.info(f"加载模型: {settings.MODEL_FILENAME}")
+            start_time = time.perf_counter()
+            separator.load_model(model_filename=settings.MODEL_FILENAME)
+            new_logger.info(f"模型加载完成，耗时: {time.perf_counter() - start_time:.2f}s")
+        self.separator = separator
+
+    def _set_output_dir(self, output_path: str):
+        """切换本次请求的输出目录（调用方需持有锁）"""
+        self.separator.output_dir = output_path
+        if self.separator.model_instance is not None:
+            self.separator.model_instance.output_dir = output_path
+
+    def _warm_up(self):
+        """用一段合成音频执行一次推理，提前完成推理会话和显存的初始化"""
+        start_time = time.perf_counter()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            warmup_path = os.path.join(temp_dir, "warmup.wav")
+            sample_rate = 44100
+            t = np.arange(sample_rate * 2) / sample_rate
+            tone = 0.1 * np.sin(2 * np.pi * 440 * t).astype(np.float32)
+            sf.write(warmup_path, np.stack([tone, tone], axis=1), sample_rate)
+            with self._lock:
+                self._set_output_dir(temp_dir)
+                self.separator.separate(warmup_path, {"Vocals": "warmup_vocals"})
+        new_logger.info(f"模型预热完成，耗时: {time.perf_counter() - start_time:.2f}s")
+
+    def _check_audio_stream(self, file_path, media_info=None):
         """
-        检查文件是否包含音频流
+        检查文件是否包含音频流，并获取文件时长
+
+        优先使用请求中传入的媒体信息，文件已变化或未传入时用一次 ffprobe 调用探测
         
         Args:
             file_path: 输入文件路径
+            media_info: 上游探测得到的媒体信息
             
         Returns:
-            bool: 是否包含音频流
+            tuple: (是否包含音频流, 文件时长（秒），获取失败时为 0)
         """
         try:
-            # 使用 ffprobe 专门检查音频流
-            cmd = [
-                "/usr/bin/ffprobe",
-                "-v", "error",
-                "-select_streams", "a",  # 只选择音频流
-                "-show_entries", "stream=codec_type",
-                "-of", "csv=p=0",
-                file_path
-            ]
-            
-            result = subprocess.run(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                check=False
-            )
-        
-            # 如果输出中包含 "audio"，则表示有音频流
-            return "audio" in result.stdout.lower()
+            info = resolve_media_info(file_path, media_info)
+            return info["has_audio"], info["duration"]
         except Exception as e:
             new_logger.warning(f"检查音频流时出错: {str(e)}")
-            return False
+            return False, 0.0
+
+    def _analyze_audio(self, file_path):
+        """
+        预分析音频，决定是否需要分离
+
+        以 16kHz 单声道通过 ffmpeg 管道分块解码，解码和特征计算同时进行，
+        耗时远小于分离本身。
+
+        Args:
+            file_path: 输入文件路径
+
+        Returns:
+            dict: route（skip / bypass / separate）、reason 和 features
+        """
+        accumulator = FeatureAccumulator()
+        block_bytes = ANALYSIS_SAMPLE_RATE * 30 * 4  # 每次读取 30 秒 float32 采样
+        process = subprocess.Popen(
+            [
+                "/usr/bin/ffmpeg",
+                "-v", "error",
+                "-i", file_path,
+                "-vn",
+                "-f", "f32le",
+                "-ac", "1",
+                "-ar", str(ANALYSIS_SAMPLE_RATE),
+                "-"
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        try:
+            while True:
+                data = process.stdout.read(block_bytes)
+                if not data:
+                    break
+                accumulator.add(np.frombuffer(data[:len(data) // 4 * 4], dtype=np.float32))
+        finally:
+            process.stdout.close()
+            stderr = process.stderr.read().decode(errors="ignore")
+            process.wait()
+
+        if process.returncode != 0 and accumulator.samples == 0:
+            raise Exception(f"ffmpeg 解码失败: {stderr}")
+        features = accumulator.summarize()
+        return {**decide_route(features), "features": features}
+
+    def _separate_window(self, samples, temp_dir: str, index: int):
+        """分离单个窗口的音频
+
+        Args:
+            samples: 窗口内的立体声采样，形状为 (n, 2)
+            temp_dir: 临时文件目录
+            index: 窗口序号
+
+        Returns:
+            numpy.ndarray: 分离出的人声采样，形状为 (n, 2)
+        """
+        input_path = os.path.join(temp_dir, f"chunk_{index}.wav")
+        sf.write(input_path, samples, CHUNK_SAMPLE_RATE, subtype="FLOAT")
+        # 每个窗口单独加锁，长音频不会长时间独占模型
+        with self._lock:
+            self._ensure_model()
+            self._set_output_dir(temp_dir)
+            result_paths = self.separator.separate(input_path, {"Vocals": f"chunk_{index}_vocals"})
+        vocals_path = result_paths[0]
+        if not os.path.isabs(vocals_path):
+            vocals_path = os.path.join(temp_dir, vocals_path)
+
+        vocals, _ = sf.read(vocals_path, dtype="float32", always_2d=True)
+        os.remove(input_path)
+        os.remove(vocals_path)
+        if vocals.shape[1] == 1:
+            vocals = np.repeat(vocals, 2, axis=1)
+        return vocals
+
+    def _separate_chunked(self, audio_path: str, task_id: str, output_path: str,
+                          emit_chunks: bool = False, on_chunk=None):
+        """分块分离长音频
+
+        通过 ffmpeg 管道按窗口解码音频，逐窗口分离人声，相邻窗口的重叠部分做线性交叉淡化，
+        结果边处理边写入磁盘，内存占用只与窗口长度有关。
 
-    def process_audio(self, aduio_path: str, task_id: str, output_path):
+        Args:
+            audio_path: 输入文件路径
+            task_id: 任务ID
+            output_path: 输出目录
+            emit_chunks: 是否额外把每个分块单独写成文件，便于下游提前处理
+            on_chunk: 每完成一个分块时的回调，参数为分块信息字典
+
+        Returns:
+            tuple: (人声文件路径, 分块信息列表)
+        """
+        window = int(settings.CHUNK_SECONDS * CHUNK_SAMPLE_RATE)
+        overlap = int(settings.CHUNK_OVERLAP_SECONDS * CHUNK_SAMPLE_RATE)
+        if not 0 <= overlap < window:
+            raise ValueError("分块重叠长度必须小于窗口长度")
+        hop = window - overlap
+        frame_bytes = 2 * 4  # 双声道 float32
+
+        vocals_path = os.path.join(output_path, f"vocals_{task_id}.wav")
+        chunks = []
+        written = 0
+
+        process = subprocess.Popen(
+            [
+                "/usr/bin/ffmpeg",
+                "-v", "error",
+                "-i", audio_path,
+                "-vn",
+                "-f", "f32le",
+                "-ac", "2",
+                "-ar", str(CHUNK_SAMPLE_RATE),
+                "-"
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        try:
+            with sf.SoundFile(vocals_path, "w", samplerate=CHUNK_SAMPLE_RATE, channels=2,
+                              subtype="PCM_16") as vocals_file, \
+                    tempfile.TemporaryDirectory(dir=output_path) as temp_dir:
+                buffer = np.zeros((0, 2), dtype=np.float32)
+                previous_tail = None
+                eof = False
+                index = 0
+                while True:
+                    # 读满一个窗口，或读到文件末尾
+                    while not eof and len(buffer) < window:
+                        data = process.stdout.read((window - len(buffer)) * frame_bytes)
+                        if not data:
+                            eof = True
+                            break
+                        data = data[:len(data) // frame_bytes * frame_bytes]
+                        buffer = np.concatenate(
+                            [buffer, np.frombuffer(data, dtype=np.float32).reshape(-1, 2)]
+                        )
+                    if len(buffer) == 0:
+                        break
+
+                    with start_span("audio_separation.inference_chunk", {"index": index}):
+                        vocals = self._separate_window(buffer, temp_dir, index)
+
+                    # 与上一个窗口的重叠部分做交叉淡化
+                    if previous_tail is not None:
+                        n = min(len(previous_tail), len(vocals))
+                        fade = np.linspace(0, 1, n, dtype=np.float32)[:, None]
+                        vocals[:n] = previous_tail[:n] * (1 - fade) + vocals[:n] * fade
+
+                    # 最后一个窗口全部写出，其余窗口保留重叠部分等待下一个窗口
+                    if eof:
+                        block = vocals
+                    else:
+                        block = vocals[:hop]
+                        previous_tail = vocals[hop:]
+                    vocals_file.write(block)
+
+                    chunk = {
+                        "index": index,
+                        "start": round(written / CHUNK_SAMPLE_RATE, 3),
+                        "end": round((written + len(block)) / CHUNK_SAMPLE_RATE, 3),
+                    }
+                    if emit_chunks:
+                        chunk["path"] = os.path.join(output_path, f"vocals_{task_id}_part{index}.wav")
+                        sf.write(chunk["path"], block, CHUNK_SAMPLE_RATE, subtype="PCM_16")
+                        if on_chunk is not None:
+                            on_chunk(chunk)
+                    chunks.append(chunk)
+                    written += len(block)
+                    index += 1
+
+                    if eof:
+                        break
+                    buffer = buffer[hop:]
+        finally:
+            process.stdout.close()
+            stderr = process.stderr.read().decode(errors="ignore")
+            process.wait()
+
+        if process.returncode != 0 and written == 0:
+            raise Exception(f"ffmpeg 解码失败: {stderr}")
+        new_logger.info(f"分块分离完成: {vocals_path}, 分块数: {len(chunks)}")
+        return vocals_path, chunks
+
+    def process_audio(self, aduio_path: str, task_id: str, output_path,
+                      chunked=None, emit_chunks: bool = False, on_chunk=None, analyze=None,
+                      media_info=None, pcm_output: bool = False):
+        """分离音频中的人声
+
+        Args:
+            aduio_path: 输入文件路径
+            task_id: 任务ID
+            output_path: 输出目录
+            chunked: 是否分块分离，None 表示按音频时长自动判断
+            emit_chunks: 分块分离时是否额外输出每个分块的文件
+            on_chunk: 分块分离时每完成一个分块的回调
+            analyze: 是否在分离前做预分析，None 表示使用 ANALYSIS_ENABLED 配置
+            media_info: 上游探测得到的媒体信息，文件未变化时不再重复探测
+            pcm_output: 是否额外输出 16kHz 单声道 float32 原始采样，转写服务可直接读取而不再解码
+
+        Returns:
+            dict: has_audio_stream、vocals、accompaniment、analysis，分块分离时另有 chunks，
+                输出 PCM 成功时另有 pcm
+        """
+        pcm_path = os.path.join(output_path, f"vocals_{task_id}.pcm") if pcm_output else None
+        result = self._process_audio(
+            aduio_path, task_id, output_path, chunked, emit_chunks, on_chunk, analyze,
+            media_info, pcm_path
+        )
+        if pcm_path and result.get("vocals") and not result.get("pcm"):
+            start_time = time.perf_counter()
+            try:
+                self._write_pcm(result["vocals"], pcm_path)
+                result["pcm"] = pcm_path
+            except Exception as e:
+                # PCM 只是加速转写的可选输出，失败时转写服务会自行解码
+                new_logger.warning(f"输出 PCM 失败: {str(e)}")
+            result["analysis"]["timings"]["pcm"] = round(time.perf_counter() - start_time, 3)
+        return result
+
+    def _process_audio(self, aduio_path: str, task_id: str, output_path, chunked, emit_chunks,
+                       on_chunk, analyze, media_info, pcm_path):
+        """process_audio 的实现，pcm_path 不为空时直接提取原始音频的路径会同时输出 PCM"""
         # 判断 output_path 目录是否存在，不存在创建
         if not os.path.exists(output_path):
             os.makedirs(output_path)
         
         new_logger.info(f"开始处理音频文件: {aduio_path}, 任务ID: {task_id}")
+
+        # 各阶段耗时（秒）与处理路径一起返回
+        timings = {}
+        analysis = {"route": "separate", "reason": "analysis_disabled", "timings": timings}
         
         # 检查是否包含音频流
-        has_audio = self._check_audio_stream(aduio_path)
+        start_time = time.perf_counter()
+        with start_span("audio_separation.check_audio_stream"):
+            has_audio, duration = self._check_audio_stream(aduio_path, media_info)
+        timings["probe"] = round(time.perf_counter() - start_time, 3)
         if not has_audio:
             new_logger.warning(f"文件不包含音频流: {aduio_path}")
+            analysis.update(route="skip", reason="no_audio_stream")
             return {
                 "has_audio_stream": False,
                 "vocals": "",
-                "accompaniment": ""
+                "accompaniment": "",
+                "analysis": analysis
             }
+
+        # 预分析：静音直接跳过，干净人声直接使用原始音频
+        if analyze is None:
+            analyze = settings.ANALYSIS_ENABLED
+        if analyze:
+            start_time = time.perf_counter()
+            try:
+                with start_span("audio_separation.analyze") as span:
+                    analysis.update(self._analyze_audio(aduio_path))
+                    span.set_attribute("route", analysis["route"])
+            except Exception as e:
+                new_logger.warning(f"音频预分析失败，继续执行分离: {str(e)}")
+                analysis.update(route="separate", reason="analysis_failed")
+            timings["analysis"] = round(time.perf_counter() - start_time, 3)
+            new_logger.info(
+                f"音频预分析完成 - 任务ID: {task_id}, 处理路径: {analysis['route']}, "
+                f"原因: {analysis['reason']}, 特征: {analysis.get('features')}"
+            )
+
+        if analysis["route"] == "skip":
+            return {
+                "has_audio_stream": False,
+                "vocals": "",
+                "accompaniment": "",
+                "analysis": analysis
+            }
+
+        if analysis["route"] == "bypass" and self.ffmpeg_available:
+            vocals_output_path = os.path.join(output_path, f"vocals_{task_id}.mp3")
+            start_time = time.perf_counter()
+            try:
+                with start_span("audio_separation.ffmpeg_extract"):
+                    self._extract_audio_with_ffmpeg(aduio_path, vocals_output_path, pcm_path)
+                timings["extract"] = round(time.perf_counter() - start_time, 3)
+                return {
+                    "has_audio_stream": True,
+                    "vocals": vocals_output_path,
+                    "accompaniment": "",
+                    "analysis": analysis,
+                    "pcm": pcm_path or ""
+                }
+            except Exception as e:
+                new_logger.warning(f"直接提取原始音频失败，继续执行分离: {str(e)}")
+                analysis.update(route="separate", reason="bypass_failed")
+        elif analysis["route"] == "bypass":
+            analysis.update(route="separate", reason="ffmpeg_unavailable")
         
         try:
-            # 实例化 separator 类
-            self.separator = Separator(
-                output_single_stem="Vocals",
-                model_file_dir=settings.MODEL_DIR,
-                output_dir=output_path
-            )
+            if chunked is None:
+                chunked = duration > settings.CHUNK_THRESHOLD_SECONDS
+
+            if chunked:
+                start_time = time.perf_counter()
+                vocals_path, chunks = self._separate_chunked(
+                    aduio_path, task_id, output_path, emit_chunks, on_chunk
+                )
+                inference_time = time.perf_counter() - start_time
+                timings["separation"] = round(inference_time, 3)
+                SEPARATION_INFERENCE_SECONDS.observe(inference_time)
+                if duration > 0:
+                    SEPARATION_REALTIME_FACTOR.observe(inference_time / duration)
+                return {
+                    "has_audio_stream": True,
+                    "vocals": vocals_path,
+                    "accompaniment": "",
+                    "chunks": chunks,
+                    "analysis": analysis
+                }
 
-            new_logger.info(f"加载模型: {settings.MODEL_FILENAME}")
-            self.separator.load_model(model_filename=settings.MODEL_FILENAME)
-            
             # 修改输出文件的命名
             output_names = {
                 "Vocals": f"vocals_{task_id}",
                 "Instrumental": f"accompaniment_{task_id}"
             }
             
-            # 尝试进行音频分离
-            result_paths = self.separator.separate(aduio_path, output_names)
+            # 复用常驻模型进行音频分离，只切换本次请求的输出目录
+            with self._lock:
+                self._ensure_model()
+                self._set_output_dir(output_path)
+                start_time = time.perf_counter()
+                with start_span("audio_separation.inference", {"model": settings.MODEL_FILENAME}):
+                    result_paths = self.separator.separate(aduio_path, output_names)
+                inference_time = time.perf_counter() - start_time
+            timings["separation"] = round(inference_time, 3)
+            SEPARATION_INFERENCE_SECONDS.observe(inference_time)
+            if duration > 0:
+                SEPARATION_REALTIME_FACTOR.observe(inference_time / duration)
+
+            # separate 返回相对输出目录的文件名；只输出人声时只有一个文件
+            result_paths = [
+                path if os.path.isabs(path) else os.path.join(output_path, path)
+                for path in result_paths
+            ]
             return {
                 "has_audio_stream": True,
                 "vocals": result_paths[0],
-                "accompaniment": result_paths[1]
+                "accompaniment": result_paths[1] if len(result_paths) > 1 else "",
+                "analysis": analysis
             }
             
         except Exception as e:
             # 音频分离失败，使用ffmpeg提取原始音频作为备选方案
             new_logger.error(f"音频分离失败: {str(e)}，使用ffmpeg提取原始音频作为备选方案")
+            SEPARATION_FALLBACK_TOTAL.inc()
             
             # 检查ffmpeg是否可用
             if not self.ffmpeg_available:
@@ -109,14 +487,17 @@ class AudioSeparatorProcessor:
             
             try:
                 # 使用ffmpeg提取音频
-                self._extract_audio_with_ffmpeg(aduio_path, vocals_output_path)
+                with start_span("audio_separation.ffmpeg_extract"):
+                    self._extract_audio_with_ffmpeg(aduio_path, vocals_output_path)
                 
                 if os.path.exists(vocals_output_path):
                     new_logger.info(f"使用ffmpeg提取音频成功: {vocals_output_path}")
+                    analysis.update(route="fallback", reason="separation_failed")
                     return {
                         "has_audio_stream": True,
                         "vocals": vocals_output_path,
-                        "accompaniment": vocals_output_path
+                        "accompaniment": vocals_output_path,
+                        "analysis": analysis
                     }
                 else:
                     raise Exception("使用ffmpeg提取音频失败")
@@ -155,13 +536,42 @@ class AudioSeparatorProcessor:
             new_logger.warning(f"检查ffmpeg可用性时出错: {str(e)}")
             return False
     
-    def _extract_audio_with_ffmpeg(self, input_path, output_path):
+    def _write_pcm(self, input_path, pcm_path):
+        """
+        将音频解码为 16kHz 单声道 float32 原始采样文件，供转写服务直接读取
+
+        Args:
+            input_path: 输入音频文件路径
+            pcm_path: 输出文件路径
+        """
+        result = subprocess.run(
+            [
+                "/usr/bin/ffmpeg",
+                "-v", "error",
+                "-i", input_path,
+                "-vn",
+                "-ac", "1",
+                "-ar", str(PCM_SAMPLE_RATE),
+                "-f", "f32le",
+                "-y",
+                pcm_path
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=False
+        )
+        if result.returncode != 0:
+            raise Exception(f"ffmpeg 输出 PCM 失败: {result.stderr}")
+
+    def _extract_audio_with_ffmpeg(self, input_path, output_path, pcm_path=None):
         """
         使用ffmpeg从视频或音频文件中提取音频
         
         Args:
             input_path: 输入文件路径
             output_path: 输出音频文件路径
+            pcm_path: 同时输出 16kHz 单声道 float32 原始采样的路径，与提取音频共用一次解码
         """
         new_logger.info(f"使用ffmpeg从 {input_path} 提取音频到 {output_path}")
         
@@ -175,6 +585,8 @@ class AudioSeparatorProcessor:
             "-y",  # 覆盖已存在的文件
             output_path
         ]
+        if pcm_path:
+            cmd += ["-vn", "-ac", "1", "-ar", str(PCM_SAMPLE_RATE), "-f", "f32le", pcm_path]
         
         # 执行命令
         try:
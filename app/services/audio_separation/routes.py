@@ -1,23 +1,42 @@
 import os
+import json
+import asyncio
 import logger
 import uuid
 import time
-from fastapi import APIRouter
+from fastapi import APIRouter, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 from pydantic import BaseModel, Field
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Any
 from models import SeparationResponse
 from processor import AudioSeparatorProcessor
 from config import settings
+from metrics import SEPARATION_REQUESTS_TOTAL, SEPARATION_ROUTE_TOTAL
+from tracing import start_span
+from jobs import JobManager, QueueFullError, default_worker_count
 
 router = APIRouter()
 processor = AudioSeparatorProcessor()
 new_logger = logger.CustomLogger()
 
+# 分离任务在有界线程池中执行，避免阻塞事件循环
+job_manager = JobManager(
+    workers=settings.WORKERS or default_worker_count(),
+    max_queue=settings.MAX_QUEUE,
+    job_ttl=settings.JOB_TTL_SECONDS,
+)
+
 class AudioSeparationRequest(BaseModel):
     audio_path: str
     model: str
     task_id: str
     output_path: str
+    chunked: Optional[bool] = None  # 是否分块分离，不传时按音频时长自动判断
+    emit_chunks: bool = False  # 分块分离时是否额外输出每个分块的文件
+    analyze: Optional[bool] = None  # 是否在分离前做预分析，不传时使用 ANALYSIS_ENABLED 配置
+    media_info: Optional[Dict[str, Any]] = None  # 上游探测得到的媒体信息，文件未变化时不再重复探测
+    pcm_output: bool = False  # 是否额外输出 16kHz 单声道 float32 原始采样，供转写服务直接读取
 
 class SeparationResponse(BaseModel):
     status: str
@@ -26,6 +45,8 @@ class SeparationResponse(BaseModel):
     separated_audio: Optional[Dict[str, str]] = Field(default_factory=dict)
     file_paths: Optional[Dict[str, str]] = Field(default_factory=dict)
     has_audio_stream: bool = True
+    chunks: List[Dict[str, Any]] = Field(default_factory=list)
+    analysis: Dict[str, Any] = Field(default_factory=dict)  # 处理路径、判断依据和各阶段耗时
 
 def validate_file_path(file_path: str) -> bool:
     """验证文件路径是否存在"""
@@ -39,8 +60,127 @@ def validate_output_directory(output_path: str) -> bool:
     except Exception:
         return False
 
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    """输出 Prometheus 指标"""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@router.get("/healthz", include_in_schema=False)
+def healthz():
+    """存活检查：进程能够响应请求即返回 200"""
+    return {"status": "ok"}
+
+@router.get("/readyz", include_in_schema=False)
+def readyz():
+    """就绪检查：模型加载并预热完成后返回 200，之前返回 503"""
+    if not processor.ready:
+        content = {"status": "warming_up"}
+        if processor.load_error:
+            content = {"status": "error", "message": processor.load_error}
+        return JSONResponse(status_code=503, content=content)
+    return {"status": "ready"}
+
+def _queue_full_response(task_id: str, error: QueueFullError) -> JSONResponse:
+    """队列已满时返回 429，并通过 Retry-After 告知重试时间"""
+    new_logger.warning(f"Request rejected - task_id: {task_id}, error: {str(error)}")
+    return JSONResponse(
+        status_code=429,
+        headers={"Retry-After": str(error.retry_after)},
+        content=SeparationResponse(
+            status="error",
+            task_id=task_id,
+            message=str(error)
+        ).model_dump()
+    )
+
+def _run_job(request: AudioSeparationRequest, carrier: Dict[str, str], on_chunk=None,
+             stream: bool = False):
+    """在工作线程中执行分离，并记录追踪和指标"""
+    with start_span(
+        "audio_separation.request",
+        {"task_id": request.task_id, "model": request.model, "stream": stream},
+        carrier=carrier,
+    ) as span:
+        response = _separate_audio(request, on_chunk)
+        span.set_attribute("status", response.status)
+    SEPARATION_REQUESTS_TOTAL.labels(status=response.status).inc()
+    return response
+
 @router.post("/api/v1/audio-separation/process", response_model=SeparationResponse)
-async def separate_audio(request: AudioSeparationRequest):
+async def separate_audio(request: AudioSeparationRequest, http_request: Request):
+    carrier = dict(http_request.headers)
+    try:
+        job = job_manager.submit(lambda: _run_job(request, carrier))
+    except QueueFullError as e:
+        return _queue_full_response(request.task_id, e)
+    return await asyncio.wrap_future(job.future)
+
+@router.post("/api/v1/audio-separation/jobs", status_code=202)
+async def create_separation_job(request: AudioSeparationRequest, http_request: Request):
+    """提交异步分离任务，立即返回 job_id，通过 GET /api/v1/audio-separation/jobs/{job_id} 查询结果"""
+    carrier = dict(http_request.headers)
+    try:
+        job = job_manager.submit(lambda: _run_job(request, carrier))
+    except QueueFullError as e:
+        return _queue_full_response(request.task_id, e)
+    return {"task_id": request.task_id, **job.to_dict()}
+
+@router.get("/api/v1/audio-separation/jobs/{job_id}")
+async def get_separation_job(job_id: str):
+    """查询异步分离任务的状态和结果"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return JSONResponse(
+            status_code=404,
+            content={"status": "error", "message": f"任务不存在或已过期: {job_id}"}
+        )
+    data = job.to_dict()
+    if job.result is not None:
+        data["result"] = job.result.model_dump()
+    return data
+
+@router.post("/api/v1/audio-separation/stream")
+async def separate_audio_stream(request: AudioSeparationRequest, http_request: Request):
+    """分块分离并以 NDJSON 流式返回进度
+
+    每完成一个分块输出一行 {"event": "chunk", ...}，其中 path 为该分块的人声文件，
+    下游可以在分离完成前开始处理；最后输出一行 {"event": "done", ...}，内容与 process 接口的响应相同。
+    """
+    request.chunked = True
+    request.emit_chunks = True
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    carrier = dict(http_request.headers)
+
+    def on_chunk(chunk: Dict[str, Any]):
+        loop.call_soon_threadsafe(events.put_nowait, {"event": "chunk", **chunk})
+
+    try:
+        job = job_manager.submit(lambda: _run_job(request, carrier, on_chunk, stream=True))
+    except QueueFullError as e:
+        return _queue_full_response(request.task_id, e)
+
+    async def produce():
+        try:
+            response = await asyncio.wrap_future(job.future)
+            await events.put({"event": "done", **response.model_dump()})
+        finally:
+            await events.put(None)
+
+    async def stream():
+        task = asyncio.create_task(produce())
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        finally:
+            await task
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+def _separate_audio(request: AudioSeparationRequest, on_chunk=None):
     request_id = uuid.uuid4().hex
     start_time = time.time()
     
@@ -77,7 +217,13 @@ async def separate_audio(request: AudioSeparationRequest):
             output_files = processor.process_audio(
                 request.audio_path,
                 request.task_id,
-                request.output_path
+                request.output_path,
+                chunked=request.chunked,
+                emit_chunks=request.emit_chunks,
+                on_chunk=on_chunk,
+                analyze=request.analyze,
+                media_info=request.media_info,
+                pcm_output=request.pcm_output
             )
         except Exception as e:
             error_msg = f"Audio processing failed: {str(e)}"
@@ -90,13 +236,16 @@ async def separate_audio(request: AudioSeparationRequest):
 
         # 检查是否有音频流
         has_audio_stream = output_files.get("has_audio_stream", True)
+        analysis = output_files.get("analysis", {})
+        SEPARATION_ROUTE_TOTAL.labels(route=analysis.get("route", "separate")).inc()
         
-        # 如果没有音频流，返回特殊响应
+        # 如果没有音频流或音频为静音，返回特殊响应
         if not has_audio_stream:
-            new_logger.info(f"文件不包含音频流 - task_id: {request.task_id}")
+            message = "音频为静音" if analysis.get("reason") == "silence" else "文件不包含音频流"
+            new_logger.info(f"{message} - task_id: {request.task_id}")
             return SeparationResponse(
                 status="success",
-                message="文件不包含音频流",
+                message=message,
                 task_id=request.task_id,
                 has_audio_stream=False,
                 separated_audio={
@@ -106,7 +255,8 @@ async def separate_audio(request: AudioSeparationRequest):
                 file_paths={
                     "vocals": "",
                     "accompaniment": ""
-                }
+                },
+                analysis=analysis
             )
 
         # 构建成功响应
@@ -121,8 +271,11 @@ async def separate_audio(request: AudioSeparationRequest):
             },
             file_paths={
                 "vocals": output_files["vocals"],
-                "accompaniment": output_files.get("accompaniment", "")
-            }
+                "accompaniment": output_files.get("accompaniment", ""),
+                "pcm": output_files.get("pcm", "")
+            },
+            chunks=output_files.get("chunks", []),
+            analysis=analysis
         )
 
         # 记录处理时间和成功信息
@@ -1,63 +1,217 @@
 from io import BytesIO
-import soundfile as sf
-import librosa
+import os
+import shutil
+import subprocess
+import numpy as np
 from funasr import AutoModel
+from funasr.utils.vad_utils import merge_vad
+from fastapi.concurrency import run_in_threadpool
 from config import settings
-from io import BytesIO
+import time
+from tracing import start_span
+from batching import BatchScheduler
+import logger
+from metrics import (
+    TRANSCRIPTION_DECODE_SECONDS,
+    TRANSCRIPTION_REALTIME_FACTOR,
+)
+
+# 模型输入采样率
+SAMPLE_RATE = 16000
+
+new_logger = logger.CustomLogger()
 
 class AudioProcessor:
     def __init__(self, model_dir: str, device: str = settings.CUDA_DEVICE):
-        self.model = AutoModel(
-            model=model_dir,
-            trust_remote_code=True,
-            remote_code="remote_code_model.py",
-            vad_model="fsmn-vad",
-            vad_kwargs={"max_single_segment_time": 30000},
+        # 每个进程分到的推理线程数，多进程部署时避免互相争抢 CPU
+        ncpu = settings.NCPU or max(1, (os.cpu_count() or 1) // max(settings.WORKERS, 1))
+        # VAD 和识别模型分开加载：VAD 按请求执行，识别由调度器跨请求组批执行
+        self.vad_model = AutoModel(
+            model=settings.VAD_MODEL,
+            max_single_segment_time=settings.VAD_MAX_SEGMENT_MS,
             device=device,
+            ncpu=ncpu,
+            disable_pbar=True,
+        )
+        self.engine = settings.ASR_ENGINE
+        if self.engine == "onnx":
+            from onnx_engine import OnnxSenseVoice
+            self.model = OnnxSenseVoice(
+                settings.ONNX_MODEL_DIR,
+                quantize=settings.ONNX_QUANTIZE,
+                device=device,
+                ncpu=ncpu,
+                pad_multiple=settings.ONNX_PAD_MULTIPLE,
+            )
+        elif self.engine == "torch":
+            self.model = AutoModel(
+                model=model_dir,
+                trust_remote_code=True,
+                remote_code="remote_code_model.py",
+                device=device,
+                ncpu=ncpu,
+                disable_pbar=True,
+            )
+        else:
+            raise ValueError(f"不支持的识别引擎: {self.engine}")
+        self.scheduler = BatchScheduler(
+            self._infer_batch,
+            batch_size_s=settings.BATCH_SIZE_S,
+            max_wait_ms=settings.BATCH_WAIT_MS,
+            sample_rate=SAMPLE_RATE,
         )
+        # 模型加载并预热完成后置为 True，/readyz 据此判断服务是否就绪
+        self.ready = False
+
+    async def warm_up(self):
+        """用一段合成音频走一遍 VAD 和批量识别，提前完成模型和显存的初始化，完成后服务就绪
+
+        在服务启动后的后台任务中执行，预热期间 /healthz 正常响应，/readyz 返回 503。
+        预热失败时服务保持未就绪。
+        """
+        if settings.WARMUP_ON_START:
+            start_time = time.perf_counter()
+            t = np.arange(SAMPLE_RATE) / SAMPLE_RATE
+            audio = (0.1 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+            try:
+                await self.scheduler.run_exclusive(self._vad, audio)
+                await self.scheduler.submit([audio], "auto", True)
+            except Exception as e:
+                new_logger.error(f"模型预热失败: {str(e)}")
+                return
+            new_logger.info(f"模型预热完成，耗时: {time.perf_counter() - start_time:.2f}s")
+        self.ready = True
+
+    def _vad(self, audio: np.ndarray) -> list:
+        """检测语音片段，返回合并后的 [[开始毫秒, 结束毫秒], ...]"""
+        result = self.vad_model.generate(input=audio)
+        segments = result[0]["value"] if result else []
+        return merge_vad(segments, settings.MERGE_LENGTH_S * 1000)
+
+    def _infer_batch(self, segments: list, language: str, use_itn: bool,
+                     output_timestamp: bool = False) -> list:
+        """批量识别语音片段，在调度器的模型线程中执行"""
+        return self.model.generate(
+            input=segments,
+            language=language,
+            use_itn=use_itn,
+            output_timestamp=output_timestamp,
+            batch_size=len(segments),
+        )
+
+    def load_audio(self, audio_path: str, pcm_path: str = None) -> np.ndarray:
+        """加载音频为 16kHz 单声道 float32 采样
+
+        Args:
+            audio_path: 音频文件路径
+            pcm_path: 上游已解码的 16kHz 单声道 float32 原始采样文件，提供时直接读取，不再解码
+
+        Returns:
+            np.ndarray: 音频采样
+        """
+        if pcm_path:
+            try:
+                return np.fromfile(pcm_path, dtype=np.float32)
+            except Exception as e:
+                raise Exception(f"读取 PCM 文件失败: {str(e)}")
+        return self._load_audio(audio_path)
 
-    def process_audio_bytes(self, audio_path: str) -> bytes:
-        """处理音频文件并返回字节数据"""
+    def _load_audio(self, audio_path: str) -> np.ndarray:
+        """通过 ffmpeg 管道解码并重采样为 16kHz 单声道 float32"""
         try:
-            # 加载音频并重采样为 16kHz
-            audio, _ = librosa.load(audio_path, sr=16000)
-            
-            # 创建内存缓冲区
-            audio_buffer = BytesIO()
-            
-            # 将音频数据写入缓冲区
-            sf.write(audio_buffer, audio, 16000, format='wav')
-            
-            # 获取字节数据
-            audio_buffer.seek(0)
-            return audio_buffer.read()
-            
+            process = subprocess.Popen(
+                [
+                    settings.FFMPEG_PATH,
+                    "-v", "error",
+                    "-nostdin",
+                    "-i", audio_path,
+                    "-vn",
+                    "-ac", "1",
+                    "-ar", str(SAMPLE_RATE),
+                    "-f", "f32le",
+                    "-"
+                ],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            )
+            # 直接读入可写缓冲区，numpy 数组与缓冲区共享内存，不再额外复制
+            buffer = BytesIO()
+            shutil.copyfileobj(process.stdout, buffer)
+            stderr = process.stderr.read().decode(errors="ignore")
+            process.wait()
+            if process.returncode != 0:
+                raise Exception(f"ffmpeg 解码失败: {stderr.strip()}")
+            view = buffer.getbuffer()
+            return np.frombuffer(view[:len(view) // 4 * 4], dtype=np.float32)
         except Exception as e:
             raise Exception(f"音频处理失败: {str(e)}")
 
-    def generate_text(self, audio_data: str, language: str = "zn", use_itn: bool = True):
+    async def generate_text(self, audio_data: str, language: str = "zn", use_itn: bool = True,
+                            pcm_path: str = None, output_timestamp: bool = False):
         """
         生成音频转写文本
         :param audio_data: 音频文件路径
         :param language: 语言代码
         :param use_itn: 是否使用 ITN
-        :return: 转写结果
+        :param pcm_path: 上游已解码的 16kHz 单声道 float32 原始采样文件，提供时跳过解码
+        :param output_timestamp: 是否为每个片段输出 token 级时间戳（CTC 强制对齐）
+        :return: 转写结果，segments 为各 VAD 片段的起止时间（秒）和文本
         """
         try:
+            request_start = time.perf_counter()
             # 处理音频文件
-            processed_audio = self.process_audio_bytes(audio_data)
-            
-            # 调用模型进行转写
-            result = self.model.generate(
-                input=processed_audio,
-                language=language,
-                use_itn=use_itn,
-                batch_size_s=60,
-                merge_vad=True,
-                merge_length_s=15,
-            )
-            
-            return result
+            with start_span("audio_transcription.decode", {"pcm": bool(pcm_path)}):
+                audio = await run_in_threadpool(self.load_audio, audio_data, pcm_path)
+            TRANSCRIPTION_DECODE_SECONDS.observe(time.perf_counter() - request_start)
+            duration = len(audio) / SAMPLE_RATE
+
+            # VAD 切分语音片段
+            with start_span("audio_transcription.vad", {"audio_seconds": duration}) as span:
+                vad_segments = await self.scheduler.run_exclusive(self._vad, audio)
+                span.set_attribute("segments", len(vad_segments))
+
+            # 片段交给调度器，与其他请求的片段一起组批识别
+            with start_span(
+                "audio_transcription.inference",
+                {"language": language, "audio_seconds": duration},
+            ):
+                segments = [
+                    audio[int(begin * SAMPLE_RATE / 1000):int(end * SAMPLE_RATE / 1000)]
+                    for begin, end in vad_segments
+                ]
+                results = await self.scheduler.submit(segments, language, use_itn, output_timestamp)
+
+            if duration > 0:
+                TRANSCRIPTION_REALTIME_FACTOR.observe((time.perf_counter() - request_start) / duration)
+
+            # 与 funasr 带 VAD 推理时的结果格式保持一致：各片段文本以空格连接
+            text = " ".join(result["text"] for result in results if result["text"])
+            return [{
+                "key": os.path.basename(audio_data),
+                "text": text,
+                "segments": self._build_segments(vad_segments, results, output_timestamp),
+            }]
             
         except Exception as e:
             raise Exception(f"转写失败: {str(e)}")
+
+    @staticmethod
+    def _build_segments(vad_segments: list, results: list, output_timestamp: bool) -> list:
+        """把片段的识别结果整理为带起止时间的分段，token 时间戳换算为整段音频上的时间"""
+        segments = []
+        for (begin, end), result in zip(vad_segments, results):
+            if not result["text"]:
+                continue
+            offset = begin / 1000
+            segment = {"start": round(offset, 3), "end": round(end / 1000, 3), "text": result["text"]}
+            if output_timestamp:
+                segment["tokens"] = [
+                    {"token": token, "start": round(offset + start, 3), "end": round(offset + stop, 3)}
+                    for token, start, stop in result.get("timestamp", [])
+                ]
+            segments.append(segment)
+        return segments
+
+    def shutdown(self):
+        """停止调度器"""
+        self.scheduler.shutdown()
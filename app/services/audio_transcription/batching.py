@@ -0,0 +1,192 @@
+"""转写请求的动态批处理
+
+各请求经 VAD 切分后的语音片段进入同一个等待队列，调度器把不同请求中推理选项相同的片段
+按长度排序后分桶组成批次，一个批次内片段补齐后的总帧数不超过预算，一起送入模型推理，
+结果再按片段分发回各自请求的 future，调用方拿到的结果与提交顺序一致。
+每个批次的补齐帧数记录在 Prometheus 指标中，用于观察组批的浪费。
+
+模型推理只在一个专用线程中执行：GPU 上同一时间只跑一个批次，也不会阻塞事件循环。
+"""
+
+import asyncio
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple
+import numpy as np
+from metrics import (
+    TRANSCRIPTION_BATCH_FRAMES_TOTAL,
+    TRANSCRIPTION_BATCH_PADDING_RATIO,
+    TRANSCRIPTION_BATCH_SEGMENTS,
+    TRANSCRIPTION_BATCH_WAIT_SECONDS,
+    TRANSCRIPTION_INFERENCE_SECONDS,
+)
+
+
+class _Segment:
+    """等待推理的语音片段"""
+
+    __slots__ = ("audio", "frames", "options", "future", "enqueued_at")
+
+    def __init__(self, audio: np.ndarray, frames: int, options: Tuple, future: asyncio.Future):
+        self.audio = audio
+        self.frames = frames
+        self.options = options
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class BatchScheduler:
+    """把多个请求的语音片段合并成批次推理
+
+    Args:
+        infer_fn: 批量推理函数，参数为 (片段列表, language, use_itn, output_timestamp)，
+            返回与片段一一对应的结果列表
+        batch_size_s: 一个批次补齐后的最大总时长（秒），换算为帧数作为组批预算
+        max_wait_ms: 批次未满时最多等待新片段的时间（毫秒）
+        sample_rate: 片段采样率
+        frame_ms: 模型输入一帧对应的时长（毫秒），SenseVoice 的 LFR 特征为 6 个 10 毫秒的 fbank 帧
+    """
+
+    def __init__(self, infer_fn: Callable[[List[np.ndarray], str, bool, bool], List[Dict[str, Any]]],
+                 batch_size_s: float, max_wait_ms: float, sample_rate: int, frame_ms: float = 60):
+        self._infer_fn = infer_fn
+        self._frame_samples = sample_rate * frame_ms / 1000
+        self._budget = max(1, int(batch_size_s * 1000 / frame_ms))
+        self._max_wait = max_wait_ms / 1000
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="asr-model")
+        self._pending: List[_Segment] = []
+        self._wakeup: asyncio.Event = None
+        self._task: asyncio.Task = None
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def run_exclusive(self, fn: Callable, *args):
+        """在模型线程中执行函数，与批量推理串行，用于 VAD 等同样占用模型设备的操作"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def submit(self, segments: List[np.ndarray], language: str, use_itn: bool,
+                     output_timestamp: bool = False) -> List[Dict[str, Any]]:
+        """提交一个请求的全部片段，等待所有片段推理完成
+
+        Args:
+            segments: 语音片段
+            language: 语言代码
+            use_itn: 是否使用 ITN
+            output_timestamp: 是否输出 token 级时间戳
+
+        Returns:
+            list: 与 segments 顺序一致的推理结果
+        """
+        if not segments:
+            return []
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        options = (language, use_itn, output_timestamp)
+        items = [
+            _Segment(audio, self._frames(len(audio)), options, loop.create_future())
+            for audio in segments
+        ]
+        self._pending.extend(items)
+        self._wakeup.set()
+        return await asyncio.gather(*(item.future for item in items))
+
+    def _take_batch(self) -> List[_Segment]:
+        """取出一个批次
+
+        只有推理选项（language、use_itn、output_timestamp）相同的片段才能合并。这些片段按帧数排序，
+        从等待最久的片段所在位置向两侧扩展：每次加入补齐帧数增加较少的一侧相邻片段，
+        直到补齐后的总帧数超出预算。批次总是包含等待最久的片段，避免长片段一直排不上；
+        长度相近的片段落在同一批次，减少短片段补齐到长片段的浪费。
+        """
+        oldest = self._pending[0]
+        candidates = sorted(
+            (item for item in self._pending if item.options == oldest.options),
+            key=lambda item: item.frames,
+        )
+        lo = candidates.index(oldest)
+        hi = lo + 1
+        max_frames = oldest.frames
+        while True:
+            size = hi - lo
+            # 加入左侧较短的片段，补齐浪费为它与当前最长片段的差
+            left_waste = max_frames - candidates[lo - 1].frames if lo > 0 else None
+            # 加入右侧较长的片段，已有片段都要补齐到它的长度
+            right_waste = (candidates[hi].frames - max_frames) * size if hi < len(candidates) else None
+            if right_waste is not None and (left_waste is None or right_waste < left_waste) \
+                    and candidates[hi].frames * (size + 1) <= self._budget:
+                max_frames = candidates[hi].frames
+                hi += 1
+            elif left_waste is not None and max_frames * (size + 1) <= self._budget:
+                lo -= 1
+            else:
+                break
+        batch = candidates[lo:hi]
+        taken = set(map(id, batch))
+        self._pending = [item for item in self._pending if id(item) not in taken]
+
+        speech_frames = sum(item.frames for item in batch)
+        padded_frames = max_frames * len(batch)
+        TRANSCRIPTION_BATCH_FRAMES_TOTAL.labels(kind="speech").inc(speech_frames)
+        TRANSCRIPTION_BATCH_FRAMES_TOTAL.labels(kind="padding").inc(padded_frames - speech_frames)
+        TRANSCRIPTION_BATCH_PADDING_RATIO.observe(1 - speech_frames / padded_frames)
+        return batch
+
+    def _frames(self, num_samples: int) -> int:
+        """片段送入模型的帧数"""
+        return max(1, math.ceil(num_samples / self._frame_samples))
+
+    def _batch_is_full(self) -> bool:
+        total = sum(item.frames for item in self._pending)
+        return total >= self._budget
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if not self._pending:
+                continue
+            # 批次未满时稍等片刻，让同时到达的其他请求的片段进入同一批次
+            if self._max_wait > 0 and not self._batch_is_full():
+                await asyncio.sleep(self._max_wait)
+
+            # 丢弃调用方已取消的片段
+            self._pending = [item for item in self._pending if not item.future.done()]
+            if not self._pending:
+                continue
+
+            batch = self._take_batch()
+            now = time.perf_counter()
+            for item in batch:
+                TRANSCRIPTION_BATCH_WAIT_SECONDS.observe(now - item.enqueued_at)
+            TRANSCRIPTION_BATCH_SEGMENTS.observe(len(batch))
+
+            start_time = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, self._infer_fn, [item.audio for item in batch], *batch[0].options
+                )
+                if len(results) != len(batch):
+                    raise RuntimeError(f"批量推理结果数量不一致: {len(results)} != {len(batch)}")
+            except Exception as e:
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+            else:
+                for item, result in zip(batch, results):
+                    if not item.future.done():
+                        item.future.set_result(result)
+            TRANSCRIPTION_INFERENCE_SECONDS.observe(time.perf_counter() - start_time)
+
+            if self._pending:
+                self._wakeup.set()
+
+    def shutdown(self):
+        """停止调度并等待正在执行的推理完成"""
+        if self._task is not None:
+            self._task.cancel()
+        self._executor.shutdown(wait=True)
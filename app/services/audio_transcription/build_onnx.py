@@ -0,0 +1,277 @@
+"""导出 SenseVoiceSmall 的 ONNX 模型并评测
+
+在服务目录下运行：
+
+    python build_onnx.py --model-dir ./iic/SenseVoiceSmall --output-dir ./iic/SenseVoiceSmall-onnx \
+        --reference ./reference.jsonl
+
+1. 导出 fp32 模型 model.onnx 和 int8 动态量化模型 model_quant.onnx，并复制前端和分词器文件，
+   输出目录可以直接作为 ONNX_MODEL_DIR 使用。导出信息写入 build_info.json，
+   模型、配置和导出代码都没有变化时直接使用已有产物，不重复导出；
+2. 提供 --reference 时在参考集上评测基线引擎和候选引擎的字错率（CER）与实时率（RTF），
+   候选引擎的 CER 比基线高出 --max-cer-delta 以上，或 RTF 超过基线的 --max-rtf-ratio 倍时，
+   以非零状态码退出，可以作为部署前的检查。
+
+参考集为 JSON Lines 文件，每行 {"audio": 音频路径, "text": 参考文本}，音频路径相对于参考集文件。
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+import unicodedata
+from typing import Any, Dict, List
+import librosa
+import numpy as np
+from funasr import AutoModel
+from funasr.utils.postprocess_utils import rich_transcription_postprocess
+from onnx_engine import BPE_MODEL, OnnxSenseVoice
+from utils.export_utils import export
+
+# 模型输入采样率
+SAMPLE_RATE = 16000
+# 导出信息文件
+BUILD_INFO = "build_info.json"
+# 与模型一起复制到输出目录的文件
+SIDE_FILES = ("config.yaml", "am.mvn", BPE_MODEL, "tokens.json")
+# 参与指纹计算的导出代码，修改后需要重新导出
+EXPORT_SOURCES = ("remote_code_model.py", "export_meta.py", "utils/export_utils.py")
+# 可评测的引擎
+ENGINES = ("torch", "fp32", "int8")
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _fingerprint(model_dir: str, quantize: bool, opset_version: int) -> str:
+    """模型权重、配置、导出代码和导出参数的指纹"""
+    import onnxruntime
+    import torch
+
+    digest = hashlib.sha256()
+    for path in [os.path.join(model_dir, name) for name in ("model.pt", "config.yaml")] + list(EXPORT_SOURCES):
+        digest.update(os.path.basename(path).encode())
+        digest.update(_file_sha256(path).encode())
+    digest.update(f"{quantize}|{opset_version}|{torch.__version__}|{onnxruntime.__version__}".encode())
+    return digest.hexdigest()
+
+
+def _load_build_info(output_dir: str) -> Dict[str, Any]:
+    path = os.path.join(output_dir, BUILD_INFO)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _is_cached(output_dir: str, info: Dict[str, Any], fingerprint: str) -> bool:
+    if info.get("fingerprint") != fingerprint:
+        return False
+    for name, size in info.get("files", {}).items():
+        path = os.path.join(output_dir, name)
+        if not os.path.exists(path) or os.path.getsize(path) != size:
+            return False
+    return True
+
+
+def build(model_dir: str, output_dir: str, quantize: bool = True, opset_version: int = 14,
+          force: bool = False) -> Dict[str, Any]:
+    """导出 ONNX 模型，产物未过期时直接返回已有的导出信息
+
+    Args:
+        model_dir: PyTorch 模型目录
+        output_dir: 输出目录
+        quantize: 是否同时导出 int8 量化模型
+        opset_version: ONNX opset 版本
+        force: 忽略已有产物，重新导出
+
+    Returns:
+        dict: 导出信息，包括指纹和各产物文件的大小
+    """
+    fingerprint = _fingerprint(model_dir, quantize, opset_version)
+    info = _load_build_info(output_dir)
+    if not force and _is_cached(output_dir, info, fingerprint):
+        print(f"使用已有的导出产物: {output_dir}")
+        return info
+
+    os.makedirs(output_dir, exist_ok=True)
+    # 删除旧产物，export 在量化模型已存在时不会重新量化
+    for name in ("model.onnx", "model_quant.onnx", BUILD_INFO):
+        path = os.path.join(output_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+    start = time.perf_counter()
+    model = AutoModel(
+        model=model_dir,
+        trust_remote_code=True,
+        remote_code="remote_code_model.py",
+        device="cpu",
+        disable_pbar=True,
+    )
+    export(
+        model.model,
+        quantize=quantize,
+        opset_version=opset_version,
+        output_dir=output_dir,
+        device="cpu",
+    )
+    for name in SIDE_FILES:
+        shutil.copy(os.path.join(model_dir, name), os.path.join(output_dir, name))
+
+    artifacts = ["model.onnx"] + (["model_quant.onnx"] if quantize else []) + list(SIDE_FILES)
+    info = {
+        "fingerprint": fingerprint,
+        "model_dir": os.path.abspath(model_dir),
+        "quantize": quantize,
+        "opset_version": opset_version,
+        "export_seconds": round(time.perf_counter() - start, 1),
+        "files": {name: os.path.getsize(os.path.join(output_dir, name)) for name in artifacts},
+    }
+    with open(os.path.join(output_dir, BUILD_INFO), "w", encoding="utf-8") as f:
+        json.dump(info, f, ensure_ascii=False, indent=2)
+    print(f"导出完成: {output_dir}，耗时 {info['export_seconds']} 秒")
+    return info
+
+
+def normalize_text(text: str) -> str:
+    """计算 CER 前去除标签、标点、空白和表情，英文统一为小写"""
+    text = rich_transcription_postprocess(text).lower()
+    return "".join(c for c in text if unicodedata.category(c)[0] in "LN")
+
+
+def edit_distance(ref: str, hyp: str) -> int:
+    prev = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, start=1):
+        cur = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, start=1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (r != h))
+        prev = cur
+    return prev[-1]
+
+
+def load_reference(path: str) -> List[Dict[str, Any]]:
+    """读取参考集，音频解码为 16kHz 单声道"""
+    base_dir = os.path.dirname(os.path.abspath(path))
+    samples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            audio, _ = librosa.load(os.path.join(base_dir, item["audio"]), sr=SAMPLE_RATE)
+            samples.append({"audio": audio.astype(np.float32), "text": item["text"]})
+    if not samples:
+        raise ValueError(f"参考集为空: {path}")
+    return samples
+
+
+def load_engine(engine: str, model_dir: str, output_dir: str, ncpu: int):
+    if engine == "torch":
+        return AutoModel(
+            model=model_dir,
+            trust_remote_code=True,
+            remote_code="remote_code_model.py",
+            device="cpu",
+            ncpu=ncpu,
+            disable_pbar=True,
+        )
+    return OnnxSenseVoice(output_dir, quantize=engine == "int8", device="cpu", ncpu=ncpu)
+
+
+def evaluate(model, samples: List[Dict[str, Any]], language: str, use_itn: bool) -> Dict[str, float]:
+    """逐条识别参考集，返回 CER 和 RTF，计时前先识别一次第一条音频预热"""
+    model.generate(input=[samples[0]["audio"]], language=language, use_itn=use_itn, batch_size=1)
+    errors = chars = 0
+    elapsed = 0.0
+    for sample in samples:
+        start = time.perf_counter()
+        result = model.generate(input=[sample["audio"]], language=language, use_itn=use_itn, batch_size=1)
+        elapsed += time.perf_counter() - start
+        ref = normalize_text(sample["text"])
+        errors += edit_distance(ref, normalize_text(result[0]["text"]))
+        chars += len(ref)
+    audio_seconds = sum(len(sample["audio"]) for sample in samples) / SAMPLE_RATE
+    return {
+        "cer": errors / max(chars, 1),
+        "rtf": elapsed / audio_seconds,
+        "audio_seconds": round(audio_seconds, 1),
+    }
+
+
+def gate(results: Dict[str, Dict[str, float]], baseline: str, candidate: str,
+         max_cer_delta: float, max_rtf_ratio: float) -> List[str]:
+    """检查候选引擎相对基线的 CER 和 RTF，返回未通过的原因，全部通过时为空列表"""
+    base, cand = results[baseline], results[candidate]
+    failures = []
+    if cand["cer"] > base["cer"] + max_cer_delta:
+        failures.append(
+            f"{candidate} 的 CER {cand['cer']:.4f} 超过 {baseline} 的 {base['cer']:.4f} + {max_cer_delta}"
+        )
+    if cand["rtf"] > base["rtf"] * max_rtf_ratio:
+        failures.append(
+            f"{candidate} 的 RTF {cand['rtf']:.4f} 超过 {baseline} 的 {base['rtf']:.4f} x {max_rtf_ratio}"
+        )
+    return failures
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="导出 SenseVoiceSmall 的 ONNX 模型并评测")
+    parser.add_argument("--model-dir", default="./iic/SenseVoiceSmall", help="PyTorch 模型目录")
+    parser.add_argument("--output-dir", default="./iic/SenseVoiceSmall-onnx", help="ONNX 模型输出目录")
+    parser.add_argument("--no-quantize", action="store_true", help="不导出 int8 量化模型")
+    parser.add_argument("--opset-version", type=int, default=14, help="ONNX opset 版本")
+    parser.add_argument("--force", action="store_true", help="忽略已有产物，重新导出")
+    parser.add_argument("--reference", help="参考集 JSON Lines 文件，提供时评测 CER 和 RTF")
+    parser.add_argument("--baseline", choices=ENGINES, default="torch", help="基线引擎")
+    parser.add_argument("--candidate", choices=ENGINES, default="int8", help="候选引擎")
+    parser.add_argument("--max-cer-delta", type=float, default=0.005, help="候选引擎 CER 允许比基线高出的值")
+    parser.add_argument("--max-rtf-ratio", type=float, default=1.0, help="候选引擎 RTF 允许为基线的倍数")
+    parser.add_argument("--language", default="auto", help="识别语种")
+    parser.add_argument("--no-itn", action="store_true", help="不使用 ITN")
+    parser.add_argument("--ncpu", type=int, default=4, help="推理线程数")
+    parser.add_argument("--report", help="评测结果输出的 JSON 文件")
+    args = parser.parse_args(argv)
+
+    quantize = not args.no_quantize
+    if not quantize and "int8" in (args.baseline, args.candidate):
+        parser.error("--no-quantize 时不能评测 int8 引擎")
+    info = build(args.model_dir, args.output_dir, quantize, args.opset_version, args.force)
+    if not args.reference:
+        return 0
+
+    samples = load_reference(args.reference)
+    results = {}
+    for engine in dict.fromkeys([args.baseline, args.candidate]):
+        model = load_engine(engine, args.model_dir, args.output_dir, args.ncpu)
+        results[engine] = evaluate(model, samples, args.language, not args.no_itn)
+        print(f"{engine:>6}  CER {results[engine]['cer']:.4f}  RTF {results[engine]['rtf']:.4f}")
+        del model
+
+    failures = gate(results, args.baseline, args.candidate, args.max_cer_delta, args.max_rtf_ratio)
+    for failure in failures:
+        print(f"未通过: {failure}")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({
+                "build": info,
+                "samples": len(samples),
+                "results": results,
+                "baseline": args.baseline,
+                "candidate": args.candidate,
+                "passed": not failures,
+                "failures": failures,
+            }, f, ensure_ascii=False, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,5 +13,51 @@ class Settings:
     MODEL_DIR= os.getenv("MODEL_DIR", "./iic/SenseVoiceSmall")
     # cuda 设备,默认使用第一个设备 多设备
     CUDA_DEVICE = os.getenv("CUDA_DEVICE", "cuda:0")
+    # 服务进程数，每个进程加载一份模型；CPU 部署时可按核数设置多个
+    WORKERS = int(os.getenv("WORKERS", 1))
+    # 每个进程的推理线程数，0 表示按 CPU 核数 / WORKERS 自动确定
+    NCPU = int(os.getenv("NCPU", 0))
+    # 识别引擎：torch（PyTorch 模型）/ onnx（build_onnx.py 导出的 ONNX 模型，适合纯 CPU 部署，不支持流式识别和 token 时间戳）
+    ASR_ENGINE = os.getenv("ASR_ENGINE", "torch").lower()
+    # onnx 引擎的模型目录，即 build_onnx.py 的输出目录
+    ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "./iic/SenseVoiceSmall-onnx")
+    # onnx 引擎是否使用 int8 量化模型
+    ONNX_QUANTIZE = os.getenv("ONNX_QUANTIZE", "true").lower() == "true"
+    # onnx 引擎批次特征长度补齐的帧数倍数，长度相近的批次可以复用输出缓冲区；大于 1 时模型须由 build_onnx.py 导出
+    ONNX_PAD_MULTIPLE = int(os.getenv("ONNX_PAD_MULTIPLE", 1))
+    # VAD 模型
+    VAD_MODEL = os.getenv("VAD_MODEL", "fsmn-vad")
+    # VAD 单个片段的最大时长（毫秒）
+    VAD_MAX_SEGMENT_MS = int(os.getenv("VAD_MAX_SEGMENT_MS", 30000))
+    # 相邻 VAD 片段合并后的最大时长（秒）
+    MERGE_LENGTH_S = float(os.getenv("MERGE_LENGTH_S", 15))
+    # 一个批次内片段补齐后的最大总时长（秒）
+    BATCH_SIZE_S = float(os.getenv("BATCH_SIZE_S", 60))
+    # 批次未满时等待其他请求片段的最长时间（毫秒）
+    BATCH_WAIT_MS = float(os.getenv("BATCH_WAIT_MS", 10))
+    # 流式识别时 VAD 每次处理的音频时长（毫秒）
+    STREAM_CHUNK_MS = int(os.getenv("STREAM_CHUNK_MS", 200))
+    # 流式识别编码器每块的帧数，每帧 60 毫秒
+    STREAM_ENCODER_CHUNK = int(os.getenv("STREAM_ENCODER_CHUNK", 10))
+    # 流式识别编码器每块的前瞻帧数，至少为 1
+    STREAM_LOOKAHEAD = max(1, int(os.getenv("STREAM_LOOKAHEAD", 5)))
+    # 流式识别编码器注意力可以看到的历史块数，-1 表示当前语音段的全部历史
+    STREAM_LOOK_BACK = int(os.getenv("STREAM_LOOK_BACK", -1))
+    # 流式识别在语音段之外保留的音频时长（秒），VAD 确认语音起点时需要回溯
+    STREAM_PRE_ROLL_S = float(os.getenv("STREAM_PRE_ROLL_S", 2))
+    # 启动时是否用合成音频预热模型
+    WARMUP_ON_START = os.getenv("WARMUP_ON_START", "true").lower() == "true"
+    # 多进程部署时 Prometheus 指标的共享目录
+    METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR", "/tmp/audio_transcription_metrics")
+    # ffmpeg 可执行文件路径，用于解码音频
+    FFMPEG_PATH = os.getenv("FFMPEG_PATH", "/usr/bin/ffmpeg")
+    # 链路追踪导出方式：none（关闭）/ otlp / file
+    TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none")
+    # 上报的服务名称
+    TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "audio-transcription")
+    # OTLP HTTP 接收地址
+    TRACING_OTLP_ENDPOINT = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    # file 导出方式的输出文件，每行一个 span
+    TRACING_FILE_PATH = os.getenv("TRACING_FILE_PATH", "log/traces.jsonl")
 
 settings = Settings()
@@ -0,0 +1,74 @@
+"""SenseVoiceSmall 导出 ONNX 时使用的前向函数和导出信息，由 SenseVoiceSmall.export 调用
+
+导出的模型输入为 LFR 特征、特征长度、语种 id 和文本规整 id，输出为 CTC logits 和编码长度，
+与 utils.model_bin.SenseVoiceSmallONNX 的调用方式对应。
+"""
+
+import types
+import torch
+
+
+def export_rebuild_model(model, **kwargs):
+    model.device = kwargs.get("device")
+    model.forward = types.MethodType(export_forward, model)
+    model.export_dummy_inputs = types.MethodType(export_dummy_inputs, model)
+    model.export_input_names = types.MethodType(export_input_names, model)
+    model.export_output_names = types.MethodType(export_output_names, model)
+    model.export_dynamic_axes = types.MethodType(export_dynamic_axes, model)
+    model.export_name = types.MethodType(export_name, model)
+    return model
+
+
+def export_forward(
+    self,
+    speech: torch.Tensor,
+    speech_lengths: torch.Tensor,
+    language: torch.Tensor,
+    textnorm: torch.Tensor,
+    **kwargs,
+):
+    # 提示帧的顺序与 SenseVoiceSmall._input_query 相同：语种、事件、情感、文本规整方式
+    language_query = self.embed(language.to(speech.device)).unsqueeze(1)
+    event_emo_query = self.embed(torch.LongTensor([[1, 2]]).to(speech.device)).repeat(
+        speech.size(0), 1, 1
+    )
+    textnorm_query = self.embed(textnorm.to(speech.device)).unsqueeze(1)
+    speech = torch.cat((language_query, event_emo_query, textnorm_query, speech), dim=1)
+
+    encoder_out, encoder_out_lens = self.encoder(speech, speech_lengths + 4)
+    if isinstance(encoder_out, tuple):
+        encoder_out = encoder_out[0]
+
+    ctc_logits = self.ctc.ctc_lo(encoder_out)
+    return ctc_logits, encoder_out_lens
+
+
+def export_dummy_inputs(self):
+    speech = torch.randn(2, 30, 560)
+    speech_lengths = torch.tensor([6, 30], dtype=torch.int32)
+    language = torch.tensor([0, 0], dtype=torch.int32)
+    textnorm = torch.tensor([15, 15], dtype=torch.int32)
+    return (speech, speech_lengths, language, textnorm)
+
+
+def export_input_names(self):
+    return ["speech", "speech_lengths", "language", "textnorm"]
+
+
+def export_output_names(self):
+    return ["ctc_logits", "encoder_out_lens"]
+
+
+def export_dynamic_axes(self):
+    return {
+        "speech": {0: "batch_size", 1: "feats_length"},
+        "speech_lengths": {0: "batch_size"},
+        "language": {0: "batch_size"},
+        "textnorm": {0: "batch_size"},
+        "ctc_logits": {0: "batch_size", 1: "logits_length"},
+        "encoder_out_lens": {0: "batch_size"},
+    }
+
+
+def export_name(self):
+    return "model.onnx"
@@ -1,11 +1,41 @@
+import asyncio
+import os
+import shutil
 from fastapi import FastAPI
-from routes import router
 from config import settings
 
-app = FastAPI()
-app.include_router(router)
+# 多进程部署时各进程的指标写入共享目录，需要在导入 prometheus_client 之前设置。
+# 工作进程以 main 模块重新导入本文件，只有主进程清理上次运行遗留的指标文件
+if settings.WORKERS > 1:
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", settings.METRICS_MULTIPROC_DIR)
+    if __name__ == "__main__":
+        shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+
+def create_app() -> FastAPI:
+    """创建应用，导入路由时加载模型，启动后在后台预热"""
+    from routes import router, processor
+
+    app = FastAPI()
+    app.include_router(router)
+
+    async def start_warm_up():
+        # 预热在后台执行，服务先开始监听，预热期间 /healthz 即可响应
+        app.state.warm_up_task = asyncio.get_running_loop().create_task(processor.warm_up())
+
+    app.add_event_handler("startup", start_warm_up)
+    app.add_event_handler("shutdown", processor.shutdown)
+    return app
+
 
 if __name__ == "__main__":
     import uvicorn
     print(f"\nAPI Documentation available at: http://{settings.HOST}:{settings.PORT}/docs\n")
-    uvicorn.run(app, host=settings.HOST, port=settings.PORT)
\ No newline at end of file
+    if settings.WORKERS > 1:
+        # 每个工作进程各自加载一份模型，主进程只负责管理
+        uvicorn.run("main:app", host=settings.HOST, port=settings.PORT, workers=settings.WORKERS)
+    else:
+        uvicorn.run(create_app(), host=settings.HOST, port=settings.PORT)
+else:
+    app = create_app()
@@ -0,0 +1,66 @@
+"""语音转写服务的 Prometheus 指标"""
+
+from prometheus_client import Counter, Histogram
+
+# 转写请求总数
+TRANSCRIPTION_REQUESTS_TOTAL = Counter(
+    "audio_transcription_requests_total",
+    "语音转写请求总数",
+    ["status"],
+)
+
+# 音频解码耗时
+TRANSCRIPTION_DECODE_SECONDS = Histogram(
+    "audio_transcription_decode_seconds",
+    "音频解码与重采样耗时（秒）",
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+# 模型推理耗时，每个批次记录一次
+TRANSCRIPTION_INFERENCE_SECONDS = Histogram(
+    "audio_transcription_inference_seconds",
+    "语音转写模型单个批次的推理耗时（秒）",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+# 每个批次包含的语音片段数
+TRANSCRIPTION_BATCH_SEGMENTS = Histogram(
+    "audio_transcription_batch_segments",
+    "语音转写每个批次包含的片段数",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+
+# 批次送入模型的帧数，kind 为 speech（片段本身）或 padding（补齐到批次内最长片段）
+TRANSCRIPTION_BATCH_FRAMES_TOTAL = Counter(
+    "audio_transcription_batch_frames_total",
+    "语音转写批次送入模型的帧数",
+    ["kind"],
+)
+
+# 每个批次中补齐帧数占总帧数的比例
+TRANSCRIPTION_BATCH_PADDING_RATIO = Histogram(
+    "audio_transcription_batch_padding_ratio",
+    "语音转写每个批次的补齐帧占比",
+    buckets=(0.01, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 0.9),
+)
+
+# 片段从入队到开始推理的等待时间
+TRANSCRIPTION_BATCH_WAIT_SECONDS = Histogram(
+    "audio_transcription_batch_wait_seconds",
+    "语音片段等待组批的时间（秒）",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+# 实时率：请求处理耗时 / 音频时长，小于 1 表示快于实时
+TRANSCRIPTION_REALTIME_FACTOR = Histogram(
+    "audio_transcription_realtime_factor",
+    "语音转写实时率（请求处理耗时 / 音频时长）",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2),
+)
+
+# 流式识别处理一块音频的耗时，包含 VAD、中间结果和语音段结束时的整段识别
+TRANSCRIPTION_STREAM_CHUNK_SECONDS = Histogram(
+    "audio_transcription_stream_chunk_seconds",
+    "流式识别处理一块音频的耗时（秒）",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
@@ -1,10 +1,16 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional
+
+class TokenTimestamp(BaseModel):
+    token: str = Field(..., description="Token text")
+    start: float = Field(..., description="Token start time in seconds")
+    end: float = Field(..., description="Token end time in seconds")
 
 class Segment(BaseModel):
     start: float = Field(..., description="Segment start time in seconds")
     end: float = Field(..., description="Segment end time in seconds")
     text: str = Field(..., description="Transcribed text for this segment")
+    tokens: Optional[List[TokenTimestamp]] = Field(None, description="Token-level timestamps, if requested")
 
 class ApiResponse(BaseModel):
     status: str = Field(..., description="Response status, e.g., success or failure")
@@ -12,4 +18,5 @@ class ApiResponse(BaseModel):
     message: Optional[str] = Field(None, description="Additional message about the processing status")
     transcription: Optional[str] = Field(None, description="Full transcribed text")
     transcription_path: Optional[str] = Field(None, description="Path to the saved transcription file")
-    segments: Optional[List[Segment]] = Field(None, description="List of transcribed segments")
\ No newline at end of file
+    segments: Optional[List[Segment]] = Field(None, description="List of transcribed segments")
+    subtitle_paths: Optional[Dict[str, str]] = Field(None, description="Paths to the exported subtitle files, keyed by format")
@@ -0,0 +1,69 @@
+"""ONNX 识别引擎
+
+把 build_onnx.py 导出的 SenseVoiceSmallONNX 模型封装为与 funasr AutoModel 相同的 generate 接口，
+AudioProcessor 和评测脚本调用时不需要区分引擎。纯 CPU 部署时配合 int8 量化模型使用。
+"""
+
+import os
+from typing import Any, Dict, List
+from funasr.tokenizer.sentencepiece_tokenizer import SentencepiecesTokenizer
+from utils.model_bin import SenseVoiceSmallONNX
+
+# 语种和文本规整方式在模型 embedding 中的编号，与 SenseVoiceSmall.lid_dict / textnorm_dict 一致
+LANGUAGE_IDS = {"auto": 0, "zh": 3, "en": 4, "yue": 7, "ja": 11, "ko": 12, "nospeech": 13}
+TEXTNORM_IDS = {"withitn": 14, "woitn": 15}
+# 拼接在特征前的提示帧数，这些帧输出语种、情感等标签，与 PyTorch 推理一样不计入文本
+NUM_QUERY_FRAMES = 4
+# SentencePiece 模型文件，build_onnx.py 会复制到导出目录
+BPE_MODEL = "chn_jpn_yue_eng_ko_spectok.bpe.model"
+
+
+def onnx_device_id(device: str) -> int:
+    """把 cuda:N / cpu 形式的设备名转换为 onnxruntime 的 GPU 编号，CPU 为 -1"""
+    if device.startswith("cuda"):
+        return int(device.split(":")[1]) if ":" in device else 0
+    return -1
+
+
+class OnnxSenseVoice:
+    """SenseVoiceSmall 的 ONNX 推理
+
+    Args:
+        model_dir: build_onnx.py 的输出目录
+        quantize: 是否使用 int8 量化模型 model_quant.onnx
+        device: 推理设备，cuda:N 或 cpu
+        ncpu: 推理线程数
+        pad_multiple: 批次特征长度补齐的帧数倍数
+    """
+
+    def __init__(self, model_dir: str, quantize: bool = True, device: str = "cpu",
+                 ncpu: int = 4, pad_multiple: int = 1):
+        self.model = SenseVoiceSmallONNX(
+            model_dir=model_dir,
+            device_id=onnx_device_id(device),
+            quantize=quantize,
+            intra_op_num_threads=ncpu,
+            pad_multiple=pad_multiple,
+        )
+        self.tokenizer = SentencepiecesTokenizer(bpemodel=os.path.join(model_dir, BPE_MODEL))
+
+    def generate(self, input, language: str = "auto", use_itn: bool = False,
+                 batch_size: int = 1, **kwargs) -> List[Dict[str, Any]]:
+        """批量识别，返回格式与 AutoModel.generate 相同
+
+        ONNX 模型只输出 CTC logits，不支持 output_timestamp，请求 token 时间戳时抛出 ValueError。
+        """
+        if kwargs.get("output_timestamp"):
+            raise ValueError("onnx 识别引擎不支持 token 时间戳")
+        inputs = input if isinstance(input, list) else [input]
+        token_ids = self.model(
+            inputs,
+            language=[LANGUAGE_IDS.get(language, 0)],
+            textnorm=[TEXTNORM_IDS["withitn" if use_itn else "woitn"]],
+            batch_size=max(1, batch_size),
+            skip_frames=NUM_QUERY_FRAMES,
+        )
+        return [
+            {"key": str(i), "text": self.tokenizer.decode(token_int)}
+            for i, token_int in enumerate(token_ids)
+        ]
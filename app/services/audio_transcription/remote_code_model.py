@@ -47,6 +47,14 @@ class SinusoidalPositionEncoder(torch.nn.Module):
 
         return x + position_encoding
 
+    def forward_chunk(self, x, start_idx: int = 0):
+        """流式推理时位置从 start_idx + 1 开始，与整段推理时同一帧的位置编码相同"""
+        batch_size, timesteps, input_dim = x.size()
+        positions = torch.arange(start_idx + 1, start_idx + timesteps + 1, device=x.device)[None, :]
+        position_encoding = self.encode(positions, input_dim, x.dtype).to(x.device)
+
+        return x + position_encoding
+
 
 class PositionwiseFeedForward(torch.nn.Module):
     """Positionwise feed forward layer.
@@ -549,7 +557,8 @@ class SenseVoiceEncoderSmall(nn.Module):
         ilens: torch.Tensor,
     ):
         """Embed positions in tensor."""
-        masks = sequence_mask(ilens, device=ilens.device)[:, None, :]
+        # 掩码长度取输入长度，批次补齐到超过最长音频时（如 ONNX 推理按倍数补齐）同样适用
+        masks = sequence_mask(ilens, maxlen=xs_pad.size(1), device=ilens.device)[:, None, :]
 
         xs_pad *= self.output_size() ** 0.5
 
@@ -576,6 +585,50 @@ class SenseVoiceEncoderSmall(nn.Module):
         xs_pad = self.tp_norm(xs_pad)
         return xs_pad, olens
 
+    def init_chunk_cache(self) -> dict:
+        """创建流式推理的缓存：位置编码的起点和每层注意力的 key/value"""
+        return {
+            "start_idx": 0,
+            "encoders0": [None] * len(self.encoders0),
+            "encoders": [None] * len(self.encoders),
+            "tp_encoders": [None] * len(self.tp_encoders),
+        }
+
+    def forward_chunk(
+        self,
+        xs: torch.Tensor,
+        cache: dict,
+        chunk_size: list,
+        look_back: int = -1,
+    ) -> torch.Tensor:
+        """流式推理一个特征块
+
+        Args:
+            xs: [1, T, D] 的特征块，末尾 chunk_size[2] 帧为前瞻帧，下一块从这些帧开始
+            cache: init_chunk_cache 创建的缓存，原地更新
+            chunk_size: [0, 块长, 前瞻帧数]，前瞻帧数至少为 1
+            look_back: 注意力可以看到的历史块数，-1 表示当前语音段的全部历史
+
+        Returns:
+            torch.Tensor: [1, T, output_size] 的编码结果，前瞻帧的输出会在下一块重新计算
+        """
+        xs = xs * self.output_size() ** 0.5
+        xs = self.embed.forward_chunk(xs, cache["start_idx"])
+        cache["start_idx"] += xs.size(1) - chunk_size[2]
+
+        for name in ("encoders0", "encoders"):
+            layer_caches = cache[name]
+            for i, encoder_layer in enumerate(getattr(self, name)):
+                xs, layer_caches[i] = encoder_layer.forward_chunk(
+                    xs, layer_caches[i], chunk_size, look_back
+                )
+        xs = self.after_norm(xs)
+
+        layer_caches = cache["tp_encoders"]
+        for i, encoder_layer in enumerate(self.tp_encoders):
+            xs, layer_caches[i] = encoder_layer.forward_chunk(xs, layer_caches[i], chunk_size, look_back)
+        return self.tp_norm(xs)
+
 
 @tables.register("model_classes", "SenseVoiceSmall")
 class SenseVoiceSmall(nn.Module):
@@ -778,6 +831,66 @@ class SenseVoiceSmall(nn.Module):
         return loss_rich, acc_rich
 
 
+    def _input_query(self, language: str, textnorm: str, batch_size: int, device) -> torch.Tensor:
+        """拼接在特征前面的 4 帧提示：语种、事件、情感、文本规整方式"""
+        language_query = self.embed(
+            torch.LongTensor(
+                [[self.lid_dict[language] if language in self.lid_dict else 0]]
+            ).to(device)
+        ).repeat(batch_size, 1, 1)
+        event_emo_query = self.embed(torch.LongTensor([[1, 2]]).to(device)).repeat(batch_size, 1, 1)
+        textnorm_query = self.embed(
+            torch.LongTensor([[self.textnorm_dict[textnorm]]]).to(device)
+        ).repeat(batch_size, 1, 1)
+        return torch.cat((language_query, event_emo_query, textnorm_query), dim=1)
+
+    def init_chunk_cache(self, language: str = "auto", use_itn: bool = False, device="cpu") -> dict:
+        """创建一段语音的流式识别状态"""
+        textnorm = "withitn" if use_itn else "woitn"
+        return {
+            "query": self._input_query(language, textnorm, 1, device),
+            "encoder": self.encoder.init_chunk_cache(),
+            "prev_token": self.blank_id,
+        }
+
+    def inference_chunk(
+        self,
+        speech: torch.Tensor,
+        cache: dict,
+        chunk_size: list,
+        look_back: int = -1,
+    ) -> list:
+        """流式识别一个特征块，贪心解码 CTC 输出
+
+        第一块前面拼接与整段推理相同的 4 帧提示，提示帧的输出不参与解码。
+        前瞻帧的输出不解码，由下一块重新计算；相邻块之间按上一块最后一帧合并重复 token。
+
+        Args:
+            speech: [1, T, D] 的 LFR 特征块，末尾 chunk_size[2] 帧为前瞻帧
+            cache: init_chunk_cache 创建的状态，原地更新
+            chunk_size: [0, 块长, 前瞻帧数]
+            look_back: 注意力可以看到的历史块数，-1 表示全部
+
+        Returns:
+            list: 本块新识别出的 token id
+        """
+        num_query = 0
+        if cache["encoder"]["start_idx"] == 0:
+            speech = torch.cat((cache["query"], speech), dim=1)
+            num_query = cache["query"].size(1)
+
+        encoder_out = self.encoder.forward_chunk(speech, cache["encoder"], chunk_size, look_back)
+        yseq = self.ctc.argmax(encoder_out)[0, num_query : encoder_out.size(1) - chunk_size[2]]
+
+        token_int = []
+        prev_token = cache["prev_token"]
+        for token in yseq.tolist():
+            if token != prev_token and token != self.blank_id:
+                token_int.append(token)
+            prev_token = token
+        cache["prev_token"] = prev_token
+        return token_int
+
     def inference(
         self,
         data_in,
@@ -823,30 +936,15 @@ class SenseVoiceSmall(nn.Module):
         speech_lengths = speech_lengths.to(device=kwargs["device"])
 
         language = kwargs.get("language", "auto")
-        language_query = self.embed(
-            torch.LongTensor(
-                [[self.lid_dict[language] if language in self.lid_dict else 0]]
-            ).to(speech.device)
-        ).repeat(speech.size(0), 1, 1)
-        
         use_itn = kwargs.get("use_itn", False)
         output_timestamp = kwargs.get("output_timestamp", False)
 
         textnorm = kwargs.get("text_norm", None)
         if textnorm is None:
             textnorm = "withitn" if use_itn else "woitn"
-        textnorm_query = self.embed(
-            torch.LongTensor([[self.textnorm_dict[textnorm]]]).to(speech.device)
-        ).repeat(speech.size(0), 1, 1)
-        speech = torch.cat((textnorm_query, speech), dim=1)
-        speech_lengths += 1
-
-        event_emo_query = self.embed(torch.LongTensor([[1, 2]]).to(speech.device)).repeat(
-            speech.size(0), 1, 1
-        )
-        input_query = torch.cat((language_query, event_emo_query), dim=1)
+        input_query = self._input_query(language, textnorm, speech.size(0), speech.device)
         speech = torch.cat((input_query, speech), dim=1)
-        speech_lengths += 3
+        speech_lengths += 4
 
         # Encoder
         encoder_out, encoder_out_lens = self.encoder(speech, speech_lengths)
@@ -854,9 +952,43 @@ class SenseVoiceSmall(nn.Module):
             encoder_out = encoder_out[0]
 
         # c. Passed the encoder result and the beam search
-        ctc_logits = self.ctc.log_softmax(encoder_out)
+        # 整个批次一起解码：前 4 帧是提示帧，输出语种、情感等标签，不计入文本
+        logits = self.ctc.ctc_lo(encoder_out)[:, 4:, :]
+        speech_lens = encoder_out_lens - 4
+        probs = None
+        if output_timestamp:
+            # 强制对齐使用的逐帧概率，整个批次只计算一次 softmax
+            probs = logits.softmax(dim=-1)
         if kwargs.get("ban_emo_unk", False):
-            ctc_logits[:, :, self.emo_dict["unk"]] = -float("inf")
+            logits[:, :, self.emo_dict["unk"]] = -float("inf")
+        yseq = logits.argmax(dim=-1)
+
+        # 去掉重复和 blank：保留与前一帧不同、不是 blank 且在有效长度内的帧，等价于逐条
+        # unique_consecutive 后去 blank；被去掉的帧标为 -1
+        keep = yseq != self.blank_id
+        keep[:, 1:] &= yseq[:, 1:] != yseq[:, :-1]
+        keep &= torch.arange(yseq.size(1), device=yseq.device)[None, :] < speech_lens[:, None]
+        tokens_pad = torch.where(keep, yseq, torch.full_like(yseq, -1))
+        # 有效长度和解码结果拼在一起，只做一次设备到主机的拷贝
+        packed = torch.cat((speech_lens[:, None].to(yseq.dtype), tokens_pad), dim=1).cpu().numpy()
+        speech_lens_host = packed[:, 0]
+        token_ints = [row[row >= 0].tolist() for row in packed[:, 1:]]
+
+        alignments = None
+        if output_timestamp:
+            # 输出为 blank 的帧不允许对齐到 blank，与逐条对齐时相同
+            probs[..., self.blank_id].masked_fill_(yseq == self.blank_id, 0)
+            max_tokens = max(1, max(len(token_int) for token_int in token_ints))
+            targets = torch.full((len(token_ints), max_tokens), self.ignore_id, dtype=torch.long)
+            for i, token_int in enumerate(token_ints):
+                targets[i, : len(token_int)] = torch.tensor(token_int, dtype=torch.long)
+            alignments = ctc_forced_align(
+                probs.float(),
+                targets,
+                torch.from_numpy(speech_lens_host).long(),
+                torch.tensor([len(token_int) for token_int in token_ints], dtype=torch.long),
+                ignore_id=self.ignore_id,
+            ).cpu().numpy()
 
         results = []
         b, n, d = encoder_out.size()
@@ -865,9 +997,7 @@ class SenseVoiceSmall(nn.Module):
         if len(key) < b:
             key = key * b
         for i in range(b):
-            x = ctc_logits[i, : encoder_out_lens[i].item(), :]
-            yseq = x.argmax(dim=-1)
-            yseq = torch.unique_consecutive(yseq[4:], dim=-1)
+            token_int = token_ints[i]
 
             ibest_writer = None
             if kwargs.get("output_dir") is not None:
@@ -875,9 +1005,6 @@ class SenseVoiceSmall(nn.Module):
                     self.writer = DatadirWriter(kwargs.get("output_dir"))
                 ibest_writer = self.writer[f"1best_recog"]
 
-            mask = yseq != self.blank_id
-            token_int = yseq[mask].tolist()
-
             # Change integer-ids to tokens
             text = tokenizer.decode(token_int)
             if ibest_writer is not None:
@@ -886,28 +1013,14 @@ class SenseVoiceSmall(nn.Module):
             if output_timestamp:
                 from itertools import groupby
                 timestamp = []
-                tokens = tokenizer.text2tokens(text)[4:]
-
-                logits_speech = self.ctc.softmax(encoder_out)[i, 4:encoder_out_lens[i].item(), :]
-
-                pred = logits_speech.argmax(-1).cpu()
-                logits_speech[pred==self.blank_id, self.blank_id] = 0
-
-                align = ctc_forced_align(
-                    logits_speech.unsqueeze(0).float(),
-                    torch.Tensor(token_int[4:]).unsqueeze(0).long().to(logits_speech.device),
-                    (encoder_out_lens-4).long(),
-                    torch.tensor(len(token_int)-4).unsqueeze(0).long().to(logits_speech.device),
-                    ignore_id=self.ignore_id,
-                )
-
-                pred = groupby(align[0, :encoder_out_lens[0]])
+                tokens = tokenizer.text2tokens(text)
+                ts_max = int(speech_lens_host[i])
+                pred = groupby(alignments[i, :ts_max])
                 _start = 0
                 token_id = 0
-                ts_max = encoder_out_lens[i] - 4
                 for pred_token, pred_frame in pred:
                     _end = _start + len(list(pred_frame))
-                    if pred_token != 0:
+                    if pred_token != self.blank_id and token_id < len(tokens):
                         ts_left = max((_start*60-30)/1000, 0)
                         ts_right = min((_end*60-30)/1000, (ts_max*60-30)/1000)
                         timestamp.append([tokens[token_id], ts_left, ts_right])
@@ -1,12 +1,19 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
+from prometheus_client import CollectorRegistry, generate_latest, multiprocess, CONTENT_TYPE_LATEST
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from models import ApiResponse
 from audio_processor import AudioProcessor
+from subtitles import SUBTITLE_FORMATS, write_subtitles
+from streaming import STREAM_SAMPLE_FORMATS, StreamingSession, decode_samples
 from funasr.utils.postprocess_utils import rich_transcription_postprocess
+import json
 import os
 import traceback
 import logger
+from metrics import TRANSCRIPTION_REQUESTS_TOTAL
+from tracing import start_span
 
 router = APIRouter()
 processor = AudioProcessor(model_dir="./iic/SenseVoiceSmall")
@@ -18,9 +25,103 @@ class AudioRequest(BaseModel):
     task_id: str
     language: str = "zn"  # 可选，默认 "zn"
     model: str = "medium"  # 可选，默认 "medium"
+    pcm_path: Optional[str] = None  # 可选，音频分离服务输出的 16kHz 单声道 float32 原始采样，提供时跳过解码
+    token_timestamps: bool = False  # 可选，是否在分段中输出 token 级时间戳
+    subtitle_formats: List[str] = ["srt", "vtt", "json"]  # 可选，需要导出的字幕格式，为空时不导出
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    """输出 Prometheus 指标，多进程部署时汇总所有进程的指标"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@router.get("/healthz", include_in_schema=False)
+def healthz():
+    """存活检查：进程能够响应请求即返回 200"""
+    return {"status": "ok"}
+
+@router.get("/readyz", include_in_schema=False)
+def readyz():
+    """就绪检查：模型加载并预热完成后返回 200，之前返回 503"""
+    if not processor.ready:
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    return {"status": "ready"}
 
 @router.post("/api/v1/audio-transcription/process", response_model=ApiResponse)
-async def upload_audio(request: AudioRequest):
+async def upload_audio(request: AudioRequest, http_request: Request):
+    with start_span(
+        "audio_transcription.request",
+        {"task_id": request.task_id, "language": request.language},
+        carrier=dict(http_request.headers),
+    ) as span:
+        response = await _upload_audio(request)
+        span.set_attribute("status", response.status)
+    TRANSCRIPTION_REQUESTS_TOTAL.labels(status=response.status).inc()
+    return response
+
+@router.websocket("/api/v1/audio-transcription/stream")
+async def stream_audio(websocket: WebSocket, language: str = "auto", use_itn: bool = True,
+                       sample_format: str = "f32le"):
+    """流式转写
+
+    客户端以二进制消息连续发送 16kHz 单声道音频（sample_format 为 f32le 或 s16le），
+    发送文本消息 {"event": "end"} 表示音频结束。服务端返回 JSON 消息：
+    partial 为当前语音段的中间结果，final 为语音段的最终结果，
+    done 包含完整文本和全部分段，发送后关闭连接；出错时返回 error。
+    """
+    if sample_format not in STREAM_SAMPLE_FORMATS:
+        await websocket.close(code=1003, reason=f"不支持的采样格式: {sample_format}")
+        return
+    if processor.engine != "torch":
+        await websocket.close(code=1011, reason="流式转写只支持 torch 识别引擎")
+        return
+    await websocket.accept()
+    session = StreamingSession(processor, language=language, use_itn=use_itn)
+    segments = []
+    status = "success"
+    with start_span("audio_transcription.stream", {"language": language}) as span:
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(message.get("code", 1000))
+                if message.get("bytes") is not None:
+                    events = await session.accept(decode_samples(message["bytes"], sample_format))
+                    await _send_stream_events(websocket, events, segments)
+                elif json.loads(message.get("text") or "{}").get("event") == "end":
+                    break
+
+            events = await session.finish()
+            await _send_stream_events(websocket, events, segments)
+            await websocket.send_json({
+                "type": "done",
+                "text": " ".join(segment["text"] for segment in segments),
+                "segments": segments,
+            })
+            await websocket.close()
+        except WebSocketDisconnect:
+            status = "disconnected"
+        except Exception as e:
+            status = "error"
+            new_logger.error(f"流式转写失败\n{traceback.format_exc()}")
+            await websocket.send_json({"type": "error", "message": f"服务器内部错误: {str(e)}"})
+            await websocket.close(code=1011)
+        span.set_attribute("status", status)
+        span.set_attribute("segments", len(segments))
+    TRANSCRIPTION_REQUESTS_TOTAL.labels(status=status).inc()
+
+async def _send_stream_events(websocket: WebSocket, events: list, segments: list):
+    """去除识别结果中的语种、情感等标签后发送，最终结果同时记入 segments"""
+    for event in events:
+        event = dict(event, text=rich_transcription_postprocess(event["text"]))
+        if event["type"] == "final" and event["text"]:
+            segments.append({key: event[key] for key in ("start", "end", "text")})
+        await websocket.send_json(event)
+
+async def _upload_audio(request: AudioRequest):
     try:
         # 验证输入路径
         if not os.path.exists(request.audio_path):
@@ -62,6 +163,23 @@ async def upload_audio(request: AudioRequest):
                 message=f"不支持的文件格式: {file_ext}",
                 task_id=request.task_id
             )
+
+        # 验证字幕格式
+        unsupported_formats = [fmt for fmt in request.subtitle_formats if fmt not in SUBTITLE_FORMATS]
+        if unsupported_formats:
+            return ApiResponse(
+                status="error",
+                message=f"不支持的字幕格式: {', '.join(unsupported_formats)}",
+                task_id=request.task_id
+            )
+
+        # ONNX 模型只输出 CTC logits，无法给出 token 时间戳
+        if request.token_timestamps and processor.engine != "torch":
+            return ApiResponse(
+                status="error",
+                message=f"token 时间戳只支持 torch 识别引擎，当前为: {processor.engine}",
+                task_id=request.task_id
+            )
         
         # 验证文件大小
         try:
@@ -84,10 +202,13 @@ async def upload_audio(request: AudioRequest):
 
         # 生成转写结果
         try:
-            res = processor.generate_text(
+            pcm_path = request.pcm_path if request.pcm_path and os.path.exists(request.pcm_path) else None
+            res = await processor.generate_text(
                 audio_data=request.audio_path,
                 language=request.language,
-                use_itn=True
+                use_itn=True,
+                pcm_path=pcm_path,
+                output_timestamp=request.token_timestamps
             )
 
              # 处理结果
@@ -97,6 +218,17 @@ async def upload_audio(request: AudioRequest):
             with open(output_file, "w", encoding="utf-8") as f:
                 f.write(text)
 
+            # 分段文本同样去除语种、情感等标签，字幕文件与文本在同一次请求中输出
+            segments = [
+                dict(segment, text=rich_transcription_postprocess(segment["text"]))
+                for segment in res[0].get("segments", [])
+            ]
+            segments = [segment for segment in segments if segment["text"]]
+            subtitle_paths = write_subtitles(
+                segments, text, request.output_path, f"transcription_{request.task_id}",
+                request.subtitle_formats
+            )
+
             # 成功情况下的返回
             return ApiResponse(
                 status="success",
@@ -104,7 +236,8 @@ async def upload_audio(request: AudioRequest):
                 message="转写成功",
                 transcription=text,  # 实际的转写文本
                 transcription_path=output_file,  # 保存的文件路径
-                segments=res[0].get("segments", None)  # 如果有分段信息的话
+                segments=segments,
+                subtitle_paths=subtitle_paths
             )
         except Exception as e:
             error_detail = traceback.format_exc()
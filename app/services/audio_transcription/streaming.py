@@ -0,0 +1,219 @@
+"""流式语音识别
+
+客户端连续发送音频，服务端按 STREAM_CHUNK_MS 切块处理：
+1. 流式 VAD（与整段识别共用 fsmn-vad 模型，每个会话一份缓存）确定语音段的起止；
+2. 语音段内的音频经 WavFrontendOnline 提取特征，按块送入带注意力缓存的编码器，
+   贪心解码得到中间结果（partial）；
+3. 语音段结束时把整段音频交给批处理调度器做一次整段识别，得到最终结果（final），
+   与 /process 接口对同一片段的识别结果一致。
+
+模型调用都通过调度器在模型线程中执行，与批量推理串行。
+"""
+
+import time
+from typing import Any, Dict, List, Optional
+import numpy as np
+import torch
+from config import settings
+from audio_processor import SAMPLE_RATE
+from utils.frontend import WavFrontendOnline
+from metrics import TRANSCRIPTION_STREAM_CHUNK_SECONDS
+
+# 流式识别支持的音频采样格式，均为 16kHz 单声道
+STREAM_SAMPLE_FORMATS = ("f32le", "s16le")
+
+
+def decode_samples(data: bytes, sample_format: str) -> np.ndarray:
+    """把客户端发送的原始采样转换为 float32 数组
+
+    Args:
+        data: 原始采样字节，必须包含整数个采样
+        sample_format: 采样格式，取值见 STREAM_SAMPLE_FORMATS
+
+    Returns:
+        np.ndarray: 取值范围 [-1, 1] 的 float32 采样
+    """
+    if sample_format == "s16le":
+        if len(data) % 2:
+            raise ValueError("s16le 音频的字节数必须是 2 的倍数")
+        return np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768
+    if sample_format == "f32le":
+        if len(data) % 4:
+            raise ValueError("f32le 音频的字节数必须是 4 的倍数")
+        return np.frombuffer(data, dtype="<f4").astype(np.float32)
+    raise ValueError(f"不支持的采样格式: {sample_format}")
+
+
+class _Utterance:
+    """一个语音段的流式识别状态"""
+
+    __slots__ = ("start", "fed", "cache", "feats", "token_int")
+
+    def __init__(self, start: int, cache: dict, feat_dim: int):
+        self.start = start  # 语音段起点（采样）
+        self.fed = start  # 已送入前端的音频终点（采样）
+        self.cache = cache  # 编码器缓存和解码状态
+        self.feats = np.empty((0, feat_dim), dtype=np.float32)  # 尚未送入编码器的 LFR 特征
+        self.token_int = []
+
+
+class StreamingSession:
+    """一个流式识别连接的状态
+
+    Args:
+        processor: 已加载模型的 AudioProcessor
+        language: 语言代码
+        use_itn: 是否使用 ITN
+    """
+
+    def __init__(self, processor, language: str = "auto", use_itn: bool = True):
+        self.processor = processor
+        self.language = language
+        self.use_itn = use_itn
+        self.chunk_size = [0, settings.STREAM_ENCODER_CHUNK, settings.STREAM_LOOKAHEAD]
+        self._chunk_samples = settings.STREAM_CHUNK_MS * SAMPLE_RATE // 1000
+        self._pre_roll = int(settings.STREAM_PRE_ROLL_S * SAMPLE_RATE)
+
+        model_kwargs = processor.model.kwargs
+        self._model = processor.model.model
+        self._device = model_kwargs["device"]
+        self._tokenizer = model_kwargs["tokenizer"]
+        # 前端参数与整段识别相同（frontend_conf 中包含 am.mvn 路径），每个会话一份缓存
+        self._frontend = WavFrontendOnline(**model_kwargs["frontend_conf"])
+        self._feat_dim = self._frontend.opts.mel_opts.num_bins * self._frontend.lfr_m
+
+        self._pending = np.empty(0, dtype=np.float32)  # 不足一块、尚未送入 VAD 的音频
+        self._audio = np.empty(0, dtype=np.float32)  # 保留的音频，第一个采样位于 _audio_start
+        self._audio_start = 0
+        self._received = 0  # 已送入 VAD 的采样数
+        self._vad_cache = {}
+        self._utterance: Optional[_Utterance] = None
+
+    async def accept(self, samples: np.ndarray) -> List[Dict[str, Any]]:
+        """接收一段音频
+
+        Args:
+            samples: 16kHz 单声道 float32 采样，长度任意
+
+        Returns:
+            list: 产生的识别事件，见 _process
+        """
+        self._pending = np.concatenate((self._pending, samples))
+        events = []
+        while len(self._pending) >= self._chunk_samples:
+            chunk = self._pending[:self._chunk_samples]
+            self._pending = self._pending[self._chunk_samples:]
+            events.extend(await self._process(chunk, is_final=False))
+        return events
+
+    async def finish(self) -> List[Dict[str, Any]]:
+        """音频结束，处理剩余音频并输出未结束语音段的最终结果"""
+        chunk, self._pending = self._pending, self._pending[:0]
+        return await self._process(chunk, is_final=True)
+
+    async def _process(self, chunk: np.ndarray, is_final: bool) -> List[Dict[str, Any]]:
+        """处理一块音频
+
+        Returns:
+            list: 识别事件，{"type": "partial", "start", "text"} 为当前语音段的中间结果，
+                {"type": "final", "start", "end", "text"} 为语音段的最终结果，时间均为秒
+        """
+        start_time = time.perf_counter()
+        self._audio = np.concatenate((self._audio, chunk))
+        self._received += len(chunk)
+
+        events = []
+        vad_segments = await self.processor.scheduler.run_exclusive(self._vad, chunk, is_final)
+        for begin, end in vad_segments:
+            if begin != -1:
+                self._start_utterance(self._to_sample(begin))
+            if end != -1:
+                events.extend(await self._finish_utterance(self._to_sample(end)))
+
+        if self._utterance is not None:
+            if is_final:
+                events.extend(await self._finish_utterance(self._received))
+            else:
+                text = await self.processor.scheduler.run_exclusive(self._encode, self._received)
+                if text is not None:
+                    events.append({
+                        "type": "partial",
+                        "start": round(self._utterance.start / SAMPLE_RATE, 3),
+                        "text": text,
+                    })
+
+        # 语音段之外只保留 VAD 回溯起点所需的音频
+        keep_from = self._received - self._pre_roll
+        if self._utterance is not None:
+            keep_from = min(keep_from, self._utterance.start)
+        if keep_from > self._audio_start:
+            self._audio = self._audio[keep_from - self._audio_start:]
+            self._audio_start = keep_from
+
+        TRANSCRIPTION_STREAM_CHUNK_SECONDS.observe(time.perf_counter() - start_time)
+        return events
+
+    def _to_sample(self, ms: float) -> int:
+        """VAD 输出的毫秒时间换算为采样位置，限定在保留的音频范围内"""
+        return min(max(int(ms * SAMPLE_RATE / 1000), self._audio_start), self._received)
+
+    def _vad(self, chunk: np.ndarray, is_final: bool) -> list:
+        """流式 VAD，返回本块检测到的 [[开始毫秒, 结束毫秒], ...]，未确定的一端为 -1"""
+        result = self.processor.vad_model.generate(
+            input=chunk,
+            cache=self._vad_cache,
+            is_final=is_final,
+            chunk_size=settings.STREAM_CHUNK_MS,
+        )
+        return result[0]["value"] if result else []
+
+    def _start_utterance(self, start: int):
+        self._frontend.cache_reset()
+        cache = self._model.init_chunk_cache(self.language, self.use_itn, self._device)
+        self._utterance = _Utterance(start, cache, self._feat_dim)
+
+    def _encode(self, end: int) -> Optional[str]:
+        """把语音段中截至 end 的新音频送入前端和编码器
+
+        Returns:
+            str: 识别出新 token 时返回语音段当前的完整文本，否则为 None
+        """
+        utterance = self._utterance
+        audio = self._audio[utterance.fed - self._audio_start:end - self._audio_start]
+        utterance.fed = end
+        if len(audio):
+            feats, _ = self._frontend.extract_fbank(audio[None, :], np.array([len(audio)]))
+            if feats.ndim == 3 and feats.shape[1]:
+                # CMVN 按 float64 计算，编码器输入为 float32
+                utterance.feats = np.concatenate((utterance.feats, feats[0].astype(np.float32)))
+
+        # 每块包含前瞻帧，相邻块重叠前瞻帧数，特征不足一块时等待后续音频
+        window = self.chunk_size[1] + self.chunk_size[2]
+        num_tokens = len(utterance.token_int)
+        with torch.no_grad():
+            while len(utterance.feats) >= window:
+                speech = torch.from_numpy(np.ascontiguousarray(utterance.feats[:window]))
+                utterance.token_int.extend(self._model.inference_chunk(
+                    speech[None].to(self._device),
+                    utterance.cache,
+                    self.chunk_size,
+                    settings.STREAM_LOOK_BACK,
+                ))
+                utterance.feats = utterance.feats[self.chunk_size[1]:]
+        if len(utterance.token_int) == num_tokens:
+            return None
+        return self._tokenizer.decode(utterance.token_int)
+
+    async def _finish_utterance(self, end: int) -> List[Dict[str, Any]]:
+        """结束当前语音段，整段识别得到最终结果"""
+        utterance, self._utterance = self._utterance, None
+        if utterance is None or end <= utterance.start:
+            return []
+        audio = self._audio[utterance.start - self._audio_start:end - self._audio_start]
+        results = await self.processor.scheduler.submit([audio], self.language, self.use_itn)
+        return [{
+            "type": "final",
+            "start": round(utterance.start / SAMPLE_RATE, 3),
+            "end": round(end / SAMPLE_RATE, 3),
+            "text": results[0]["text"],
+        }]
@@ -0,0 +1,68 @@
+"""转写分段导出为字幕文件
+
+分段格式与 AudioProcessor.generate_text 返回的 segments 一致：
+{"start": 秒, "end": 秒, "text": 文本, "tokens": [{"token", "start", "end"}, ...]（可选）}
+"""
+
+import json
+import os
+from typing import Any, Dict, List
+
+# 支持导出的字幕格式
+SUBTITLE_FORMATS = ("srt", "vtt", "json")
+
+
+def _format_time(seconds: float, decimal_marker: str) -> str:
+    """格式化为 HH:MM:SS,mmm（SRT）或 HH:MM:SS.mmm（VTT）"""
+    milliseconds = max(0, int(round(seconds * 1000)))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    secs, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{decimal_marker}{milliseconds:03d}"
+
+
+def to_srt(segments: List[Dict[str, Any]]) -> str:
+    cues = [
+        f"{index}\n{_format_time(seg['start'], ',')} --> {_format_time(seg['end'], ',')}\n{seg['text']}\n"
+        for index, seg in enumerate(segments, start=1)
+    ]
+    return "\n".join(cues)
+
+
+def to_vtt(segments: List[Dict[str, Any]]) -> str:
+    cues = [
+        f"{_format_time(seg['start'], '.')} --> {_format_time(seg['end'], '.')}\n{seg['text']}\n"
+        for seg in segments
+    ]
+    return "\n".join(["WEBVTT\n"] + cues)
+
+
+def write_subtitles(segments: List[Dict[str, Any]], text: str, output_dir: str,
+                    name: str, formats: List[str]) -> Dict[str, str]:
+    """按指定格式写出字幕文件
+
+    Args:
+        segments: 转写分段
+        text: 完整转写文本，写入 JSON 文件
+        output_dir: 输出目录
+        name: 文件名（不含扩展名）
+        formats: 需要导出的格式，取值见 SUBTITLE_FORMATS
+
+    Returns:
+        dict: 格式到文件路径的映射
+    """
+    paths = {}
+    for fmt in formats:
+        path = os.path.join(output_dir, f"{name}.{fmt}")
+        if fmt == "srt":
+            content = to_srt(segments)
+        elif fmt == "vtt":
+            content = to_vtt(segments)
+        elif fmt == "json":
+            content = json.dumps({"text": text, "segments": segments}, ensure_ascii=False)
+        else:
+            raise ValueError(f"不支持的字幕格式: {fmt}")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        paths[fmt] = path
+    return paths
@@ -1,5 +1,62 @@
+import numpy as np
 import torch
 
+
+def _align_one(emission: np.ndarray, tokens: np.ndarray, blank: int) -> np.ndarray:
+    """单条音频的 CTC Viterbi 对齐
+
+    Args:
+        emission: [T, C] 的帧级得分
+        tokens: [L] 的目标序列，不含 blank
+
+    Returns:
+        np.ndarray: [T] 每帧对齐到的标签
+    """
+    num_frames = emission.shape[0]
+    if len(tokens) == 0:
+        return np.full(num_frames, blank, dtype=np.int64)
+
+    # 扩展序列 blank, y1, blank, y2, ..., blank，状态数 S = 2L + 1
+    ext = np.full(2 * len(tokens) + 1, blank, dtype=np.int64)
+    ext[1::2] = tokens
+    num_states = len(ext)
+    # 相邻两个标签不同时才允许跳过中间的 blank，不允许时跳转得分加 -inf
+    emit = emission[:, ext]
+    neg_inf = np.array(-np.inf, dtype=emit.dtype)
+    skip_penalty = np.full(num_states, neg_inf, dtype=emit.dtype)
+    skip_penalty[2:][ext[2:] != ext[:-2]] = 0
+
+    # 前面补两个 -inf，状态 s 的三个前驱 s、s-1、s-2 都可以直接切片得到
+    score = np.full(num_states + 2, neg_inf, dtype=emit.dtype)
+    score[2] = emit[0, 0]
+    score[3] = emit[0, 1]
+    # 回溯指针只有 0/1/2 三种取值（前驱相对当前状态的偏移）
+    backpointers = np.zeros((num_frames, num_states), dtype=np.uint8)
+
+    for t in range(1, num_frames):
+        # 带状搜索：第 t 帧最多到达状态 2t+1，且剩余帧数必须足够走到最后两个状态之一，
+        # 带外的状态不可能出现在最优路径上
+        lo = max(0, num_states - 2 * (num_frames - t))
+        hi = min(num_states, 2 * t + 2)
+        stay = score[lo + 2 : hi + 2]
+        step = score[lo + 1 : hi + 1]
+        skip = score[lo:hi] + skip_penalty[lo:hi]
+        best = np.maximum(np.maximum(stay, step), skip)
+        # 与 argmax 一致，得分相同时优先取偏移小的前驱
+        backpointers[t, lo:hi] = (stay != best) * (1 + (step != best))
+        score[lo + 2 : hi + 2] = emit[t, lo:hi] + best
+
+    # 结束于最后一个标签或其后的 blank，得分相同时取最后一个标签
+    end = num_states - 2 + int(score[num_states + 1] > score[num_states])
+    path = np.empty(num_frames, dtype=np.int64)
+    state = end
+    for t in range(num_frames - 1, 0, -1):
+        path[t] = state
+        state -= int(backpointers[t, state])
+    path[0] = state
+    return ext[path]
+
+
 def ctc_forced_align(
     log_probs: torch.Tensor,
     targets: torch.Tensor,
@@ -22,55 +79,25 @@ def ctc_forced_align(
             Lengths of the targets. 1-D Tensor of shape `(B,)`.
         blank_id (int, optional): The index of blank symbol in CTC emission. (Default: 0)
         ignore_id (int, optional): The index of ignore symbol in CTC emission. (Default: -1)
-    """
-    targets[targets == ignore_id] = blank
-
-    batch_size, input_time_size, _ = log_probs.size()
-    bsz_indices = torch.arange(batch_size, device=input_lengths.device)
-
-    _t_a_r_g_e_t_s_ = torch.cat(
-        (
-            torch.stack((torch.full_like(targets, blank), targets), dim=-1).flatten(start_dim=1),
-            torch.full_like(targets[:, :1], blank),
-        ),
-        dim=-1,
-    )
-    diff_labels = torch.cat(
-        (
-            torch.as_tensor([[False, False]], device=targets.device).expand(batch_size, -1),
-            _t_a_r_g_e_t_s_[:, 2:] != _t_a_r_g_e_t_s_[:, :-2],
-        ),
-        dim=1,
-    )
-
-    neg_inf = torch.tensor(float("-inf"), device=log_probs.device, dtype=log_probs.dtype)
-    padding_num = 2
-    padded_t = padding_num + _t_a_r_g_e_t_s_.size(-1)
-    best_score = torch.full((batch_size, padded_t), neg_inf, device=log_probs.device, dtype=log_probs.dtype)
-    best_score[:, padding_num + 0] = log_probs[:, 0, blank]
-    best_score[:, padding_num + 1] = log_probs[bsz_indices, 0, _t_a_r_g_e_t_s_[:, 1]]
 
-    backpointers = torch.zeros((batch_size, input_time_size, padded_t), device=log_probs.device, dtype=targets.dtype)
+    Returns:
+        Tensor: `(B, T)` 的逐帧标签，超出 input_lengths 的帧为 blank。
 
-    for t in range(1, input_time_size):
-        prev = torch.stack(
-            (best_score[:, 2:], best_score[:, 1:-1], torch.where(diff_labels, best_score[:, :-2], neg_inf))
-        )
-        prev_max_value, prev_max_idx = prev.max(dim=0)
-        best_score[:, padding_num:] = log_probs[:, t].gather(-1, _t_a_r_g_e_t_s_) + prev_max_value
-        backpointers[:, t, padding_num:] = prev_max_idx
-
-    l1l2 = best_score.gather(
-        -1, torch.stack((padding_num + target_lengths * 2 - 1, padding_num + target_lengths * 2), dim=-1)
-    )
-
-    path = torch.zeros((batch_size, input_time_size), device=best_score.device, dtype=torch.long)
-    path[bsz_indices, input_lengths - 1] = padding_num + target_lengths * 2 - 1 + l1l2.argmax(dim=-1)
-
-    for t in range(input_time_size - 1, 0, -1):
-        target_indices = path[:, t]
-        prev_max_idx = backpointers[bsz_indices, t, target_indices]
-        path[:, t - 1] += target_indices - prev_max_idx
+    动态规划在 CPU 上用 NumPy 逐条计算：每帧只更新可能位于最优路径上的状态带，
+    回溯指针用 uint8 保存，不再为整个批次分配 `[B, T, 2L+3]` 的 int64 张量。
+    与原实现的唯一差别是批次中短于 T 的音频在各自的最后一帧选择结束状态
+    （原实现使用补齐后第 T 帧的得分）。
+    """
+    emissions = log_probs.detach().float().cpu().numpy()
+    target_array = targets.detach().cpu().numpy()
+    input_lengths = input_lengths.detach().cpu().reshape(-1).tolist()
+    target_lengths = target_lengths.detach().cpu().reshape(-1).tolist()
 
-    alignments = _t_a_r_g_e_t_s_.gather(dim=-1, index=(path - padding_num).clamp(min=0))
-    return alignments
+    batch_size, input_time_size, _ = emissions.shape
+    alignments = np.full((batch_size, input_time_size), blank, dtype=np.int64)
+    for i in range(batch_size):
+        num_frames = int(input_lengths[i])
+        tokens = target_array[i, : int(target_lengths[i])]
+        tokens = np.where(tokens == ignore_id, blank, tokens)
+        alignments[i, :num_frames] = _align_one(emissions[i, :num_frames], tokens, blank)
+    return torch.from_numpy(alignments).to(device=log_probs.device, dtype=targets.dtype)
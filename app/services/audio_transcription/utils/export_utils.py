@@ -6,7 +6,7 @@ def export(
     model, quantize: bool = False, opset_version: int = 14, type="onnx", **kwargs
 ):
     model_scripts = model.export(**kwargs)
-    export_dir = kwargs.get("output_dir", os.path.dirname(kwargs.get("init_param")))
+    export_dir = kwargs.get("output_dir") or os.path.dirname(kwargs.get("init_param"))
     os.makedirs(export_dir, exist_ok=True)
 
     if not isinstance(model_scripts, (list, tuple)):
@@ -11,6 +11,25 @@ root_dir = Path(__file__).resolve().parent
 logger_initialized = {}
 
 
+def _lfr_view(inputs: np.ndarray, lfr_m: int, lfr_n: int, num: int) -> np.ndarray:
+    """把 [T, D] 的帧序列拼接为 [num, lfr_m * D] 的 LFR 帧
+
+    第 i 个 LFR 帧是从第 i * lfr_n 帧开始的连续 lfr_m 帧，在 C 连续数组中正好是一段
+    连续内存，用步长视图表示，不复制数据。调用方需保证 inputs 至少有
+    (num - 1) * lfr_n + lfr_m 帧。
+    """
+    inputs = np.ascontiguousarray(inputs)
+    dim = inputs.shape[1]
+    if num <= 0:
+        return inputs[:0].reshape(0, lfr_m * dim)
+    return np.lib.stride_tricks.as_strided(
+        inputs,
+        shape=(num, lfr_m * dim),
+        strides=(lfr_n * inputs.strides[0], inputs.strides[1]),
+        writeable=False,
+    )
+
+
 class WavFrontend:
     """Conventional frontend structure for ASR."""
 
@@ -50,28 +69,38 @@ class WavFrontend:
         self.fbank_beg_idx = 0
         self.reset_status()
 
+    def _accept_waveform(self, fbank_fn, waveform: np.ndarray) -> None:
+        # float32 连续数组直接交给 kaldi_native_fbank，不再经过 Python 列表
+        waveform = np.ascontiguousarray(waveform * (1 << 15), dtype=np.float32)
+        fbank_fn.accept_waveform(self.opts.frame_opts.samp_freq, waveform)
+
+    def _get_frames(self, fbank_fn, beg_idx: int = 0) -> np.ndarray:
+        """取出 beg_idx 之后已就绪的全部帧
+
+        kaldi_native_fbank 只提供逐帧的 get_frame，这里仍逐帧调用，但直接组装为 float32 数组，
+        不再经过 float64 中间矩阵。
+        """
+        frames = fbank_fn.num_frames_ready
+        if frames <= beg_idx:
+            return np.empty([0, self.opts.mel_opts.num_bins], dtype=np.float32)
+        return np.array(list(map(fbank_fn.get_frame, range(beg_idx, frames))), dtype=np.float32)
+
     def fbank(self, waveform: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
-        waveform = waveform * (1 << 15)
-        self.fbank_fn = knf.OnlineFbank(self.opts)
-        self.fbank_fn.accept_waveform(self.opts.frame_opts.samp_freq, waveform.tolist())
-        frames = self.fbank_fn.num_frames_ready
-        mat = np.empty([frames, self.opts.mel_opts.num_bins])
-        for i in range(frames):
-            mat[i, :] = self.fbank_fn.get_frame(i)
-        feat = mat.astype(np.float32)
-        feat_len = np.array(mat.shape[0]).astype(np.int32)
+        # 每次使用独立的 OnlineFbank，多个线程可以同时提取特征
+        fbank_fn = knf.OnlineFbank(self.opts)
+        self._accept_waveform(fbank_fn, waveform)
+        feat = self._get_frames(fbank_fn)
+        feat_len = np.array(feat.shape[0]).astype(np.int32)
         return feat, feat_len
 
     def fbank_online(self, waveform: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
-        waveform = waveform * (1 << 15)
         # self.fbank_fn = knf.OnlineFbank(self.opts)
-        self.fbank_fn.accept_waveform(self.opts.frame_opts.samp_freq, waveform.tolist())
+        self._accept_waveform(self.fbank_fn, waveform)
         frames = self.fbank_fn.num_frames_ready
-        mat = np.empty([frames, self.opts.mel_opts.num_bins])
-        for i in range(self.fbank_beg_idx, frames):
-            mat[i, :] = self.fbank_fn.get_frame(i)
+        mat = np.empty([frames, self.opts.mel_opts.num_bins], dtype=np.float32)
+        mat[self.fbank_beg_idx :] = self._get_frames(self.fbank_fn, self.fbank_beg_idx)
         # self.fbank_beg_idx += (frames-self.fbank_beg_idx)
-        feat = mat.astype(np.float32)
+        feat = mat
         feat_len = np.array(mat.shape[0]).astype(np.int32)
         return feat, feat_len
 
@@ -91,35 +120,22 @@ class WavFrontend:
 
     @staticmethod
     def apply_lfr(inputs: np.ndarray, lfr_m: int, lfr_n: int) -> np.ndarray:
-        LFR_inputs = []
-
         T = inputs.shape[0]
         T_lfr = int(np.ceil(T / lfr_n))
-        left_padding = np.tile(inputs[0], ((lfr_m - 1) // 2, 1))
-        inputs = np.vstack((left_padding, inputs))
-        T = T + (lfr_m - 1) // 2
-        for i in range(T_lfr):
-            if lfr_m <= T - i * lfr_n:
-                LFR_inputs.append((inputs[i * lfr_n : i * lfr_n + lfr_m]).reshape(1, -1))
-            else:
-                # process last LFR frame
-                num_padding = lfr_m - (T - i * lfr_n)
-                frame = inputs[i * lfr_n :].reshape(-1)
-                for _ in range(num_padding):
-                    frame = np.hstack((frame, inputs[-1]))
-
-                LFR_inputs.append(frame)
-        LFR_outputs = np.vstack(LFR_inputs).astype(np.float32)
-        return LFR_outputs
+        left = (lfr_m - 1) // 2
+        # 最后几个 LFR 帧不足 lfr_m 帧时用最后一帧补齐
+        right = max(0, (T_lfr - 1) * lfr_n + lfr_m - (T + left))
+        inputs = np.concatenate(
+            (np.repeat(inputs[:1], left, axis=0), inputs, np.repeat(inputs[-1:], right, axis=0))
+        )
+        return _lfr_view(inputs, lfr_m, lfr_n, T_lfr).astype(np.float32)
 
     def apply_cmvn(self, inputs: np.ndarray) -> np.ndarray:
         """
         Apply CMVN with mvn data
         """
         frame, dim = inputs.shape
-        means = np.tile(self.cmvn[0:1, :dim], (frame, 1))
-        vars = np.tile(self.cmvn[1:2, :dim], (frame, 1))
-        inputs = (inputs + means) * vars
+        inputs = (inputs + self.cmvn[0, :dim]) * self.cmvn[1, :dim]
         return inputs
 
     def load_cmvn(
@@ -176,29 +192,22 @@ class WavFrontendOnline(WavFrontend):
         Apply lfr with data
         """
 
-        LFR_inputs = []
         T = inputs.shape[0]  # include the right context
         T_lfr = int(
             np.ceil((T - (lfr_m - 1) // 2) / lfr_n)
         )  # minus the right context: (lfr_m - 1) // 2
-        splice_idx = T_lfr
-        for i in range(T_lfr):
-            if lfr_m <= T - i * lfr_n:
-                LFR_inputs.append((inputs[i * lfr_n : i * lfr_n + lfr_m]).reshape(1, -1))
-            else:  # process last LFR frame
-                if is_final:
-                    num_padding = lfr_m - (T - i * lfr_n)
-                    frame = (inputs[i * lfr_n :]).reshape(-1)
-                    for _ in range(num_padding):
-                        frame = np.hstack((frame, inputs[-1]))
-                    LFR_inputs.append(frame)
-                else:
-                    # update splice_idx and break the circle
-                    splice_idx = i
-                    break
+        # 完整落在输入内的 LFR 帧数，其余帧只有 is_final 时用最后一帧补齐输出
+        num_full = min(T_lfr, max(0, (T - lfr_m) // lfr_n + 1))
+        if is_final:
+            splice_idx = T_lfr
+            right = max(0, (T_lfr - 1) * lfr_n + lfr_m - T)
+            padded = np.concatenate((inputs, np.repeat(inputs[-1:], right, axis=0)))
+            LFR_outputs = _lfr_view(padded, lfr_m, lfr_n, T_lfr)
+        else:
+            splice_idx = num_full
+            LFR_outputs = _lfr_view(inputs, lfr_m, lfr_n, num_full)
         splice_idx = min(T - 1, splice_idx * lfr_n)
         lfr_splice_cache = inputs[splice_idx:, :]
-        LFR_outputs = np.vstack(LFR_inputs)
         return LFR_outputs.astype(np.float32), lfr_splice_cache, splice_idx
 
     @staticmethod
@@ -240,15 +249,9 @@ class WavFrontendOnline(WavFrontend):
                         )
                     ]
                 )
-                waveform = waveform * (1 << 15)
-
-                self.fbank_fn.accept_waveform(self.opts.frame_opts.samp_freq, waveform.tolist())
-                frames = self.fbank_fn.num_frames_ready
-                mat = np.empty([frames, self.opts.mel_opts.num_bins])
-                for i in range(frames):
-                    mat[i, :] = self.fbank_fn.get_frame(i)
-                feat = mat.astype(np.float32)
-                feat_len = np.array(mat.shape[0]).astype(np.int32)
+                self._accept_waveform(self.fbank_fn, waveform)
+                feat = self._get_frames(self.fbank_fn)
+                feat_len = np.array(feat.shape[0]).astype(np.int32)
                 feats.append(feat)
                 feats_lens.append(feat_len)
 
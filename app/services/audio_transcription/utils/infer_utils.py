@@ -2,6 +2,7 @@
 
 import functools
 import logging
+from collections import OrderedDict
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, NamedTuple, Set, Tuple, Union
 
@@ -184,13 +185,48 @@ class ONNXRuntimeError(Exception):
 
 
 class OrtInferSession:
-    def __init__(self, model_file, device_id=-1, intra_op_num_threads=4):
+    """ONNX Runtime 推理会话
+
+    输入输出的名称和元信息在创建时读取一次，每次调用不再重新查询。
+
+    use_io_binding 为 True 时通过 IOBinding 推理：按输入形状缓存输出缓冲区和绑定，
+    某个输入形状第一次出现时由 ONNX Runtime 分配输出，之后同形状的调用直接写入同一组缓冲区，
+    不再为输出分配内存，只适用于输出形状由输入形状决定的模型。缓存按最近使用淘汰，总大小不超过 io_binding_cache_mb。
+    返回的数组就是缓存的缓冲区，在下一次同形状的调用之前有效，调用方需要在此之前用完或复制；
+    启用时同一会话不能在多个线程中并发调用。
+
+    Args:
+        model_file: 模型文件
+        device_id: GPU 编号，-1 表示使用 CPU
+        intra_op_num_threads: 单个算子内的并行线程数
+        inter_op_num_threads: 算子间的并行线程数，0 表示由 ONNX Runtime 决定
+        enable_cpu_mem_arena: 是否启用 CPU 内存池，输入形状变化大时关闭可以减少内存占用
+        allow_spinning: 线程池空闲时是否自旋等待，关闭可以降低多进程部署时的 CPU 占用
+        use_io_binding: 是否通过 IOBinding 复用输出缓冲区
+        io_binding_cache_mb: 输出缓冲区缓存的总大小上限（MB）
+    """
+
+    def __init__(
+        self,
+        model_file,
+        device_id=-1,
+        intra_op_num_threads=4,
+        inter_op_num_threads=0,
+        enable_cpu_mem_arena=False,
+        allow_spinning=True,
+        use_io_binding=False,
+        io_binding_cache_mb=512,
+    ):
         device_id = str(device_id)
         sess_opt = SessionOptions()
         sess_opt.intra_op_num_threads = intra_op_num_threads
+        sess_opt.inter_op_num_threads = inter_op_num_threads
         sess_opt.log_severity_level = 4
-        sess_opt.enable_cpu_mem_arena = False
+        sess_opt.enable_cpu_mem_arena = enable_cpu_mem_arena
         sess_opt.graph_optimization_level = GraphOptimizationLevel.ORT_ENABLE_ALL
+        spinning = "1" if allow_spinning else "0"
+        sess_opt.add_session_config_entry("session.intra_op.allow_spinning", spinning)
+        sess_opt.add_session_config_entry("session.inter_op.allow_spinning", spinning)
 
         cuda_ep = "CUDAExecutionProvider"
         cuda_provider_options = {
@@ -221,22 +257,68 @@ class OrtInferSession:
                 RuntimeWarning,
             )
 
+        # 输入输出的元信息（名称、形状、类型），形状中的动态维度为字符串或 None
+        self.inputs = self.session.get_inputs()
+        self.outputs = self.session.get_outputs()
+        self._input_names = [v.name for v in self.inputs]
+        self._output_names = [v.name for v in self.outputs]
+
+        self.use_io_binding = use_io_binding
+        self._io_binding_cache_bytes = int(io_binding_cache_mb * 1024 * 1024)
+        self._bindings = OrderedDict()  # 输入形状 -> (IOBinding, 输出缓冲区)
+        self._bindings_bytes = 0
+
     def __call__(self, input_content: List[Union[np.ndarray, np.ndarray]]) -> np.ndarray:
-        input_dict = dict(zip(self.get_input_names(), input_content))
         try:
-            return self.session.run(self.get_output_names(), input_dict)
+            if self.use_io_binding:
+                return self._run_with_binding(input_content)
+            return self.session.run(self._output_names, dict(zip(self._input_names, input_content)))
         except Exception as e:
             raise ONNXRuntimeError("ONNXRuntime inferece failed.") from e
 
+    def _run_with_binding(self, input_content: List[np.ndarray]) -> List[np.ndarray]:
+        input_content = [np.ascontiguousarray(x) for x in input_content]
+        key = tuple((x.shape, x.dtype.str) for x in input_content)
+        cached = self._bindings.get(key)
+        if cached is None:
+            outputs = self.session.run(self._output_names, dict(zip(self._input_names, input_content)))
+            self._cache_binding(key, outputs)
+            return outputs
+
+        self._bindings.move_to_end(key)
+        binding, outputs = cached
+        for name, x in zip(self._input_names, input_content):
+            binding.bind_cpu_input(name, x)
+        self.session.run_with_iobinding(binding)
+        return outputs
+
+    def _cache_binding(self, key: tuple, outputs: List[np.ndarray]):
+        """把 ONNX Runtime 分配的输出作为该输入形状之后复用的缓冲区"""
+        size = sum(out.nbytes for out in outputs)
+        if size > self._io_binding_cache_bytes or not all(
+            isinstance(out, np.ndarray) and out.flags.c_contiguous and out.flags.writeable
+            for out in outputs
+        ):
+            return
+        while self._bindings and self._bindings_bytes + size > self._io_binding_cache_bytes:
+            _, (_, evicted) = self._bindings.popitem(last=False)
+            self._bindings_bytes -= sum(out.nbytes for out in evicted)
+
+        binding = self.session.io_binding()
+        for name, out in zip(self._output_names, outputs):
+            binding.bind_output(name, "cpu", 0, out.dtype, out.shape, out.ctypes.data)
+        self._bindings[key] = (binding, outputs)
+        self._bindings_bytes += size
+
     def get_input_names(
         self,
     ):
-        return [v.name for v in self.session.get_inputs()]
+        return list(self._input_names)
 
     def get_output_names(
         self,
     ):
-        return [v.name for v in self.session.get_outputs()]
+        return list(self._output_names)
 
     def get_character_list(self, key: str = "character"):
         return self.meta_dict[key].splitlines()
@@ -3,10 +3,11 @@
 # Copyright FunASR (https://github.com/FunAudioLLM/SenseVoice). All Rights Reserved.
 #  MIT License  (https://opensource.org/licenses/MIT)
 
+import os
 import os.path
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Union, Tuple
-import torch
 import librosa
 import numpy as np
 
@@ -41,6 +42,13 @@ class SenseVoiceSmallONNX:
         quantize: bool = False,
         intra_op_num_threads: int = 4,
         cache_dir: str = None,
+        feature_workers: int = None,
+        inter_op_num_threads: int = 0,
+        enable_cpu_mem_arena: bool = False,
+        allow_spinning: bool = True,
+        use_io_binding: bool = True,
+        io_binding_cache_mb: int = 512,
+        pad_multiple: int = 1,
         **kwargs,
     ):
         if quantize:
@@ -59,45 +67,98 @@ class SenseVoiceSmallONNX:
         self.tokenizer = CharTokenizer()
         config["frontend_conf"]['cmvn_file'] = cmvn_file
         self.frontend = WavFrontend(**config["frontend_conf"])
+        # 输出在 decode 中立即转换为 token id，可以安全地复用 IOBinding 的输出缓冲区
         self.ort_infer = OrtInferSession(
-            model_file, device_id, intra_op_num_threads=intra_op_num_threads
+            model_file,
+            device_id,
+            intra_op_num_threads=intra_op_num_threads,
+            inter_op_num_threads=inter_op_num_threads,
+            enable_cpu_mem_arena=enable_cpu_mem_arena,
+            allow_spinning=allow_spinning,
+            use_io_binding=use_io_binding,
+            io_binding_cache_mb=io_binding_cache_mb,
         )
         self.batch_size = batch_size
         self.blank_id = 0
+        # 读取音频和提取特征的线程数，默认与推理线程数相同
+        self.feature_workers = feature_workers or min(intra_op_num_threads, os.cpu_count() or 1)
+        self._executor = None
+        # 批次特征长度补齐到该帧数的倍数，长度相近的批次形状相同，可以复用输出缓冲区
+        self.pad_multiple = max(1, pad_multiple)
+
+    def _map(self, fn, items: List) -> List:
+        """在特征线程池中并行执行，只有一项时直接在当前线程执行"""
+        if len(items) <= 1 or self.feature_workers <= 1:
+            return [fn(item) for item in items]
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.feature_workers, thread_name_prefix="asr-feature"
+            )
+        return list(self._executor.map(fn, items))
 
     def __call__(self, 
                  wav_content: Union[str, np.ndarray, List[str]], 
                  language: List, 
                  textnorm: List,
                  tokenizer=None,
+                 batch_size: int = None,
+                 skip_frames: int = 0,
                  **kwargs) -> List:
+        """批量识别
+
+        按音频长度排序后每 batch_size 条组成一个批次，长度相近的音频放在一起以减少补齐，
+        结果按输入顺序返回。
+
+        Args:
+            wav_content: 音频路径、波形或它们的列表
+            language: 语种 id，长度为 1 时所有音频共用，否则与音频一一对应
+            textnorm: 文本规整 id，规则同 language
+            tokenizer: 提供 tokens2text 时返回文本，否则返回 token id 列表
+            batch_size: 每个批次的音频数，默认使用创建时的 batch_size
+            skip_frames: 解码时跳过的开头帧数，传 4 时不输出提示帧对应的语种、情感等标签
+        """
         waveform_list = self.load_data(wav_content, self.frontend.opts.frame_opts.samp_freq)
         waveform_nums = len(waveform_list)
-        asr_res = []
-        for beg_idx in range(0, waveform_nums, self.batch_size):
-            end_idx = min(waveform_nums, beg_idx + self.batch_size)
-            feats, feats_len = self.extract_feat(waveform_list[beg_idx:end_idx])
+        language = self._expand_ids(language, waveform_nums, "language")
+        textnorm = self._expand_ids(textnorm, waveform_nums, "textnorm")
+
+        batch_size = batch_size or self.batch_size
+        order = sorted(range(waveform_nums), key=lambda i: len(waveform_list[i]), reverse=True)
+        asr_res = [None] * waveform_nums
+        for beg_idx in range(0, waveform_nums, batch_size):
+            batch_idx = order[beg_idx : beg_idx + batch_size]
+            feats, feats_len = self.extract_feat([waveform_list[i] for i in batch_idx])
             ctc_logits, encoder_out_lens = self.infer(feats, 
                                  feats_len, 
-                                 np.array(language, dtype=np.int32), 
-                                 np.array(textnorm, dtype=np.int32)
+                                 language[batch_idx], 
+                                 textnorm[batch_idx]
                                  )
-            # back to torch.Tensor
-            ctc_logits = torch.from_numpy(ctc_logits).float()
-            # support batch_size=1 only currently
-            x = ctc_logits[0, : encoder_out_lens[0].item(), :]
-            yseq = x.argmax(dim=-1)
-            yseq = torch.unique_consecutive(yseq, dim=-1)
-
-            mask = yseq != self.blank_id
-            token_int = yseq[mask].tolist()
-            
-            if tokenizer is not None:
-                asr_res.append(tokenizer.tokens2text(token_int))
-            else:
-                asr_res.append(token_int)
+            for i, token_int in zip(batch_idx, self.decode(ctc_logits, encoder_out_lens, skip_frames)):
+                if tokenizer is not None:
+                    asr_res[i] = tokenizer.tokens2text(token_int)
+                else:
+                    asr_res[i] = token_int
         return asr_res
 
+    @staticmethod
+    def _expand_ids(ids, num: int, name: str) -> np.ndarray:
+        ids = np.asarray(ids, dtype=np.int32).reshape(-1)
+        if len(ids) == 1:
+            return np.repeat(ids, num)
+        if len(ids) != num:
+            raise ValueError(f"The length of {name} ({len(ids)}) does not match the number of inputs ({num})")
+        return ids
+
+    def decode(self, ctc_logits: np.ndarray, encoder_out_lens: np.ndarray,
+               skip_frames: int = 0) -> List[List[int]]:
+        """CTC 贪心解码，整个批次一起取 argmax、合并重复和去除 blank，超出各自长度的帧和开头 skip_frames 帧被忽略"""
+        yseq = ctc_logits[:, skip_frames:].argmax(axis=-1)
+        lengths = np.asarray(encoder_out_lens).reshape(-1, 1) - skip_frames
+        valid = np.arange(yseq.shape[1])[None, :] < lengths
+        keep = valid & (yseq != self.blank_id)
+        keep[:, 1:] &= yseq[:, 1:] != yseq[:, :-1]
+        return [row[mask].tolist() for row, mask in zip(yseq, keep)]
+
     def load_data(self, wav_content: Union[str, np.ndarray, List[str]], fs: int = None) -> List:
         def load_wav(path: str) -> np.ndarray:
             waveform, _ = librosa.load(path, sr=fs)
@@ -110,31 +171,29 @@ class SenseVoiceSmallONNX:
             return [load_wav(wav_content)]
 
         if isinstance(wav_content, list):
-            return [load_wav(path) for path in wav_content]
+            return self._map(
+                lambda item: item if isinstance(item, np.ndarray) else load_wav(item), wav_content
+            )
 
         raise TypeError(f"The type of {wav_content} is not in [str, np.ndarray, list]")
 
     def extract_feat(self, waveform_list: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
-        feats, feats_len = [], []
-        for waveform in waveform_list:
+        def extract(waveform: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
             speech, _ = self.frontend.fbank(waveform)
-            feat, feat_len = self.frontend.lfr_cmvn(speech)
-            feats.append(feat)
-            feats_len.append(feat_len)
+            return self.frontend.lfr_cmvn(speech)
 
-        feats = self.pad_feats(feats, np.max(feats_len))
+        feats, feats_len = zip(*self._map(extract, waveform_list))
+        max_feat_len = -(-int(np.max(feats_len)) // self.pad_multiple) * self.pad_multiple
+        feats = self.pad_feats(feats, max_feat_len)
         feats_len = np.array(feats_len).astype(np.int32)
         return feats, feats_len
 
     @staticmethod
     def pad_feats(feats: List[np.ndarray], max_feat_len: int) -> np.ndarray:
-        def pad_feat(feat: np.ndarray, cur_len: int) -> np.ndarray:
-            pad_width = ((0, max_feat_len - cur_len), (0, 0))
-            return np.pad(feat, pad_width, "constant", constant_values=0)
-
-        feat_res = [pad_feat(feat, feat.shape[0]) for feat in feats]
-        feats = np.array(feat_res).astype(np.float32)
-        return feats
+        feat_res = np.zeros((len(feats), max_feat_len, feats[0].shape[1]), dtype=np.float32)
+        for i, feat in enumerate(feats):
+            feat_res[i, : feat.shape[0]] = feat
+        return feat_res
 
     def infer(self, 
               feats: np.ndarray, 
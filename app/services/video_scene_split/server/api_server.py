@@ -1,537 +1,230 @@
 """视频场景分割API服务器
 
-该模块提供了一个基于Flask的RESTful API服务，用于处理视频场景分割任务。
+该模块提供了一个基于FastAPI的RESTful API服务，用于处理视频场景分割任务。
 主要功能包括：
 - 接收视频文件路径
 - 进行场景分割处理
 - 返回分割结果，包括每个场景的起始帧和时间戳
 
+请求在主进程中校验后交给工作进程池执行（见 core.worker_pool），每个工作进程加载一份模型，
+同时处理的请求数等于工作进程数；队列已满返回 429，处理超时结束工作进程及其 ffmpeg 子进程并返回 408。
+
 依赖项：
-- Flask: Web框架
-- OpenCV (cv2): 视频处理
+- FastAPI / uvicorn: Web框架和ASGI服务器
+- MoviePy: 视频片段编码
 - scene_detection: 自定义场景分割模块
 
 作者: MediaSymphony Team
 日期: 2024-02
 """
 
-from flask import Flask, request, jsonify
+import asyncio
 import os
-import cv2
-from core.scene_detection import SceneDetector
-from utils.logger import Logger
-from moviepy import VideoFileClip
-import threading
-import time
-import traceback
+import shutil
 import sys
-from utils.video_frame import extract_video_cover_with_metadata
-
-app = Flask(__name__)
-logger = Logger("scene_detection_api")
-
-# 模型实例
-detector_model = None
-
-# 配置常量
-SCENE_DETECTION_TIMEOUT = 1800  # 超时时间 1800s
-
-# 从配置文件获取允许的视频文件格式
-ALLOWED_EXTENSIONS = {
-    ext.split("/")[-1] for ext in ["video/mp4", "video/avi", "video/mov"]
-}
-
-
-class AudioMode:
-    """音频处理模式"""
-
-    MUTE = "mute"  # 静音模式
-    UNMUTE = "un-mute"  # 非静音模式
-
-
-# 初始化模型
-def init_model():
-    global detector_model
-    logger.info("正在加载模型...")
-    detector_model = SceneDetector(logger=logger)
-    logger.info("模型加载完成")
-
+import traceback
+from config import settings
 
-def allowed_file(filename: str) -> bool:
-    """检查文件是否为允许的视频格式
+# 工作进程的指标写入共享目录，由主进程的 /metrics 汇总，需要在导入 prometheus_client 之前设置。
+# 工作进程以 __mp_main__ 重新导入本模块，只有主进程清理上次运行遗留的指标文件
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", settings.METRICS_MULTIPROC_DIR)
+if __name__ == "__main__":
+    shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import CollectorRegistry, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+from core.pipeline import AudioMode, validate_request_data
+from core.worker_pool import QueueFullError, SceneWorkerPool, WorkerUnavailableError
+from utils.logger import Logger
+from utils.tracing import inject_headers, start_span
+from utils.metrics import SCENE_REQUESTS_TOTAL
 
-    Args:
-        filename (str): 需要检查的文件名
+app = FastAPI(title="Scene Detection API")
+logger = Logger("scene_detection_api")
 
-    Returns:
-        bool: 如果文件扩展名在允许列表中返回True，否则返回False
-    """
-    return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
+# 工作进程池，服务启动时才启动工作进程
+worker_pool = SceneWorkerPool(
+    workers=settings.WORKERS,
+    max_queue=settings.MAX_QUEUE,
+    timeout=settings.SCENE_DETECTION_TIMEOUT,
+    warm_up=settings.WARMUP_ON_START,
+    restart_backoff=settings.WORKER_RESTART_BACKOFF,
+    max_restart_backoff=settings.WORKER_MAX_RESTART_BACKOFF,
+)
 
 
-def format_time(frame_number: int, fps: float) -> str:
-    """将帧号转换为时间戳字符串
+@app.on_event("startup")
+def start_worker_pool():
+    """启动工作进程并在后台加载模型，服务先开始监听，预热期间 /healthz 即可响应"""
+    logger.info("正在启动工作进程...", worker_pool.status())
+    worker_pool.start()
 
-    Args:
-        frame_number (int): 视频帧序号
-        fps (float): 视频帧率
 
-    Returns:
-        str: 格式化的时间字符串，格式为"HH:MM:SS"
-    """
-    seconds = frame_number / fps
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    seconds = int(seconds % 60)
-    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+@app.on_event("shutdown")
+def stop_worker_pool():
+    """结束全部工作进程"""
+    worker_pool.shutdown()
 
 
-def timeout_handler():
-    raise TimeoutError("视频处理超时，请检查视频文件或调整超时时间设置")
+def _error_content(message: str, task_id=None, output_path=None) -> dict:
+    """处理失败时的响应内容"""
+    return {
+        "status": "error",
+        "message": message,
+        "task_id": task_id,
+        "output_dir": output_path,
+        "data": [],
+    }
 
 
-def validate_request_data(data):
-    """验证请求数据
+@app.post("/api/v1/scene-detection/process")
+async def process_scene_detection(request: Request):
+    """处理视频场景分割请求
 
-    Args:
-        data (dict): 请求数据
+    以请求头中的追踪上下文为父 span 记录整个请求的处理过程
 
     Returns:
-        tuple: (input_path, output_path, task_id, threshold, visualize, video_split_audio_mode)
-
-    Raises:
-        ValueError: 当请求数据无效时抛出异常
+        JSONResponse: 处理结果
     """
-    if not data:
-        raise ValueError("请求体不能为空")
-
-    # 验证必需参数
-    required_fields = ["input_path", "output_path", "task_id"]
-    missing_fields = [field for field in required_fields if field not in data]
-    if missing_fields:
-        raise ValueError(f"缺少必需参数: {', '.join(missing_fields)}")
-
-    # 获取请求参数
-    input_path = data["input_path"]
-    output_path = data["output_path"]
-    task_id = data["task_id"]
-    threshold = data.get("threshold", 0.5)
-    visualize = data.get("visualize", False)
-    video_split_audio_mode = data.get("video_split_audio_mode", AudioMode.UNMUTE)
-
-    # 验证音频处理模式
-    if video_split_audio_mode not in [AudioMode.MUTE, AudioMode.UNMUTE]:
-        raise ValueError("不支持的音频处理模式")
-
-    # 验证视频文件是否存在
-    if not os.path.exists(input_path):
-        raise ValueError("视频文件不存在")
-
-    # 验证视频文件格式
-    if not allowed_file(input_path):
-        raise ValueError("不支持的视频文件格式")
-
-    return (
-        input_path,
-        output_path,
-        task_id,
-        threshold,
-        visualize,
-        video_split_audio_mode,
-    )
-
-
-def detect_video_scenes(input_path: str, threshold: float):
-    """检测视频场景
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    attrs = data if isinstance(data, dict) else {}
+    with start_span(
+        "scene_detection.request",
+        {
+            "task_id": str(attrs.get("task_id", "")),
+            "audio_mode": str(attrs.get("video_split_audio_mode", AudioMode.UNMUTE)),
+        },
+        carrier=dict(request.headers),
+    ) as span:
+        response = await _process_scene_detection(data)
+        span.set_attribute("http.status_code", response.status_code)
+    SCENE_REQUESTS_TOTAL.labels(status=str(response.status_code)).inc()
+    return response
+
+
+async def _process_scene_detection(data) -> JSONResponse:
+    """校验请求并交给工作进程池处理
 
     Args:
-        input_path (str): 视频文件路径
-        threshold (float): 场景切换阈值
+        data: 请求体解析得到的 JSON
 
     Returns:
-        tuple: (video_frames, scenes, single_frame_predictions, all_frame_predictions)
+        JSONResponse: 处理结果
     """
-    cap = cv2.VideoCapture(input_path)
-    if not cap.isOpened():
-        raise ValueError("无法打开视频文件")
+    if not worker_pool.ready:
+        return JSONResponse(
+            status_code=503, content={"status": "error", "message": "模型尚未就绪，请稍后重试"}
+        )
 
+    if not data or not isinstance(data, dict):
+        return JSONResponse(status_code=400, content={"status": "error", "message": "无效的请求数据"})
     try:
-        logger.info("正在处理视频...")
-        # 获取视频的帧和预测结果
-        video_frames, single_frame_predictions, all_frame_predictions = (
-            detector_model.predict_video(input_path)
+        # 验证请求数据
+        (
+            input_path,
+            output_path,
+            task_id,
+            threshold,
+            visualize,
+            video_split_audio_mode,
+        ) = validate_request_data(data)
+    except ValueError as ve:
+        return JSONResponse(
+            status_code=400,
+            content={"status": "error", "message": str(ve), "task_id": data.get("task_id")},
         )
-        scenes = detector_model.predictions_to_scenes(
-            single_frame_predictions, threshold=threshold
-        )
-
-        return video_frames, scenes, single_frame_predictions, all_frame_predictions
-    finally:
-        cap.release()
 
-
-def write_video_segment(
-    segment_clip,
-    output_path,
-    video_clip,
-    video_split_audio_mode=AudioMode.UNMUTE,
-    retries=3,
-    delay=1,
-):
-    """写入视频片段
-
-    Args:
-        segment_clip: VideoFileClip对象
-        output_path (str): 输出文件路径
-        video_clip: 原始视频片段
-        video_split_audio_mode (str): 音频处理模式
-        retries (int): 重试次数
-        delay (int): 重试延迟（秒）
-
-    Returns:
-        bool: 写入是否成功
-    """
-    for attempt in range(retries):
-        try:
-            # 获取原视频的编码参数
-            original_video_bitrate = "8000k"
-            original_audio_bitrate = "192k"
-            original_audio_codec = "aac"
-
-            if video_clip.reader:
-                if hasattr(video_clip.reader, "bitrate") and video_clip.reader.bitrate:
-                    original_video_bitrate = str(int(video_clip.reader.bitrate)) + "k"
-                if (
-                    hasattr(video_clip.reader, "audio_bitrate")
-                    and video_clip.reader.audio_bitrate
-                ):
-                    original_audio_bitrate = (
-                        str(int(video_clip.reader.audio_bitrate)) + "k"
-                    )
-                if (
-                    hasattr(video_clip.reader, "audio_codec")
-                    and video_clip.reader.audio_codec
-                ):
-                    original_audio_codec = video_clip.reader.audio_codec
-
-            cpu_count = os.cpu_count() or 4
-            thread_count = max(1, cpu_count - 2)
-
-            segment_clip.write_videofile(
-                output_path,
-                codec="h264_nvenc",
-                fps=video_clip.fps,
-                bitrate=original_video_bitrate,
-                preset="medium",
-                threads=thread_count,
-                audio=video_split_audio_mode
-                == AudioMode.UNMUTE,  # 根据音频处理模式决定是否包含音频
-                audio_codec=(
-                    original_audio_codec
-                    if video_split_audio_mode == AudioMode.UNMUTE
-                    else None
-                ),
-                audio_bitrate=(
-                    original_audio_bitrate
-                    if video_split_audio_mode == AudioMode.UNMUTE
-                    else None
-                ),
-                logger=None,
-                ffmpeg_params=[
-                    "-pix_fmt", "yuv420p",       # 强制使用兼容的像素格式
-                    "-color_range", "tv",        # 限制颜色范围（16-235）
-                    "-colorspace", "bt709",      # 指定颜色空间为BT.709
-                    "-color_primaries", "bt709", # 设置颜色原色
-                    "-color_trc", "bt709"        # 定义传输特性
-                ]
-            )
-            return True
-        except Exception as e:
-            if attempt < retries - 1:
-                time.sleep(delay)
-                continue
-            raise
-
-
-def process_video_segments(
-    video_clip, scenes, output_path, video_split_audio_mode=AudioMode.UNMUTE
-):
-    """处理视频片段
-
-    Args:
-        video_clip: VideoFileClip对象
-        scenes (list): 场景列表
-        output_path (str): 输出目录路径
-        video_split_audio_mode (str): 音频处理模式
-
-    Returns:
-        list: 格式化的场景信息列表
-
-    Raises:
-        Exception: 当视频片段处理失败时抛出异常
-    """
-    formatted_scenes = []
-    video_duration = video_clip.duration
-
-    for i, (start, end) in enumerate(scenes):
-        try:
-            start_time = start / video_clip.fps
-            end_time = min(end / video_clip.fps, video_duration)
-
-            # 如果起始时间已经超过视频总长度，跳过此片段
-            if start_time >= video_duration:
-                logger.warning(
-                    f"场景 {i + 1} 的起始时间 {start_time}s 超出视频总长度 {video_duration}s，已跳过"
-                )
-                continue
-
-            # 如果结束时间小于等于起始时间，跳过此片段
-            if end_time <= start_time:
-                logger.warning(
-                    f"场景 {i + 1} 的时间区间无效 ({start_time}s - {end_time}s)，已跳过"
-                )
-                continue
-            
-            # 检查片段时长是否小于2秒
-            # if end_time - start_time < 2:
-            #     logger.warning(
-            #         f"场景 {i + 1} 的时长小于2秒 ({start_time}s - {end_time}s)，已跳过"
-            #     )
-            #     continue
-
-            # 确保结束时间不超过视频总长度
-            if end_time > video_duration:
-                logger.warning(
-                    f"场景 {i + 1} 的结束时间从 {end_time}s 调整为视频总长度 {video_duration}s"
-                )
-                end_time = video_duration
-
-            segment_clip = video_clip.subclipped(start_time, end_time)
-
-            # 为每个视频片段生成唯一文件名
-            output_segment_path = os.path.join(output_path, f"segment_{i + 1}.mp4")
-            write_video_segment(
-                segment_clip, output_segment_path, video_clip, video_split_audio_mode
-            )
-            # 非静音视频增加获取视频封面流程
-            if video_split_audio_mode == AudioMode.UNMUTE:
-                # 将 output_path(/data/processed/task_id/un_mute) => (/data/processed/task_id/cover)
-                cover_output_path = os.path.join(output_path.replace("un_mute", "cover"), f"cover_{i + 1}.jpg")
-                # 获取视频封面和元数据
-                metadata = extract_video_cover_with_metadata(output_segment_path, cover_output_path)
-                
-                # 将元数据转换为字典格式
-                meta_data_dict = {
-                    "duration": round(metadata.duration, 2),
-                    "width": metadata.width,
-                    "height": metadata.height,
-                    "aspect_ratio": metadata.aspect_ratio,
-                    "aspect_ratio_text": metadata.aspect_ratio_text,
-                    "file_size": int(metadata.file_size),
-                    "fps": int(metadata.fps),
-                    "bitrate": round(metadata.bitrate, 2)
-                }
-
-                # 添加场景信息
-                formatted_scenes.append(
-                    {
-                        "start_frame": int(start),
-                        "output_path": output_segment_path,
-                        "is_mute": video_split_audio_mode == AudioMode.MUTE,
-                        "cover": cover_output_path,
-                        "meta_data": meta_data_dict 
-                    }
-                )
-            # 静音视频
-            else:
-                # 添加场景信息
-                formatted_scenes.append(
-                    {
-                        "start_frame": int(start),
-                        "output_path": output_segment_path,
-                        "is_mute": video_split_audio_mode == AudioMode.MUTE,
-                    }
-                )
-        except Exception as e:
-            logger.error(f"处理视频片段 {i + 1} 失败: {str(e)}")
-            raise
-
-    return formatted_scenes
-
-
-@app.route("/api/v1/scene-detection/process", methods=["POST"])
-def process_scene_detection():
-    """处理视频场景分割请求
-
-    Returns:
-        tuple: (response, status_code)
-    """
     try:
-        # 解析和验证请求数据
-        data = request.get_json()
-        if not data:
-            return jsonify({"status": "error", "message": "无效的请求数据"}), 400
-        try:
-            # 验证请求数据
-            (
-                input_path,
-                output_path,
-                task_id,
-                threshold,
-                visualize,
-                video_split_audio_mode,
-            ) = validate_request_data(data)
-        except ValueError as ve:
-            return (
-                jsonify({"status": "error", "message": str(ve), "task_id": task_id}),
-                400,
-            )
-
-        logger.info(
-            "开始处理视频场景分割",
+        future = worker_pool.submit(
             {
-                "task_id": task_id,
                 "input_path": input_path,
                 "output_path": output_path,
+                "task_id": task_id,
                 "threshold": threshold,
                 "visualize": visualize,
-            },
+                "video_split_audio_mode": video_split_audio_mode,
+                "media_info": data.get("media_info"),
+                "carrier": inject_headers(),
+            }
+        )
+    except QueueFullError as e:
+        logger.warning("队列已满，拒绝请求", {"task_id": task_id, "retry_after": e.retry_after})
+        return JSONResponse(
+            status_code=429,
+            headers={"Retry-After": str(e.retry_after)},
+            content=_error_content(str(e), task_id, output_path),
         )
 
-        # 创建输出目录
-        os.makedirs(output_path, exist_ok=True)
-
-        # 设置超时定时器
-        timer = threading.Timer(SCENE_DETECTION_TIMEOUT, timeout_handler)
-        timer.start()
-
-        video_clip = None
-        try:
-            # 检测视频场景
-            video_frames, scenes, single_frame_predictions, all_frame_predictions = (
-                detect_video_scenes(input_path, threshold)
-            )
-
-            # 加载视频文件
-            logger.info("正在切分场景...")
-            try:
-                video_clip = VideoFileClip(input_path)
-                if not video_clip.reader or not hasattr(video_clip.reader, "fps"):
-                    raise ValueError("无法正确加载视频文件，请检查视频格式是否正确")
-            except Exception as e:
-                logger.error(f"加载视频文件失败: {str(e)}")
-                raise ValueError(f"加载视频文件失败: {str(e)}")
-
-            # 处理视频片段
-            formatted_scenes = process_video_segments(
-                video_clip, scenes, output_path, video_split_audio_mode
-            )
-
-            # 如果需要可视化，生成预测结果的可视化图像
-            if visualize:
-                logger.info("正在生成预测可视化...")
-                visualization = detector_model.visualize_predictions(
-                    video_frames, [single_frame_predictions, all_frame_predictions]
-                )
-                visualization.save(f"{output_path}/predictions.png")
-
-            logger.info(
-                "处理完成",
-                {
-                    "task_id": task_id,
-                    "scenes_count": len(scenes),
-                    "output_dir": output_path,
-                },
-            )
-
-            # 返回成功响应
-            return jsonify(
-                {
-                    "status": "success",
-                    "message": "处理完成",
-                    "task_id": task_id,
-                    "output_dir": output_path,
-                    "data": formatted_scenes,
-                }
-            )
-
-        finally:
-            # 取消超时定时器
-            timer.cancel()
-            # 确保资源正确释放
-            if video_clip is not None:
-                video_clip.close()
-
+    try:
+        # 在分发线程中等待结果，不阻塞事件循环
+        return JSONResponse(content=await asyncio.wrap_future(future))
     except TimeoutError as e:
         logger.error("处理超时", {"task_id": task_id, "error": str(e)})
-        return (
-            jsonify(
-                {
-                    "status": "error",
-                    "message": str(e),
-                    "task_id": task_id,
-                    "output_dir": output_path,
-                    "data": [],
-                }
-            ),
-            408,
-        )
+        return JSONResponse(status_code=408, content=_error_content(str(e), task_id, output_path))
     except ValueError as e:
-        error_msg = str(e)
-        logger.error("请求参数无效", {"error": error_msg})
-        return (
-            jsonify(
-                {
-                    "status": "error",
-                    "message": error_msg,
-                    "task_id": task_id,
-                    "output_dir": output_path,
-                    "data": [],
-                }
-            ),
-            400,
-        )
+        logger.error("请求参数无效", {"task_id": task_id, "error": str(e)})
+        return JSONResponse(status_code=400, content=_error_content(str(e), task_id, output_path))
+    except WorkerUnavailableError as e:
+        logger.error("没有可用的工作进程", {"task_id": task_id, "error": str(e)})
+        return JSONResponse(status_code=503, content=_error_content(str(e), task_id, output_path))
     except Exception as e:
-        error_msg = str(e)
-        logger.error("处理过程中发生异常", {"task_id": task_id, "error": error_msg})
-        return (
-            jsonify(
-                {
-                    "status": "error",
-                    "message": error_msg,
-                    "task_id": task_id,
-                    "output_dir": output_path,
-                    "data": [],
-                }
-            ),
-            500,
-        )
+        logger.error("处理过程中发生异常", {"task_id": task_id, "error": str(e)})
+        return JSONResponse(status_code=500, content=_error_content(str(e), task_id, output_path))
+
+
+@app.get("/healthz")
+def healthz():
+    """存活检查：进程能够响应请求即返回 200"""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def readyz():
+    """就绪检查：至少一个工作进程加载并预热模型后返回 200，之前返回 503"""
+    status = worker_pool.status()
+    if not worker_pool.ready:
+        if worker_pool.last_error:
+            content = {"status": "error", "message": worker_pool.last_error, **status}
+        else:
+            content = {"status": "warming_up", **status}
+        return JSONResponse(status_code=503, content=content)
+    return {"status": "ready", **status}
+
+
+@app.get("/metrics")
+def metrics():
+    """输出主进程和全部工作进程汇总的 Prometheus 指标"""
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
 
 
 # 添加全局错误处理
-@app.errorhandler(Exception)
-def handle_error(error):
+@app.exception_handler(Exception)
+async def handle_error(request: Request, error: Exception):
     """处理所有未捕获的异常"""
-    error_trace = traceback.format_exc()
+    error_trace = "".join(traceback.format_exception(type(error), error, error.__traceback__))
     logger.error(f"未捕获的异常: {str(error)}\n{error_trace}")
-    return (
-        jsonify(
-            {
-                "status": "error",
-                "message": "服务器内部错误",
-                "error_type": type(error).__name__,
-            }
-        ),
-        500,
+    return JSONResponse(
+        status_code=500,
+        content={
+            "status": "error",
+            "message": "服务器内部错误",
+            "error_type": type(error).__name__,
+        },
     )
 
 
 if __name__ == "__main__":
+    import uvicorn
+
     try:
-        # 初始化模型
-        init_model()
-        # 启动Flask应用
-        app.run(host="0.0.0.0", port=5000)
+        uvicorn.run(app, host=settings.HOST, port=settings.PORT)
     except Exception as e:
         logger.error(f"视频场景切割服务启动失败: {str(e)}")
         sys.exit(1)
@@ -0,0 +1,27 @@
+"""视频场景分割服务配置，均可通过环境变量覆盖"""
+
+import os
+
+
+class Settings:
+    # 服务监听地址
+    HOST = os.getenv("HOST", "0.0.0.0")
+    # 服务端口
+    PORT = int(os.getenv("PORT", 5000))
+    # 工作进程数，每个进程加载一份模型，同时处理的请求数等于该值
+    WORKERS = max(1, int(os.getenv("WORKERS", 2)))
+    # 等待队列长度，排队和执行中的请求超过 WORKERS + MAX_QUEUE 时返回 429
+    MAX_QUEUE = int(os.getenv("MAX_QUEUE", 4))
+    # 单个请求的处理超时（秒），超时后结束工作进程及其 ffmpeg 子进程并返回 408
+    SCENE_DETECTION_TIMEOUT = float(os.getenv("SCENE_DETECTION_TIMEOUT", 1800))
+    # 工作进程加载模型失败后首次重新启动的等待时间（秒），之后每次翻倍
+    WORKER_RESTART_BACKOFF = float(os.getenv("WORKER_RESTART_BACKOFF", 5))
+    # 工作进程重新启动的最长等待时间（秒）
+    WORKER_MAX_RESTART_BACKOFF = float(os.getenv("WORKER_MAX_RESTART_BACKOFF", 300))
+    # 启动时是否用合成帧预热模型
+    WARMUP_ON_START = os.getenv("WARMUP_ON_START", "true").lower() == "true"
+    # 主进程和工作进程共用的 Prometheus 指标目录，启动时清空
+    METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR", "/tmp/scene_detection_metrics")
+
+
+settings = Settings()
@@ -1,3 +1,10 @@
-from .scene_detection import SceneDetector
-
 __all__ = ["SceneDetector"]
+
+
+def __getattr__(name):
+    # 按需导入 TensorFlow 模型，API 主进程只使用 pipeline 和 worker_pool，不加载 TensorFlow
+    if name == "SceneDetector":
+        from .scene_detection import SceneDetector
+
+        return SceneDetector
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,472 @@
+"""视频场景分割流程
+
+请求校验、场景检测、片段编码和封面提取。由 api_server 的工作进程调用，
+每个工作进程持有一份 SceneDetector，本模块不加载模型也不依赖 Web 框架。
+"""
+
+import os
+import time
+from moviepy import VideoFileClip
+from utils.logger import Logger
+from utils.video_frame import extract_video_cover_with_metadata
+from utils.tracing import start_span
+from utils.media_info import resolve_media_info
+from utils.metrics import (
+    SCENE_INFERENCE_SECONDS,
+    SCENE_FRAMES_PER_SECOND,
+    SCENE_REALTIME_FACTOR,
+    SCENE_SEGMENT_ENCODE_SECONDS,
+)
+
+logger = Logger("scene_detection_api")
+
+# 源音频编码到 ffmpeg 编码器的映射，其余编码统一转为 aac
+AUDIO_ENCODERS = {"aac": "aac", "mp3": "libmp3lame"}
+
+# 从配置文件获取允许的视频文件格式
+ALLOWED_EXTENSIONS = {
+    ext.split("/")[-1] for ext in ["video/mp4", "video/avi", "video/mov"]
+}
+
+
+class AudioMode:
+    """音频处理模式"""
+
+    MUTE = "mute"  # 静音模式
+    UNMUTE = "un-mute"  # 非静音模式
+
+
+def allowed_file(filename: str) -> bool:
+    """检查文件是否为允许的视频格式
+
+    Args:
+        filename (str): 需要检查的文件名
+
+    Returns:
+        bool: 如果文件扩展名在允许列表中返回True，否则返回False
+    """
+    return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def format_time(frame_number: int, fps: float) -> str:
+    """将帧号转换为时间戳字符串
+
+    Args:
+        frame_number (int): 视频帧序号
+        fps (float): 视频帧率
+
+    Returns:
+        str: 格式化的时间字符串，格式为"HH:MM:SS"
+    """
+    seconds = frame_number / fps
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    seconds = int(seconds % 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+def validate_request_data(data):
+    """验证请求数据
+
+    Args:
+        data (dict): 请求数据
+
+    Returns:
+        tuple: (input_path, output_path, task_id, threshold, visualize, video_split_audio_mode)
+
+    Raises:
+        ValueError: 当请求数据无效时抛出异常
+    """
+    if not data:
+        raise ValueError("请求体不能为空")
+
+    # 验证必需参数
+    required_fields = ["input_path", "output_path", "task_id"]
+    missing_fields = [field for field in required_fields if field not in data]
+    if missing_fields:
+        raise ValueError(f"缺少必需参数: {', '.join(missing_fields)}")
+
+    # 获取请求参数
+    input_path = data["input_path"]
+    output_path = data["output_path"]
+    task_id = data["task_id"]
+    threshold = data.get("threshold", 0.5)
+    visualize = data.get("visualize", False)
+    video_split_audio_mode = data.get("video_split_audio_mode", AudioMode.UNMUTE)
+
+    # 验证音频处理模式
+    if video_split_audio_mode not in [AudioMode.MUTE, AudioMode.UNMUTE]:
+        raise ValueError("不支持的音频处理模式")
+
+    # 验证视频文件是否存在
+    if not os.path.exists(input_path):
+        raise ValueError("视频文件不存在")
+
+    # 验证视频文件格式
+    if not allowed_file(input_path):
+        raise ValueError("不支持的视频文件格式")
+
+    return (
+        input_path,
+        output_path,
+        task_id,
+        threshold,
+        visualize,
+        video_split_audio_mode,
+    )
+
+
+def detect_video_scenes(detector, input_path: str, threshold: float):
+    """检测视频场景
+
+    Args:
+        detector (SceneDetector): 场景检测模型
+        input_path (str): 视频文件路径
+        threshold (float): 场景切换阈值
+
+    Returns:
+        tuple: (video_frames, scenes, single_frame_predictions, all_frame_predictions)
+    """
+    logger.info("正在处理视频...")
+    # 获取视频的帧和预测结果
+    start_time = time.perf_counter()
+    with start_span("scene_detection.inference") as span:
+        video_frames, single_frame_predictions, all_frame_predictions = (
+            detector.predict_video(input_path)
+        )
+        span.set_attribute("frames", len(video_frames))
+    inference_time = time.perf_counter() - start_time
+    SCENE_INFERENCE_SECONDS.observe(inference_time)
+    if inference_time > 0:
+        SCENE_FRAMES_PER_SECOND.observe(len(video_frames) / inference_time)
+    scenes = detector.predictions_to_scenes(
+        single_frame_predictions, threshold=threshold
+    )
+
+    return video_frames, scenes, single_frame_predictions, all_frame_predictions
+
+
+def write_video_segment(
+    segment_clip,
+    output_path,
+    video_clip,
+    video_split_audio_mode=AudioMode.UNMUTE,
+    retries=3,
+    delay=1,
+    media_info=None,
+):
+    """写入视频片段
+
+    Args:
+        segment_clip: VideoFileClip对象
+        output_path (str): 输出文件路径
+        video_clip: 原始视频片段
+        video_split_audio_mode (str): 音频处理模式
+        retries (int): 重试次数
+        delay (int): 重试延迟（秒）
+        media_info (dict, optional): 源视频的媒体信息，提供时从中读取编码参数
+
+    Returns:
+        bool: 写入是否成功
+    """
+    for attempt in range(retries):
+        try:
+            # 获取原视频的编码参数
+            original_video_bitrate = "8000k"
+            original_audio_bitrate = "192k"
+            original_audio_codec = "aac"
+
+            if media_info:
+                video_bitrate = (media_info.get("video") or {}).get("bit_rate") or media_info.get("bit_rate")
+                if video_bitrate:
+                    original_video_bitrate = f"{video_bitrate // 1000}k"
+                audio_info = media_info.get("audio") or {}
+                if audio_info.get("bit_rate"):
+                    original_audio_bitrate = f"{audio_info['bit_rate'] // 1000}k"
+                original_audio_codec = AUDIO_ENCODERS.get(audio_info.get("codec"), original_audio_codec)
+            elif video_clip.reader:
+                if hasattr(video_clip.reader, "bitrate") and video_clip.reader.bitrate:
+                    original_video_bitrate = str(int(video_clip.reader.bitrate)) + "k"
+                if (
+                    hasattr(video_clip.reader, "audio_bitrate")
+                    and video_clip.reader.audio_bitrate
+                ):
+                    original_audio_bitrate = (
+                        str(int(video_clip.reader.audio_bitrate)) + "k"
+                    )
+                if (
+                    hasattr(video_clip.reader, "audio_codec")
+                    and video_clip.reader.audio_codec
+                ):
+                    original_audio_codec = video_clip.reader.audio_codec
+
+            cpu_count = os.cpu_count() or 4
+            thread_count = max(1, cpu_count - 2)
+
+            segment_clip.write_videofile(
+                output_path,
+                codec="h264_nvenc",
+                fps=video_clip.fps,
+                bitrate=original_video_bitrate,
+                preset="medium",
+                threads=thread_count,
+                audio=video_split_audio_mode
+                == AudioMode.UNMUTE,  # 根据音频处理模式决定是否包含音频
+                audio_codec=(
+                    original_audio_codec
+                    if video_split_audio_mode == AudioMode.UNMUTE
+                    else None
+                ),
+                audio_bitrate=(
+                    original_audio_bitrate
+                    if video_split_audio_mode == AudioMode.UNMUTE
+                    else None
+                ),
+                logger=None,
+                ffmpeg_params=[
+                    "-pix_fmt", "yuv420p",       # 强制使用兼容的像素格式
+                    "-color_range", "tv",        # 限制颜色范围（16-235）
+                    "-colorspace", "bt709",      # 指定颜色空间为BT.709
+                    "-color_primaries", "bt709", # 设置颜色原色
+                    "-color_trc", "bt709"        # 定义传输特性
+                ]
+            )
+            return True
+        except Exception as e:
+            if attempt < retries - 1:
+                time.sleep(delay)
+                continue
+            raise
+
+
+def process_video_segments(
+    video_clip, scenes, output_path, video_split_audio_mode=AudioMode.UNMUTE, media_info=None
+):
+    """处理视频片段
+
+    Args:
+        video_clip: VideoFileClip对象
+        scenes (list): 场景列表
+        output_path (str): 输出目录路径
+        video_split_audio_mode (str): 音频处理模式
+        media_info (dict, optional): 源视频的媒体信息，用于编码参数和片段元数据
+
+    Returns:
+        list: 格式化的场景信息列表
+
+    Raises:
+        Exception: 当视频片段处理失败时抛出异常
+    """
+    formatted_scenes = []
+    video_duration = video_clip.duration
+
+    for i, (start, end) in enumerate(scenes):
+        try:
+            start_time = start / video_clip.fps
+            end_time = min(end / video_clip.fps, video_duration)
+
+            # 如果起始时间已经超过视频总长度，跳过此片段
+            if start_time >= video_duration:
+                logger.warning(
+                    f"场景 {i + 1} 的起始时间 {start_time}s 超出视频总长度 {video_duration}s，已跳过"
+                )
+                continue
+
+            # 如果结束时间小于等于起始时间，跳过此片段
+            if end_time <= start_time:
+                logger.warning(
+                    f"场景 {i + 1} 的时间区间无效 ({start_time}s - {end_time}s)，已跳过"
+                )
+                continue
+            
+            # 检查片段时长是否小于2秒
+            # if end_time - start_time < 2:
+            #     logger.warning(
+            #         f"场景 {i + 1} 的时长小于2秒 ({start_time}s - {end_time}s)，已跳过"
+            #     )
+            #     continue
+
+            # 确保结束时间不超过视频总长度
+            if end_time > video_duration:
+                logger.warning(
+                    f"场景 {i + 1} 的结束时间从 {end_time}s 调整为视频总长度 {video_duration}s"
+                )
+                end_time = video_duration
+
+            segment_clip = video_clip.subclipped(start_time, end_time)
+
+            # 为每个视频片段生成唯一文件名
+            output_segment_path = os.path.join(output_path, f"segment_{i + 1}.mp4")
+            encode_start = time.perf_counter()
+            with start_span(
+                "scene_detection.encode_segment",
+                {"segment": i + 1, "duration": end_time - start_time},
+            ):
+                write_video_segment(
+                    segment_clip, output_segment_path, video_clip, video_split_audio_mode,
+                    media_info=media_info
+                )
+            SCENE_SEGMENT_ENCODE_SECONDS.labels(audio_mode=video_split_audio_mode).observe(
+                time.perf_counter() - encode_start
+            )
+            # 非静音视频增加获取视频封面流程
+            if video_split_audio_mode == AudioMode.UNMUTE:
+                # 将 output_path(/data/processed/task_id/un_mute) => (/data/processed/task_id/cover)
+                cover_output_path = os.path.join(output_path.replace("un_mute", "cover"), f"cover_{i + 1}.jpg")
+                # 获取视频封面和元数据
+                with start_span("scene_detection.extract_cover", {"segment": i + 1}):
+                    metadata = extract_video_cover_with_metadata(
+                        output_segment_path, cover_output_path, media_info, end_time - start_time
+                    )
+                
+                # 将元数据转换为字典格式
+                meta_data_dict = {
+                    "duration": round(metadata.duration, 2),
+                    "width": metadata.width,
+                    "height": metadata.height,
+                    "aspect_ratio": metadata.aspect_ratio,
+                    "aspect_ratio_text": metadata.aspect_ratio_text,
+                    "file_size": int(metadata.file_size),
+                    "fps": int(metadata.fps),
+                    "bitrate": round(metadata.bitrate, 2)
+                }
+
+                # 添加场景信息
+                formatted_scenes.append(
+                    {
+                        "start_frame": int(start),
+                        "end_frame": int(end),
+                        "start_seconds": round(start_time, 3),
+                        "end_seconds": round(end_time, 3),
+                        "output_path": output_segment_path,
+                        "is_mute": video_split_audio_mode == AudioMode.MUTE,
+                        "cover": cover_output_path,
+                        "meta_data": meta_data_dict 
+                    }
+                )
+            # 静音视频
+            else:
+                # 添加场景信息
+                formatted_scenes.append(
+                    {
+                        "start_frame": int(start),
+                        "end_frame": int(end),
+                        "start_seconds": round(start_time, 3),
+                        "end_seconds": round(end_time, 3),
+                        "output_path": output_segment_path,
+                        "is_mute": video_split_audio_mode == AudioMode.MUTE,
+                    }
+                )
+        except Exception as e:
+            logger.error(f"处理视频片段 {i + 1} 失败: {str(e)}")
+            raise
+
+    return formatted_scenes
+
+
+def run_scene_detection(
+    detector,
+    input_path: str,
+    output_path: str,
+    task_id: str,
+    threshold: float = 0.5,
+    visualize: bool = False,
+    video_split_audio_mode: str = AudioMode.UNMUTE,
+    media_info: dict = None,
+) -> dict:
+    """执行一次完整的场景分割：检测场景、编码各片段、提取封面
+
+    Args:
+        detector (SceneDetector): 场景检测模型
+        input_path (str): 视频文件路径
+        output_path (str): 输出目录路径
+        task_id (str): 任务ID
+        threshold (float): 场景切换阈值
+        visualize (bool): 是否生成预测可视化图像
+        video_split_audio_mode (str): 音频处理模式
+        media_info (dict, optional): 上游探测得到的媒体信息，文件未变化时不再重复探测
+
+    Returns:
+        dict: 成功响应的内容
+
+    Raises:
+        ValueError: 视频文件无法加载时抛出
+    """
+    logger.info(
+        "开始处理视频场景分割",
+        {
+            "task_id": task_id,
+            "input_path": input_path,
+            "output_path": output_path,
+            "threshold": threshold,
+            "visualize": visualize,
+        },
+    )
+
+    # 创建输出目录
+    os.makedirs(output_path, exist_ok=True)
+
+    # 优先使用请求中已探测的媒体信息，文件变化或未传入时重新探测
+    try:
+        media_info = resolve_media_info(input_path, media_info)
+    except Exception as e:
+        logger.warning(f"获取媒体信息失败，使用 MoviePy 读取的编码参数: {str(e)}")
+        media_info = None
+
+    request_start = time.perf_counter()
+    video_clip = None
+    try:
+        # 检测视频场景
+        video_frames, scenes, single_frame_predictions, all_frame_predictions = (
+            detect_video_scenes(detector, input_path, threshold)
+        )
+
+        # 加载视频文件
+        logger.info("正在切分场景...")
+        try:
+            video_clip = VideoFileClip(input_path)
+            if not video_clip.reader or not hasattr(video_clip.reader, "fps"):
+                raise ValueError("无法正确加载视频文件，请检查视频格式是否正确")
+        except Exception as e:
+            logger.error(f"加载视频文件失败: {str(e)}")
+            raise ValueError(f"加载视频文件失败: {str(e)}")
+
+        # 处理视频片段
+        formatted_scenes = process_video_segments(
+            video_clip, scenes, output_path, video_split_audio_mode, media_info
+        )
+
+        # 如果需要可视化，生成预测结果的可视化图像
+        if visualize:
+            logger.info("正在生成预测可视化...")
+            visualization = detector.visualize_predictions(
+                video_frames, [single_frame_predictions, all_frame_predictions]
+            )
+            visualization.save(f"{output_path}/predictions.png")
+
+        if video_clip.duration:
+            SCENE_REALTIME_FACTOR.observe(
+                (time.perf_counter() - request_start) / video_clip.duration
+            )
+
+        logger.info(
+            "处理完成",
+            {
+                "task_id": task_id,
+                "scenes_count": len(scenes),
+                "output_dir": output_path,
+            },
+        )
+
+        return {
+            "status": "success",
+            "message": "处理完成",
+            "task_id": task_id,
+            "output_dir": output_path,
+            "data": formatted_scenes,
+        }
+
+    finally:
+        # 确保资源正确释放
+        if video_clip is not None:
+            video_clip.close()
@@ -147,6 +147,15 @@ class SceneDetector:
             all_frames_pred[: len(frames)],
         )
 
+    def warm_up(self, num_frames: int = 100):
+        """用合成帧执行一次预测，提前完成计算图追踪和显存分配，避免首个请求承担冷启动耗时
+
+        Args:
+            num_frames (int): 合成帧数
+        """
+        frames = np.zeros((num_frames, *self._input_size), dtype=np.uint8)
+        self.predict_frames(frames)
+
     def predict_video(self, video_fn: str):
         """预测视频文件中的场景转换
 
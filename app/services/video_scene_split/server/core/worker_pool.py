@@ -0,0 +1,354 @@
+"""场景分割工作进程池
+
+每个工作进程以 spawn 方式启动，加载一份模型并预热后才开始接收任务，任务在进程内逐个执行。
+主进程用与工作进程数相同的分发线程把任务发给空闲的工作进程并等待结果，不阻塞事件循环。
+
+工作进程启动后调用 os.setsid() 成为新进程组的组长，模型推理以及 ffmpeg、MoviePy 启动的
+编码子进程都在这个进程组中。任务超时后主进程用 os.killpg 结束整个进程组，再启动新的工作进程补位，
+超时的任务不会继续在后台占用 GPU 和编码器。
+
+排队和执行中的任务总数超过 workers + max_queue 时拒绝新任务。工作进程加载模型失败时按指数退避重新启动；
+没有任何就绪的工作进程时，排队中的任务以 WorkerUnavailableError 结束，不会一直占用队列。
+"""
+
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional
+from prometheus_client import multiprocess
+from utils.logger import Logger
+from utils.metrics import (
+    SCENE_JOBS_PENDING,
+    SCENE_JOBS_REJECTED_TOTAL,
+    SCENE_JOBS_TIMEOUT_TOTAL,
+    SCENE_WORKER_RESTARTS_TOTAL,
+)
+
+logger = Logger("scene_detection_api")
+
+# 分发线程等待空闲工作进程时检查工作进程池状态的间隔（秒）
+IDLE_POLL_SECONDS = 1.0
+
+
+class QueueFullError(Exception):
+    """等待队列已满，调用方应在 retry_after 秒后重试"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"场景分割任务队列已满，请在 {retry_after} 秒后重试")
+        self.retry_after = retry_after
+
+
+class WorkerCrashedError(Exception):
+    """工作进程在执行任务时意外退出"""
+
+
+class WorkerUnavailableError(Exception):
+    """没有已就绪的工作进程，任务无法执行"""
+
+
+def _worker_main(conn, warm_up: bool):
+    """工作进程入口：成为新进程组的组长，加载模型后逐个执行主进程发来的任务
+
+    Args:
+        conn: 与主进程通信的管道
+        warm_up (bool): 加载模型后是否预热
+    """
+    os.setsid()
+    # 在工作进程中导入，主进程不加载 TensorFlow
+    from core.pipeline import run_scene_detection
+    from core.scene_detection import SceneDetector
+    from utils.tracing import start_span
+
+    try:
+        detector = SceneDetector(logger=logger)
+        if warm_up:
+            detector.warm_up()
+    except Exception as e:
+        conn.send(("failed", str(e)))
+        return
+    conn.send(("ready", None))
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        carrier = task.pop("carrier", None)
+        try:
+            with start_span(
+                "scene_detection.pipeline", {"task_id": str(task["task_id"])}, carrier=carrier
+            ):
+                result = run_scene_detection(detector, **task)
+            conn.send(("ok", result))
+        except ValueError as e:
+            conn.send(("invalid", str(e)))
+        except Exception as e:
+            conn.send(("error", str(e)))
+
+
+class _Worker:
+    """一个工作进程及其通信管道"""
+
+    def __init__(self, index: int, ctx, warm_up: bool):
+        self.index = index
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, warm_up),
+            name=f"scene-worker-{index}",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+
+    def wait_ready(self) -> Optional[str]:
+        """阻塞到模型加载完成
+
+        Returns:
+            Optional[str]: 就绪时为 None，否则为失败原因
+        """
+        try:
+            status, message = self.conn.recv()
+        except (EOFError, OSError):
+            return f"工作进程启动时退出，退出码: {self.process.exitcode}"
+        return None if status == "ready" else message
+
+    def kill(self):
+        """结束工作进程所在的进程组，包括它启动的 ffmpeg 子进程"""
+        pid = self.process.pid
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        # 进程还没来得及调用 setsid 时进程组不存在，直接结束进程本身
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+        if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+            multiprocess.mark_process_dead(pid)
+
+
+class SceneWorkerPool:
+    """场景分割工作进程池
+
+    Args:
+        workers: 工作进程数，每个进程加载一份模型
+        max_queue: 等待队列长度
+        timeout: 单个任务从开始执行起的超时时间（秒）
+        warm_up: 工作进程加载模型后是否预热
+        restart_backoff: 工作进程加载模型失败后首次重新启动的等待时间（秒），之后每次翻倍
+        max_restart_backoff: 重新启动的最长等待时间（秒）
+    """
+
+    def __init__(self, workers: int, max_queue: int, timeout: float, warm_up: bool = True,
+                 restart_backoff: float = 5, max_restart_backoff: float = 300):
+        self.workers = workers
+        self.capacity = workers + max_queue
+        self.timeout = timeout
+        self.warm_up = warm_up
+        self.restart_backoff = restart_backoff
+        self.max_restart_backoff = max_restart_backoff
+        self._ctx = multiprocessing.get_context("spawn")
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scene-dispatch")
+        # 已加载模型、等待任务的工作进程
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        # 全部存活的工作进程，关闭时逐个结束
+        self._live: Dict[int, _Worker] = {}
+        # 各工作进程位置连续加载失败的次数，用于计算重新启动的等待时间
+        self._load_failures: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._ready_workers = 0
+        self._closed = False
+        # 最近一次工作进程加载模型失败的原因
+        self.last_error: Optional[str] = None
+        # 最近任务执行耗时的指数移动平均，用于估算 Retry-After
+        self._avg_run_seconds = 120.0
+
+    def start(self):
+        """启动全部工作进程，各进程并行加载模型，加载完成的进程陆续开始接收任务"""
+        for index in range(self.workers):
+            self._spawn(index)
+
+    def _spawn(self, index: int):
+        worker = _Worker(index, self._ctx, self.warm_up)
+        with self._lock:
+            self._live[index] = worker
+        threading.Thread(
+            target=self._wait_ready, args=(worker,), name=f"scene-worker-{index}-startup", daemon=True
+        ).start()
+
+    def _wait_ready(self, worker: _Worker):
+        start_time = time.perf_counter()
+        error = worker.wait_ready()
+        if error is not None:
+            self.last_error = error
+            self._discard(worker)
+            with self._lock:
+                failures = self._load_failures.get(worker.index, 0) + 1
+                self._load_failures[worker.index] = failures
+            delay = min(self.restart_backoff * 2 ** (failures - 1), self.max_restart_backoff)
+            logger.error(f"工作进程 {worker.index} 加载模型失败，{delay:.0f} 秒后重新启动: {error}")
+            time.sleep(delay)
+            with self._lock:
+                closed = self._closed
+            if not closed:
+                SCENE_WORKER_RESTARTS_TOTAL.labels(reason="load_failed").inc()
+                self._spawn(worker.index)
+            return
+        logger.info(f"工作进程 {worker.index} 已就绪，耗时: {time.perf_counter() - start_time:.2f}s")
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                self._ready_workers += 1
+                self._load_failures.pop(worker.index, None)
+                self.last_error = None
+        if closed:
+            self._discard(worker)
+            return
+        self._idle.put(worker)
+
+    def _discard(self, worker: _Worker):
+        """结束工作进程并从存活列表中移除"""
+        worker.kill()
+        with self._lock:
+            if self._live.get(worker.index) is worker:
+                del self._live[worker.index]
+
+    def _replace(self, worker: _Worker, reason: str):
+        """结束执行任务中的工作进程，服务未关闭时启动新的进程补位"""
+        self._discard(worker)
+        SCENE_WORKER_RESTARTS_TOTAL.labels(reason=reason).inc()
+        with self._lock:
+            self._ready_workers -= 1
+            closed = self._closed
+        if not closed:
+            self._spawn(worker.index)
+
+    @property
+    def ready(self) -> bool:
+        """是否至少有一个工作进程已加载并预热模型"""
+        with self._lock:
+            return self._ready_workers > 0
+
+    def status(self) -> Dict[str, Any]:
+        """工作进程和队列状态，供就绪检查接口展示"""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "ready_workers": self._ready_workers,
+                "pending": self._pending,
+                "capacity": self.capacity,
+            }
+
+    def _retry_after(self) -> int:
+        waves = (self._pending - self.workers) // self.workers + 1
+        return max(1, int(self._avg_run_seconds * waves))
+
+    def submit(self, task: Dict[str, Any]) -> Future:
+        """提交任务
+
+        Args:
+            task: core.pipeline.run_scene_detection 的参数（不含 detector），
+                可另带 carrier 传递追踪上下文
+
+        Returns:
+            Future: 结果为成功响应的内容；视频无效时为 ValueError，超时为 TimeoutError，
+                工作进程意外退出为 WorkerCrashedError，没有就绪的工作进程为 WorkerUnavailableError，
+                其他失败为 RuntimeError
+
+        Raises:
+            QueueFullError: 队列已满时抛出
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("工作进程池已关闭")
+            if self._pending >= self.capacity:
+                SCENE_JOBS_REJECTED_TOTAL.inc()
+                raise QueueFullError(self._retry_after())
+            self._pending += 1
+            SCENE_JOBS_PENDING.set(self._pending)
+        future = self._executor.submit(self._run, task)
+        # 排队中被取消的任务同样会触发回调
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future: Future):
+        with self._lock:
+            self._pending -= 1
+            SCENE_JOBS_PENDING.set(self._pending)
+
+    def _acquire(self) -> _Worker:
+        """等待空闲的工作进程
+
+        工作进程全部在执行任务时一直等待；工作进程池关闭或没有任何就绪的工作进程时
+        （例如超时后补位的进程加载失败），抛出 WorkerUnavailableError，不再占用队列。
+        """
+        while True:
+            try:
+                return self._idle.get(timeout=IDLE_POLL_SECONDS)
+            except queue.Empty:
+                pass
+            with self._lock:
+                closed = self._closed
+            if closed:
+                raise WorkerUnavailableError("工作进程池已关闭")
+            if not self.ready:
+                raise WorkerUnavailableError(
+                    f"没有已就绪的场景分割工作进程，请稍后重试: {self.last_error or '模型加载中'}"
+                )
+
+    def _run(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """在分发线程中执行：取一个空闲的工作进程，发送任务并在超时时间内等待结果"""
+        worker = self._acquire()
+        start_time = time.perf_counter()
+        outcome = None
+        try:
+            worker.conn.send(task)
+            if worker.conn.poll(self.timeout):
+                status, payload = worker.conn.recv()
+            else:
+                outcome = "timeout"
+        except (EOFError, OSError):
+            outcome = "crashed"
+
+        if outcome == "timeout":
+            SCENE_JOBS_TIMEOUT_TOTAL.inc()
+            logger.error(
+                f"任务超时，结束工作进程 {worker.index} 及其子进程",
+                {"task_id": task.get("task_id"), "timeout": self.timeout},
+            )
+            self._replace(worker, "timeout")
+            raise TimeoutError("视频处理超时，请检查视频文件或调整超时时间设置")
+        if outcome == "crashed":
+            self._replace(worker, "crashed")
+            exitcode = worker.process.exitcode
+            logger.error(
+                f"工作进程 {worker.index} 意外退出", {"task_id": task.get("task_id"), "exitcode": exitcode}
+            )
+            raise WorkerCrashedError(f"场景分割工作进程意外退出，退出码: {exitcode}")
+
+        self._idle.put(worker)
+        with self._lock:
+            self._avg_run_seconds = 0.8 * self._avg_run_seconds + 0.2 * (time.perf_counter() - start_time)
+        if status == "ok":
+            return payload
+        if status == "invalid":
+            raise ValueError(payload)
+        raise RuntimeError(payload)
+
+    def shutdown(self):
+        """停止接收新任务，取消排队中的任务并结束全部工作进程"""
+        with self._lock:
+            self._closed = True
+            workers = list(self._live.values())
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        for worker in workers:
+            self._discard(worker)
@@ -0,0 +1,65 @@
+"""视频场景分割服务的 Prometheus 指标"""
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# 场景分割请求总数
+SCENE_REQUESTS_TOTAL = Counter(
+    "scene_detection_requests_total",
+    "视频场景分割请求总数",
+    ["status"],
+)
+
+# 模型推理耗时
+SCENE_INFERENCE_SECONDS = Histogram(
+    "scene_detection_inference_seconds",
+    "场景检测模型推理耗时（秒）",
+    buckets=(1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600),
+)
+
+# 推理吞吐：每秒处理的视频帧数
+SCENE_FRAMES_PER_SECOND = Histogram(
+    "scene_detection_frames_per_second",
+    "场景检测每秒处理的视频帧数",
+    buckets=(50, 100, 200, 400, 800, 1600, 3200, 6400),
+)
+
+# 实时率：整个请求的处理耗时 / 视频时长，小于 1 表示快于实时
+SCENE_REALTIME_FACTOR = Histogram(
+    "scene_detection_realtime_factor",
+    "场景分割实时率（处理耗时 / 视频时长）",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8),
+)
+
+# 单个视频片段的编码耗时
+SCENE_SEGMENT_ENCODE_SECONDS = Histogram(
+    "scene_detection_segment_encode_seconds",
+    "单个视频片段的编码耗时（秒）",
+    ["audio_mode"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+# 排队和执行中的场景分割任务数，多进程模式下只由主进程设置
+SCENE_JOBS_PENDING = Gauge(
+    "scene_detection_jobs_pending",
+    "排队和执行中的场景分割任务数",
+    multiprocess_mode="livesum",
+)
+
+# 因队列已满被拒绝的任务数
+SCENE_JOBS_REJECTED_TOTAL = Counter(
+    "scene_detection_jobs_rejected_total",
+    "因队列已满被拒绝的场景分割任务数",
+)
+
+# 超时后连同 ffmpeg 子进程一起被结束的任务数
+SCENE_JOBS_TIMEOUT_TOTAL = Counter(
+    "scene_detection_jobs_timeout_total",
+    "处理超时被结束的场景分割任务数",
+)
+
+# 工作进程重启次数，reason 为 timeout（任务超时）、crashed（进程意外退出）或 load_failed（加载模型失败）
+SCENE_WORKER_RESTARTS_TOTAL = Counter(
+    "scene_detection_worker_restarts_total",
+    "场景分割工作进程重启次数",
+    ["reason"],
+)
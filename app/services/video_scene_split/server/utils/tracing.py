@@ -0,0 +1,134 @@
+"""链路追踪
+
+从请求头中读取 Celery worker 传入的 W3C traceparent，把本服务内部的处理步骤
+记录为该任务调用链上的子 span。导出方式由 TRACING_EXPORTER 配置（none / otlp / file），
+未安装 opentelemetry 或配置为 none 时所有接口退化为空操作。
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+try:
+    from opentelemetry import propagate
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import (
+        BatchSpanProcessor,
+        SpanExporter,
+        SpanExportResult,
+    )
+    from opentelemetry.trace import Status, StatusCode
+except ImportError:
+    TracerProvider = None
+
+
+# 链路追踪导出方式：none（关闭）/ otlp / file
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none")
+# 上报的服务名称
+TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "scene-detection")
+# OTLP HTTP 接收地址
+TRACING_OTLP_ENDPOINT = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+# file 导出方式的输出文件，每行一个 span
+TRACING_FILE_PATH = os.getenv("TRACING_FILE_PATH", "logs/traces.jsonl")
+
+
+class _NoopSpan:
+    """未启用追踪时使用的空 span"""
+
+    def set_attribute(self, key, value):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+if TracerProvider is not None:
+
+    class JsonLinesSpanExporter(SpanExporter):
+        """将 span 以 JSON Lines 格式追加写入本地文件"""
+
+        def __init__(self, file_path: str):
+            self.file_path = file_path
+            self._lock = threading.Lock()
+            directory = os.path.dirname(file_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        def export(self, spans):
+            lines = [json.dumps(json.loads(span.to_json()), ensure_ascii=False) for span in spans]
+            try:
+                with self._lock, open(self.file_path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+            except OSError:
+                return SpanExportResult.FAILURE
+            return SpanExportResult.SUCCESS
+
+        def shutdown(self):
+            pass
+
+
+def _create_tracer():
+    if TracerProvider is None or TRACING_EXPORTER == "none":
+        return None
+    if TRACING_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        exporter = OTLPSpanExporter(endpoint=TRACING_OTLP_ENDPOINT)
+    elif TRACING_EXPORTER == "file":
+        exporter = JsonLinesSpanExporter(TRACING_FILE_PATH)
+    else:
+        raise ValueError(f"不支持的追踪导出方式: {TRACING_EXPORTER}")
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": TRACING_SERVICE_NAME})
+    )
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    return provider.get_tracer(TRACING_SERVICE_NAME)
+
+
+tracer = _create_tracer()
+
+
+@contextmanager
+def start_span(name: str, attributes: Optional[Dict] = None, carrier: Optional[Dict] = None):
+    """创建一个 span 并设为当前 span
+
+    Args:
+        name (str): span 名称
+        attributes (dict, optional): span 属性
+        carrier (dict, optional): 请求头，提供时以其中的追踪上下文作为父 span
+
+    Yields:
+        span 对象；未启用追踪时为空操作对象
+    """
+    if tracer is None:
+        yield _NOOP_SPAN
+        return
+
+    context = propagate.extract(carrier) if carrier is not None else None
+    with tracer.start_as_current_span(
+        name, context=context, attributes=attributes, record_exception=False
+    ) as span:
+        try:
+            yield span
+        except Exception as e:
+            span.record_exception(e)
+            span.set_status(Status(StatusCode.ERROR, str(e)))
+            raise
+
+
+def inject_headers(headers: Optional[Dict] = None) -> Dict:
+    """将当前追踪上下文写入请求头形式的字典，用于把上下文传给工作进程
+
+    Args:
+        headers (dict, optional): 已有的请求头
+
+    Returns:
+        dict: 包含 traceparent 等追踪头的字典
+    """
+    headers = dict(headers or {})
+    if tracer is not None:
+        propagate.inject(headers)
+    return headers
@@ -259,6 +259,48 @@ def get_video_metadata(video_path: str, cover_path: Optional[str] = None, is_ide
     
     return metadata
 
+def metadata_from_media_info(
+    video_path: str,
+    media_info: dict,
+    duration: float,
+    cover_path: Optional[str] = None,
+    is_ideal: bool = False,
+) -> VideoMetadata:
+    """根据源视频的媒体信息生成片段的元数据，不再打开片段文件探测
+
+    片段按源视频的分辨率和帧率编码，只有时长和文件大小需要单独计算。
+    media_info 中的宽高已按旋转角度换算为显示尺寸，与 MoviePy 的 clip.w/clip.h 一致。
+
+    Args:
+        video_path (str): 片段文件路径
+        media_info (dict): 源视频的媒体信息
+        duration (float): 片段时长(秒)
+        cover_path (Optional[str]): 封面图片路径
+        is_ideal (bool): 是否为理想封面
+
+    Returns:
+        VideoMetadata: 视频元数据对象
+    """
+    video = media_info.get("video") or {}
+    width = video.get("width", 0)
+    height = video.get("height", 0)
+    file_size = os.path.getsize(video_path) if os.path.exists(video_path) else 0
+    # 防止除零错误
+    duration = max(duration, 0.001)
+
+    return VideoMetadata(
+        duration=duration,
+        width=width,
+        height=height,
+        aspect_ratio=width / max(height, 1),
+        aspect_ratio_text=calculate_aspect_ratio_text(width, height),
+        file_size=file_size,
+        fps=video.get("fps", 0.0),
+        bitrate=file_size / duration,
+        cover_path=cover_path,
+        is_ideal_cover=is_ideal,
+    )
+
 def save_frame_as_cover(frame: np.ndarray, output_path: str) -> bool:
     """将帧保存为封面图片
     
@@ -313,12 +355,19 @@ def get_first_frame(video_path: str) -> Optional[np.ndarray]:
         logger.error(f"获取视频第一帧失败: {str(e)}")
         return None
 
-def extract_video_cover_with_metadata(video_path: str, output_path: str) -> VideoMetadata:
+def extract_video_cover_with_metadata(
+    video_path: str,
+    output_path: str,
+    media_info: Optional[dict] = None,
+    duration: Optional[float] = None,
+) -> VideoMetadata:
     """提取视频封面并返回视频元数据
     
     Args:
         video_path (str): 视频文件路径
         output_path (str): 输出图片路径
+        media_info (Optional[dict]): 源视频的媒体信息，与 duration 同时提供时直接生成元数据
+        duration (Optional[float]): 片段时长(秒)
         
     Returns:
         VideoMetadata: 包含视频元数据和封面信息的对象，即使部分操作失败也会返回尽可能多的信息
@@ -363,7 +412,10 @@ def extract_video_cover_with_metadata(video_path: str, output_path: str) -> Vide
     try:
         # 只有成功保存了封面才传递封面路径
         cover_path = output_path if cover_saved else None
-        metadata = get_video_metadata(video_path, cover_path, is_ideal)
+        if media_info and media_info.get("video") and duration is not None:
+            metadata = metadata_from_media_info(video_path, media_info, duration, cover_path, is_ideal)
+        else:
+            metadata = get_video_metadata(video_path, cover_path, is_ideal)
     except Exception as e:
         logger.error(f"获取视频元数据失败: {str(e)}")
     
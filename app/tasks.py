@@ -6,7 +6,13 @@ from app.config import settings
 from app.utils.logger import Logger
 from app.utils.tos_client import TOSClient
 from app.services.mysql.video_tasks_db import VideoTasksDB
+from app.utils.metrics import track_step, TASKS_TOTAL
+from app.utils.tracing import start_span, inject_headers, extract_task_headers, flush as flush_spans
+from app.utils.media_info import probe_media, normalize_extension
+from app.utils.transcript import scene_time_ranges, assign_scene_texts
+from app.utils.service_readiness import wait_for_service, post_with_retry
 import os
+import json
 import asyncio
 import httpx
 from datetime import datetime
@@ -296,7 +302,8 @@ async def cleanup_directories(task_id: str, upload_dir: str, output_path: str):
         })
 
 async def handle_scene_detection(
-    task_id: str, video_path: str, output_path: str, video_split_audio_mode: str
+    task_id: str, video_path: str, output_path: str, video_split_audio_mode: str,
+    media_info: dict = None
 ) -> list:
     """处理场景分割任务
 
@@ -305,6 +312,7 @@ async def handle_scene_detection(
         video_path (str): 视频文件路径
         output_path (str): 输出目录路径
         video_split_audio_mode (str): 音频处理模式
+        media_info (dict, optional): 下载后探测得到的媒体信息，随请求传给服务避免重复探测
 
     Returns:
         list: 场景分割结果列表
@@ -316,6 +324,7 @@ async def handle_scene_detection(
         logger.info(
             "开始场景分割", {"task_id": task_id, "audio_mode": video_split_audio_mode}
         )
+        await wait_for_service("场景分割", settings.SCENE_DETECTION_API_PORT)
         
         api_url = f"http://127.0.0.1:{settings.SCENE_DETECTION_API_PORT}/api/v1/scene-detection/process"
         
@@ -324,23 +333,27 @@ async def handle_scene_detection(
                 "input_path": video_path,
                 "output_path": output_path,
                 "task_id": task_id,
-                "video_split_audio_mode": video_split_audio_mode
+                "video_split_audio_mode": video_split_audio_mode,
+                "media_info": media_info
             }
                 
-            async with session.post(api_url, json=payload) as response:
-                if response.status == 200:
-                    response_data = await response.json()
-                    if response_data.get("status") == "success" and isinstance(response_data.get("data"), list):
-                        scenes = response_data["data"]
-                        logger.info(
-                            f"{video_split_audio_mode} - 场景分割完成",
-                            {"task_id": task_id, "scenes_count": len(scenes)},
-                        )
-                    else:
-                        raise Exception(f"{video_split_audio_mode} - 场景分割API返回格式错误: {response_data}")
+            # 队列已满（429）或工作进程重启中（503）时稍后重新提交；
+            # 408 表示已运行到处理超时，重新提交只会再次超时，直接失败
+            status, body = await post_with_retry(
+                session, "场景分割", api_url, payload, inject_headers(), retry_statuses=(429, 503)
+            )
+            if status == 200:
+                response_data = json.loads(body)
+                if response_data.get("status") == "success" and isinstance(response_data.get("data"), list):
+                    scenes = response_data["data"]
+                    logger.info(
+                        f"{video_split_audio_mode} - 场景分割完成",
+                        {"task_id": task_id, "scenes_count": len(scenes)},
+                    )
                 else:
-                    error_msg = await response.text()
-                    raise Exception(f"{video_split_audio_mode} - 场景分割API请求失败: {error_msg}")
+                    raise Exception(f"{video_split_audio_mode} - 场景分割API返回格式错误: {response_data}")
+            else:
+                raise Exception(f"{video_split_audio_mode} - 场景分割API请求失败: HTTP {status}: {body}")
 
         # 按开始帧排序
         scenes.sort(key=lambda x: x["start_frame"])
@@ -357,7 +370,7 @@ async def handle_scene_detection(
 
 
 async def handle_audio_separation(
-    task_id: str, video_path: str, output_path: str
+    task_id: str, video_path: str, output_path: str, media_info: dict = None
 ) -> dict:
     """处理音频分离任务
 
@@ -365,11 +378,13 @@ async def handle_audio_separation(
         task_id (str): 任务ID
         video_path (str): 视频文件路径
         output_path (str): 输出目录路径
+        media_info (dict, optional): 下载后探测得到的媒体信息，随请求传给服务避免重复探测
 
     Returns:
         dict: 包含以下字段的字典:
             - has_audio_stream (bool): 是否包含音频流
             - vocals_path (str): 人声音频文件路径，如果没有音频流则为空字符串
+            - pcm_path (str): 人声的 16kHz PCM 文件路径，未输出时为空字符串
 
     Raises:
         Exception: 音频分离失败时抛出异常
@@ -377,6 +392,7 @@ async def handle_audio_separation(
     try:
         logger.info("开始音频分离", {"task_id": task_id})
         await update_task_step(task_id, "audio_extract", "processing")
+        await wait_for_service("音频分离", settings.AUDIO_SEPARATION_API_PORT)
         
         api_url = f"http://127.0.0.1:{settings.AUDIO_SEPARATION_API_PORT}/api/v1/audio-separation/process"
         
@@ -384,43 +400,50 @@ async def handle_audio_separation(
             "audio_path": video_path,
             "model": "11",  # 使用默认模型
             "task_id": task_id,
-            "output_path": output_path
+            "output_path": output_path,
+            "media_info": media_info,
+            "pcm_output": settings.TRANSCRIPTION_USE_PCM
         }
         
         async with aiohttp.ClientSession() as session:
-            async with session.post(api_url, json=payload) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    if result.get("status") != "success":
-                        raise Exception("API 返回状态不是 success")
-                    
-                    # 从 file_paths 中获取 vocals 路径
-                    file_paths = result.get("file_paths", {})
-                    vocals_path = file_paths.get("vocals", "")
-                    
-                    # 检查是否有音频流
-                    has_audio_stream = True
-                    if "has_audio_stream" in result:
-                        has_audio_stream = result.get("has_audio_stream")
-                    
-                    if has_audio_stream and not vocals_path:
-                        raise Exception("API返回结果中未找到 vocals 文件路径")
-                    
-                    # 如果有音频流，则更新任务状态为成功
-                    if has_audio_stream:
-                        await update_task_step(task_id, "audio_extract", "success", vocals_path)
-                        logger.info("音频分离完成", {"task_id": task_id, "audio_path": vocals_path})
-                    else:
-                        await update_task_step(task_id, "audio_extract", "success", "无音频流")
-                        logger.info("视频不包含音频流", {"task_id": task_id})
-                    
-                    return {
-                        "has_audio_stream": has_audio_stream,
-                        "vocals_path": vocals_path
-                    }
+            # 队列已满时服务返回 429 和 Retry-After，等待后重新提交
+            status, body = await post_with_retry(session, "音频分离", api_url, payload, inject_headers())
+            if status == 200:
+                result = json.loads(body)
+                if result.get("status") != "success":
+                    raise Exception("API 返回状态不是 success")
+                
+                # 从 file_paths 中获取 vocals 路径
+                file_paths = result.get("file_paths", {})
+                vocals_path = file_paths.get("vocals", "")
+                
+                # 检查是否有音频流
+                has_audio_stream = True
+                if "has_audio_stream" in result:
+                    has_audio_stream = result.get("has_audio_stream")
+                
+                if has_audio_stream and not vocals_path:
+                    raise Exception("API返回结果中未找到 vocals 文件路径")
+                
+                # 如果有音频流，则更新任务状态为成功
+                if has_audio_stream:
+                    await update_task_step(task_id, "audio_extract", "success", vocals_path)
+                    logger.info("音频分离完成", {
+                        "task_id": task_id,
+                        "audio_path": vocals_path,
+                        "analysis": result.get("analysis"),
+                    })
                 else:
-                    error_msg = await response.text()
-                    raise Exception(f"音频分离API请求失败: {error_msg}")
+                    await update_task_step(task_id, "audio_extract", "success", "无音频流")
+                    logger.info("视频不包含音频流", {"task_id": task_id, "analysis": result.get("analysis")})
+                
+                return {
+                    "has_audio_stream": has_audio_stream,
+                    "vocals_path": vocals_path,
+                    "pcm_path": file_paths.get("pcm", "")
+                }
+            else:
+                raise Exception(f"音频分离API请求失败: HTTP {status}: {body}")
 
     except asyncio.TimeoutError:
         error_msg = "音频分离请求超时"
@@ -436,17 +459,19 @@ async def handle_audio_separation(
 
 
 async def handle_audio_transcription(
-    task_id: str, video_path: str, output_path: str
-) -> str:
+    task_id: str, video_path: str, output_path: str, pcm_path: str = ""
+) -> dict:
     """处理语音转写任务
 
     Args:
         task_id (str): 任务ID
         video_path (str): 视频文件路径
         output_path (str): 输出目录路径
+        pcm_path (str, optional): 音频分离输出的 16kHz PCM 文件，提供时转写服务不再解码
 
     Returns:
-        str: 转写结果
+        dict: 转写结果，包含 transcription（全文）、segments（带起止时间的分段）
+            和 subtitle_paths（字幕格式到本地文件路径的映射）
 
     Raises:
         Exception: 语音转写失败时抛出异常
@@ -454,25 +479,35 @@ async def handle_audio_transcription(
     try:
         logger.info("开始语音转写", {"task_id": task_id})
         await update_task_step(task_id, "text_convert", "processing")
+        await wait_for_service("语音转写", settings.AUDIO_TRANSCRIPTION_API_PORT)
         
         api_url = f"http://127.0.0.1:{settings.AUDIO_TRANSCRIPTION_API_PORT}/api/v1/audio-transcription/process"
         
         payload = {
             "audio_path": video_path,
             "output_path": output_path,
-            "task_id": task_id
+            "task_id": task_id,
+            "pcm_path": pcm_path or None,
+            "token_timestamps": settings.TRANSCRIPTION_TOKEN_TIMESTAMPS,
+            "subtitle_formats": [
+                fmt.strip() for fmt in settings.TRANSCRIPTION_SUBTITLE_FORMATS.split(",") if fmt.strip()
+            ],
         }
         
         async with aiohttp.ClientSession() as session:
-            async with session.post(api_url, json=payload) as response:
+            async with session.post(api_url, json=payload, headers=inject_headers()) as response:
                 if response.status == 200:
                     result = await response.json()
-                    logger.info(f"语音转写结果{result}")
+                    logger.debug("语音转写结果", {"task_id": task_id, "result": result})
                     transcription = result.get("transcription", "")  # 获取转写结果
                     
                     await update_task_step(task_id, "text_convert", "success", transcription)
                     logger.info("语音转写完成", {"task_id": task_id})
-                    return transcription
+                    return {
+                        "transcription": transcription,
+                        "segments": result.get("segments") or [],
+                        "subtitle_paths": result.get("subtitle_paths") or {},
+                    }
                 else:
                     error_msg = await response.text()
                     raise Exception(f"语音转写API请求失败: {error_msg}")
@@ -581,6 +616,45 @@ async def upload_transcription_file(
         raise
 
 
+async def upload_subtitle_files(
+    subtitle_paths: dict, base_path: str, uid: str, task_id: str
+) -> dict:
+    """上传转写服务导出的字幕文件到对象存储
+
+    Args:
+        subtitle_paths (dict): 字幕格式到本地文件路径的映射
+        base_path (str): 基础存储路径
+        uid (str): 用户ID
+        task_id (str): 任务ID
+
+    Returns:
+        dict: 字幕格式到对象存储路径的映射
+
+    Raises:
+        Exception: 上传失败时抛出异常
+    """
+    try:
+        tos_client = TOSClient()
+        subtitle_object_keys = {}
+
+        for fmt, subtitle_path in subtitle_paths.items():
+            if subtitle_path and os.path.exists(subtitle_path):
+                # 与 transcription.txt 放在同一目录下
+                subtitle_object_key = f"{base_path}/transcription.{fmt}"
+                tos_client.upload_file(
+                    local_file_path=subtitle_path,
+                    object_key=subtitle_object_key,
+                    metadata={"uid": uid, "task_id": task_id},
+                )
+                subtitle_object_keys[fmt] = subtitle_object_key
+
+        await update_task_step(task_id, "subtitle_object_keys", "success", subtitle_object_keys)
+        return subtitle_object_keys
+    except Exception as e:
+        logger.error("字幕文件上传失败", {"task_id": task_id, "error": str(e)})
+        raise
+
+
 async def upload_scene_files(
     scenes: list, base_path: str, uid: str, task_id: str
 ) -> list:
@@ -707,35 +781,66 @@ def process_video(self, task_id: str, video_url: str, uid: str, video_split_audi
             # 3. 下载视频文件
             video_path = os.path.join(upload_dir, "origin")
             logger.info("开始下载视频", {"task_id": task_id, "video_url": video_url})
-            video_path = await download_video(video_url, video_path)
+            with track_step("download"), start_span("download", {"task_id": task_id}):
+                video_path = await download_video(video_url, video_path)
             logger.info("视频下载完成", {"task_id": task_id, "video_path": video_path})
 
+            # 3.1 探测一次媒体信息，按实际格式修正扩展名，并随请求传给各服务
+            media_info = None
+            with track_step("probe"), start_span("probe", {"task_id": task_id}):
+                try:
+                    media_info = await asyncio.to_thread(probe_media, video_path)
+                    video_path, media_info = normalize_extension(video_path, media_info)
+                    logger.info("视频信息探测完成", {
+                        "task_id": task_id,
+                        "video_path": video_path,
+                        "format": media_info["format_name"],
+                        "duration": media_info["duration"],
+                        "video": media_info["video"],
+                        "audio": media_info["audio"],
+                        "keyframes": len(media_info["keyframes"] or []),
+                    })
+                except Exception as e:
+                    # 探测失败不影响后续流程，各服务会自行探测
+                    logger.warning("视频信息探测失败", {"task_id": task_id, "error": str(e)})
+
             # 4. 拆解视频
             await update_task_step(task_id, "scene_cut", "processing")
             # 4.1 拆解非静音视频
-            un_mute_scenes = await handle_scene_detection(
-                task_id, video_path, os.path.join(output_path, "un_mute"), AudioMode.UNMUTE
-            )
+            with track_step("scene_cut_un_mute"), start_span(
+                "scene_cut", {"task_id": task_id, "audio_mode": AudioMode.UNMUTE}
+            ):
+                un_mute_scenes = await handle_scene_detection(
+                    task_id, video_path, os.path.join(output_path, "un_mute"), AudioMode.UNMUTE,
+                    media_info
+                )
             # 4.1.1 视频文件 tos 地址
             base_path = f"videos/{now.year}/{now.month:02d}/{task_id}"
             # 4.1.2 上传 tos
-            un_mute_tos_file = await upload_scene_files(un_mute_scenes, base_path, uid, task_id)
+            with track_step("upload_un_mute_scenes"), start_span("upload_un_mute_scenes", {"task_id": task_id}):
+                un_mute_tos_file = await upload_scene_files(un_mute_scenes, base_path, uid, task_id)
             # 4.1.3 将视频片段的 tos 地址保存到数据库中
             await update_task_step(task_id, "un_mute_scene_files", "success", un_mute_tos_file)
 
             # 4.2 拆解静音视频
-            mute_scenes = await handle_scene_detection(
-                task_id, video_path, os.path.join(output_path, "mute"), AudioMode.MUTE
-            )
+            with track_step("scene_cut_mute"), start_span(
+                "scene_cut", {"task_id": task_id, "audio_mode": AudioMode.MUTE}
+            ):
+                mute_scenes = await handle_scene_detection(
+                    task_id, video_path, os.path.join(output_path, "mute"), AudioMode.MUTE,
+                    media_info
+                )
             # 4.2.2 上传 tos
-            mute_tos_file = await upload_scene_files(mute_scenes, base_path, uid, task_id)
+            with track_step("upload_mute_scenes"), start_span("upload_mute_scenes", {"task_id": task_id}):
+                mute_tos_file = await upload_scene_files(mute_scenes, base_path, uid, task_id)
             # 4.2.3 将视频片段的 tos 地址保存到数据库中
             await update_task_step(task_id, "mute_scene_files", "success", mute_tos_file)
 
             await update_task_step(task_id, "scene_cut", "success")
 
             # 5. 人声分离
-            audio_info = await handle_audio_separation(task_id, video_path, output_path)
+            with track_step("audio_extract"), start_span("audio_extract", {"task_id": task_id}):
+                audio_info = await handle_audio_separation(task_id, video_path, output_path, media_info)
             
             # 5.1.1视频封面文件 tos 地址
             cover_base_path = f"cover/{now.year}/{now.month:02d}/{task_id}"
@@ -745,22 +850,44 @@ def process_video(self, task_id: str, video_url: str, uid: str, video_split_audi
                 audio_path = audio_info["vocals_path"]
                 
                 # 处理音频转写
-                transcription = await handle_audio_transcription(
-                    task_id, audio_path, output_path
-                )
+                with track_step("text_convert"), start_span("text_convert", {"task_id": task_id}):
+                    transcription_info = await handle_audio_transcription(
+                        task_id, audio_path, output_path, audio_info["pcm_path"]
+                    )
+                transcription = transcription_info["transcription"]
                 
                 # 5.1
                 # 音频文件 tos 地址
                 audio_base_path = f"audios/{now.year}/{now.month:02d}/{task_id}"
                 
                 # 5-1.2 上传音频文件
-                await upload_audio_file(audio_path, audio_base_path, uid, task_id)
+                with track_step("upload_audio"), start_span("upload_audio", {"task_id": task_id}):
+                    await upload_audio_file(audio_path, audio_base_path, uid, task_id)
                 
                 # 5-2. 上传转写文件
                 # 转写文件保存在音频的 tos 目录下
-                await upload_transcription_file(
-                    transcription, output_path, audio_base_path, uid, task_id
-                )
+                with track_step("upload_transcription"), start_span("upload_transcription", {"task_id": task_id}):
+                    await upload_transcription_file(
+                        transcription, output_path, audio_base_path, uid, task_id
+                    )
+                    # 字幕文件与转写文本上传到同一目录
+                    if transcription_info["subtitle_paths"]:
+                        await upload_subtitle_files(
+                            transcription_info["subtitle_paths"], audio_base_path, uid, task_id
+                        )
+
+                # 5-2.1 按分段时间戳把转写文本分配到各场景，不再逐场景识别
+                with track_step("scene_text"), start_span("scene_text", {"task_id": task_id}):
+                    try:
+                        info = media_info or {}
+                        ranges = scene_time_ranges(
+                            un_mute_scenes, (info.get("video") or {}).get("fps"), info.get("duration")
+                        )
+                        scene_texts = assign_scene_texts(transcription_info["segments"], ranges)
+                        await update_task_step(task_id, "scene_texts", "success", scene_texts)
+                    except Exception as e:
+                        # 场景文本是附加信息，失败时不影响任务结果
+                        logger.warning("场景文本切分失败", {"task_id": task_id, "error": str(e)})
             else:
                 # 没有音频流，跳过音频处理步骤
                 logger.info("视频没有音频流，跳过音频处理步骤", {"task_id": task_id})
@@ -769,16 +896,19 @@ def process_video(self, task_id: str, video_url: str, uid: str, video_split_audi
             
             # 5-3. 上传场景切割文件
             # 上传视频封面到 tos
-            cover_files = await upload_cover_files(un_mute_scenes, cover_base_path, uid, task_id)
+            with track_step("upload_cover"), start_span("upload_cover", {"task_id": task_id}):
+                cover_files = await upload_cover_files(un_mute_scenes, cover_base_path, uid, task_id)
             # 将视频封面的 tos 地址保存到数据库中
             await update_task_step(task_id, "cover_list", "success", cover_files)
 
             # 6. 更新任务状态为完成
             await update_task_status_and_log(task_id, TaskStatus.COMPLETED)
+            TASKS_TOTAL.labels(queue=current_queue, status="completed").inc()
             logger.info("视频处理完成", {"task_id": task_id})
 
         except Exception as e:
             error_msg = str(e)
+            TASKS_TOTAL.labels(queue=current_queue, status="failed").inc()
             logger.error("视频处理失败", {
                 "task_id": task_id,
                 "error": error_msg
@@ -808,4 +938,13 @@ def process_video(self, task_id: str, video_url: str, uid: str, video_split_audi
             # 无论任务成功还是失败，都清理目录
             await cleanup_directories(task_id, upload_dir, output_path)
 
-    return asyncio.run(_process())
+    # 整个任务的耗时记为 total 步骤，任务 span 以 API 传入的追踪上下文为父 span
+    try:
+        with track_step("total"), start_span(
+            "process_video",
+            {"task_id": task_id, "uid": uid, "queue": current_queue},
+            carrier=extract_task_headers(self.request),
+        ):
+            return asyncio.run(_process())
+    finally:
+        flush_spans()
@@ -1,37 +1,142 @@
+import threading
+import time
 import redis
-from celery.exceptions import OperationalError
 from app.config import settings  # 直接使用 settings
 from app.utils.logger import Logger
 
 logger = Logger("video_tasks")
 
 
-def check_celery_connection():
-    """检查 Celery 和 Redis 连接"""
-    try:
-        # 直接使用配置中的值
-        redis_client = redis.Redis(
+class BrokerHealthMonitor:
+    """Broker 健康状态监控器
+
+    在后台线程中按固定间隔通过连接池 ping Redis broker，并缓存最近一次的检查结果。
+    请求处理函数只读取缓存状态，不再为每个请求新建连接；日志只在状态变化时写入。
+    """
+
+    def __init__(self, interval: float, stale_after: float):
+        """
+        Args:
+            interval (float): 两次检查之间的间隔（秒）
+            stale_after (float): 检查结果的有效期（秒），超过后视为不可用
+        """
+        self.interval = interval
+        self.stale_after = stale_after
+        self.pool = redis.ConnectionPool(
             host=settings.REDIS_HOST,
             port=settings.REDIS_PORT,
             password=settings.REDIS_PASSWORD,
             db=0,  # broker 使用 db 0
             socket_timeout=5,
-            socket_connect_timeout=5
+            socket_connect_timeout=5,
+            max_connections=4,
+        )
+        self.client = redis.Redis(connection_pool=self.pool)
+
+        self._lock = threading.Lock()
+        self._healthy = False
+        self._checked_at = None  # 最近一次检查的时间（time.monotonic）
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def check_now(self) -> bool:
+        """立即执行一次检查并更新缓存状态
+
+        Returns:
+            bool: broker 是否可用
+        """
+        error = None
+        try:
+            self.client.ping()
+            healthy = True
+        except redis.RedisError as e:
+            healthy = False
+            error = str(e)
+        except Exception as e:
+            healthy = False
+            error = f"Celery 检查出错: {str(e)}"
+
+        with self._lock:
+            changed = self._checked_at is None or healthy != self._healthy
+            self._healthy = healthy
+            self._checked_at = time.monotonic()
+
+        # 只在状态变化时记录日志
+        if changed:
+            if healthy:
+                logger.info("Redis 连接成功")
+            else:
+                logger.error("Redis 连接失败", {
+                    "error": error,
+                    "host": settings.REDIS_HOST,
+                    "port": settings.REDIS_PORT
+                })
+        return healthy
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self.check_now()
+            self._stop_event.wait(self.interval)
+
+    def start(self):
+        """启动后台检查线程（重复调用无副作用）"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="broker-health-monitor", daemon=True
         )
-        
-        # 测试 Redis 连接
-        redis_client.ping()
-        
-        logger.info("Redis 连接成功")
-        return True
-        
-    except redis.ConnectionError as e:
-        logger.error("Redis 连接失败", {
-            "error": str(e),
-            "host": settings.REDIS_HOST,
-            "port": settings.REDIS_PORT
-        })
-        return False
-    except Exception as e:
-        logger.error("Celery 检查出错", {"error": str(e)})
-        return False
\ No newline at end of file
+        self._thread.start()
+
+    def stop(self):
+        """停止后台检查线程并释放连接池"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+        self.pool.disconnect()
+
+    def is_healthy(self) -> bool:
+        """读取缓存的检查结果
+
+        最近一次检查失败，或结果已超过有效期时返回 False。
+        """
+        with self._lock:
+            healthy = self._healthy
+            checked_at = self._checked_at
+        if checked_at is None:
+            return False
+        if time.monotonic() - checked_at > self.stale_after:
+            return False
+        return healthy
+
+    def has_result(self) -> bool:
+        """是否已经完成过至少一次检查"""
+        with self._lock:
+            return self._checked_at is not None
+
+    def status(self) -> dict:
+        """返回当前缓存状态，便于健康检查接口展示"""
+        with self._lock:
+            checked_at = self._checked_at
+            healthy = self._healthy
+        age = None if checked_at is None else round(time.monotonic() - checked_at, 3)
+        return {"healthy": self.is_healthy(), "last_result": healthy, "age_seconds": age}
+
+
+broker_monitor = BrokerHealthMonitor(
+    interval=settings.BROKER_HEALTH_CHECK_INTERVAL,
+    stale_after=settings.BROKER_HEALTH_STALE_AFTER,
+)
+
+
+def check_celery_connection():
+    """检查 Celery 和 Redis 连接
+
+    读取后台监控器缓存的 broker 状态；监控器尚未产生结果时（如未经应用启动流程直接调用）
+    同步检查一次并启动监控线程。
+    """
+    if not broker_monitor.has_result():
+        broker_monitor.check_now()
+        broker_monitor.start()
+    return broker_monitor.is_healthy()
@@ -1,7 +1,167 @@
 import os
+import json
+import queue
+import atexit
 import logging
+import logging.handlers
 from datetime import datetime
 from typing import Optional, Dict, Any
+from app.config import settings
+
+
+class DailyFileHandler(logging.FileHandler):
+    """按日期写入 log/YYYY/MM/DD.log，跨天时自动切换到新文件"""
+
+    def __init__(self, base_dir: str = "log"):
+        self.base_dir = base_dir
+        self.current_path = self._path_for_today()
+        os.makedirs(os.path.dirname(self.current_path), exist_ok=True)
+        super().__init__(self.current_path, encoding="utf-8", delay=True)
+
+    def _path_for_today(self) -> str:
+        now = datetime.now()
+        return os.path.join(self.base_dir, now.strftime("%Y/%m"), f"{now.strftime('%d')}.log")
+
+    def emit(self, record):
+        path = self._path_for_today()
+        if path != self.current_path:
+            self.close()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.current_path = path
+            self.baseFilename = os.path.abspath(path)
+        super().emit(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """将日志格式化为单行 JSON，extra 中过长的字段会被截断"""
+
+    def __init__(self, max_field_length: int):
+        super().__init__()
+        self.max_field_length = max_field_length
+
+    def _truncate(self, value: Any) -> Any:
+        if value is None or isinstance(value, (bool, int, float)):
+            return value
+        if not isinstance(value, str):
+            try:
+                text = json.dumps(value, ensure_ascii=False, default=str)
+            except (TypeError, ValueError):
+                text = str(value)
+            if len(text) <= self.max_field_length:
+                return value
+            value = text
+        if len(value) > self.max_field_length:
+            return f"{value[:self.max_field_length]}...(已截断 {len(value) - self.max_field_length} 字符)"
+        return value
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": datetime.fromtimestamp(record.created).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+            "name": record.name,
+            "level": record.levelname,
+            "message": self._truncate(record.getMessage()),
+        }
+        extra_data = getattr(record, "extra_data", None)
+        if extra_data:
+            data["extra"] = {key: self._truncate(value) for key, value in extra_data.items()}
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """非阻塞的队列处理器
+
+    调用方线程只负责入队，格式化和文件写入都在监听线程中完成；
+    队列已满时直接丢弃日志，并在队列恢复后补记一条丢弃数量的警告。
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 队列只在进程内使用，不需要像默认实现那样在调用方线程提前格式化消息
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        if self.dropped:
+            try:
+                self.queue.put_nowait(logging.LogRecord(
+                    "logger", logging.WARNING, __file__, 0,
+                    f"日志队列已满，丢弃了 {self.dropped} 条日志", None, None,
+                ))
+            except queue.Full:
+                self.dropped += 1
+                return
+            self.dropped = 0
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _parse_levels(levels: str) -> Dict[str, int]:
+    """解析 LOG_LEVELS 配置，格式为 "name=LEVEL,name=LEVEL" """
+    result = {}
+    for item in levels.split(","):
+        if "=" not in item:
+            continue
+        name, level = item.split("=", 1)
+        result[name.strip()] = logging.getLevelName(level.strip().upper())
+    return result
+
+
+_queue_handler: Optional[DroppingQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_module_levels = _parse_levels(settings.LOG_LEVELS)
+
+
+def _create_output_handlers():
+    formatter = JsonFormatter(settings.LOG_FIELD_MAX_LENGTH)
+
+    # 创建文件处理器
+    file_handler = DailyFileHandler()
+    file_handler.setLevel(logging.DEBUG)
+    file_handler.setFormatter(formatter)
+
+    # 创建控制台处理器
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(formatter)
+    return file_handler, console_handler
+
+
+def _start_listener():
+    global _listener
+    _listener = logging.handlers.QueueListener(
+        _queue_handler.queue, *_create_output_handlers(), respect_handler_level=True
+    )
+    _listener.start()
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+
+def _after_fork_in_child():
+    # 监听线程不会随 fork 复制到子进程（如 Celery prefork worker），需要重建队列和线程
+    if _queue_handler is not None:
+        _queue_handler.queue = queue.Queue(settings.LOG_QUEUE_SIZE)
+        _queue_handler.dropped = 0
+        _start_listener()
+
+
+def _get_queue_handler() -> DroppingQueueHandler:
+    """获取进程内共享的队列处理器，首次调用时启动监听线程"""
+    global _queue_handler
+    if _queue_handler is None:
+        _queue_handler = DroppingQueueHandler(queue.Queue(settings.LOG_QUEUE_SIZE))
+        _start_listener()
+        atexit.register(_stop_listener)
+        os.register_at_fork(after_in_child=_after_fork_in_child)
+    return _queue_handler
 
 
 class Logger:
@@ -11,59 +171,23 @@ class Logger:
         self.setup_logger()
 
     def setup_logger(self):
-        # 获取当前日期
-        now = datetime.now()
-        year_month = now.strftime("%Y/%m")
-        day = now.strftime("%d")
-
-        # 创建日志目录
-        log_dir = os.path.join("log", year_month)
-        os.makedirs(log_dir, exist_ok=True)
-
-        # 设置日志文件路径
-        log_file = os.path.join(log_dir, f"{day}.log")
-
-        # 创建logger
+        # 同名 logger 共用同一个对象，进程内所有 logger 共用一个队列处理器，重复创建不会重复添加
         self.logger = logging.getLogger(self.app_name)
-        self.logger.setLevel(logging.DEBUG)
-
-        # 清除现有的处理器
-        if self.logger.handlers:
-            self.logger.handlers.clear()
-
-        # 创建文件处理器
-        file_handler = logging.FileHandler(log_file, encoding="utf-8")
-        file_handler.setLevel(logging.DEBUG)
-
-        # 创建控制台处理器
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.INFO)
-
-        # 设置日志格式
-        formatter = logging.Formatter(
-            "%(asctime)s - %(name)s - %(levelname)s - %(message)s - %(extra_data)s"
+        self.logger.setLevel(
+            _module_levels.get(self.app_name, getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO))
         )
+        self.logger.propagate = False
 
-        # 添加自定义过滤器来处理extra_data
-        class ExtraDataFilter(logging.Filter):
-            def filter(self, record):
-                if not hasattr(record, "extra_data"):
-                    record.extra_data = ""
-                return True
-
-        self.logger.addFilter(ExtraDataFilter())
-
-        file_handler.setFormatter(formatter)
-        console_handler.setFormatter(formatter)
-
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
+        handler = _get_queue_handler()
+        if handler not in self.logger.handlers:
+            self.logger.addHandler(handler)
 
     def _log(self, level: int, message: str, extra: Optional[Dict[str, Any]] = None):
-        if extra is None:
-            extra = {}
-        extra_str = str(extra) if extra else ""
-        self.logger.log(level, message, extra={"extra_data": extra_str})
+        # 级别未启用时直接返回，避免创建日志记录
+        if not self.logger.isEnabledFor(level):
+            return
+        # 浅拷贝 extra，避免调用方在日志写出前修改字典
+        self.logger.log(level, message, extra={"extra_data": dict(extra) if extra else None})
 
     def debug(self, message: str, extra: Optional[Dict[str, Any]] = None):
         self._log(logging.DEBUG, message, extra)
@@ -80,6 +204,10 @@ class Logger:
     def critical(self, message: str, extra: Optional[Dict[str, Any]] = None):
         self._log(logging.CRITICAL, message, extra)
 
+    def is_enabled_for(self, level: int) -> bool:
+        """判断级别是否启用，用于在拼接较大的日志内容之前提前判断"""
+        return self.logger.isEnabledFor(level)
+
     # 通用的日志方法
     def log_request(
         self, method: str, url: str, extra: Optional[Dict[str, Any]] = None
@@ -0,0 +1,268 @@
+"""媒体文件信息探测
+
+一次 ffprobe 调用获取容器格式、音视频流、编码、帧率、时长和码率，需要关键帧位置时
+再单独读取视频流的数据包索引，结果按 路径 + 修改时间 + 文件大小 缓存。
+Celery worker 在视频下载完成后探测一次，随请求传给场景分割和音频分离服务，
+服务端确认文件未变化后直接使用，不再各自启动 ffprobe 或打开文件探测。
+"""
+
+import json
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+FFPROBE_PATH = "/usr/bin/ffprobe"
+# 缓存的文件数
+CACHE_SIZE = 128
+
+_cache: "OrderedDict[Tuple[str, int, int], Dict[str, Any]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+# ffprobe 格式名到文件扩展名的映射，mov/mp4 和 matroska/webm 需要进一步区分
+_FORMAT_EXTENSIONS = {
+    "avi": ".avi",
+    "flv": ".flv",
+    "mpegts": ".ts",
+}
+
+# 场景分割服务按扩展名校验格式，只接受这几种；其他容器保留下载时的扩展名，
+# ffmpeg 按文件内容识别格式，扩展名与内容不符也能处理
+RENAME_EXTENSIONS = (".mp4", ".mov", ".avi")
+
+
+class MediaProbeError(Exception):
+    """ffprobe 执行失败或输出无法解析"""
+
+
+def _file_key(path: str) -> Tuple[str, int, int]:
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _parse_rate(rate: Optional[str]) -> float:
+    """解析 ffprobe 的帧率字符串，如 30000/1001"""
+    if not rate:
+        return 0.0
+    numerator, _, denominator = rate.partition("/")
+    if not denominator:
+        return _to_float(numerator)
+    denominator = _to_float(denominator)
+    return _to_float(numerator) / denominator if denominator else 0.0
+
+
+def _rotation(stream: Dict[str, Any]) -> int:
+    """读取视频流的旋转角度（0、90、180、270），优先使用 displaymatrix，其次是 rotate 标签"""
+    for side_data in stream.get("side_data_list", []):
+        if "rotation" in side_data:
+            return int(round(_to_float(side_data["rotation"]))) % 360
+    return int(round(_to_float(stream.get("tags", {}).get("rotate")))) % 360
+
+
+def _parse(data: Dict[str, Any], key: Tuple[str, int, int]) -> Dict[str, Any]:
+    """将 ffprobe 的 JSON 输出整理为可序列化的媒体信息，keyframes 由 _probe_keyframes 单独填充"""
+    fmt = data.get("format", {})
+    streams = data.get("streams", [])
+    # 封面图片也是视频流，需要排除
+    video = next(
+        (s for s in streams
+         if s.get("codec_type") == "video" and not s.get("disposition", {}).get("attached_pic")),
+        None,
+    )
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+
+    path, mtime, size = key
+    info = {
+        "path": path,
+        "mtime": mtime,
+        "size": size,
+        "format_name": fmt.get("format_name", ""),
+        "major_brand": fmt.get("tags", {}).get("major_brand", "").strip(),
+        "duration": _to_float(fmt.get("duration")),
+        "bit_rate": int(_to_float(fmt.get("bit_rate"))),
+        "has_video": video is not None,
+        "has_audio": audio is not None,
+        "video": None,
+        "audio": None,
+        "keyframes": None,
+    }
+    if video is not None:
+        # width/height 为显示尺寸：手机竖拍视频以横向编码并带 90/270 度旋转，需要交换宽高
+        width, height = int(video.get("width", 0)), int(video.get("height", 0))
+        rotation = _rotation(video)
+        if rotation in (90, 270):
+            width, height = height, width
+        info["video"] = {
+            "index": video.get("index", 0),
+            "codec": video.get("codec_name", ""),
+            "width": width,
+            "height": height,
+            "rotation": rotation,
+            "fps": _parse_rate(video.get("avg_frame_rate")) or _parse_rate(video.get("r_frame_rate")),
+            "bit_rate": int(_to_float(video.get("bit_rate"))),
+            "nb_frames": int(_to_float(video.get("nb_frames"))),
+            "pix_fmt": video.get("pix_fmt", ""),
+        }
+    if audio is not None:
+        info["audio"] = {
+            "index": audio.get("index", 0),
+            "codec": audio.get("codec_name", ""),
+            "sample_rate": int(_to_float(audio.get("sample_rate"))),
+            "channels": int(audio.get("channels", 0)),
+            "bit_rate": int(_to_float(audio.get("bit_rate"))),
+        }
+    return info
+
+
+def _probe_keyframes(path: str, stream_index: int) -> List[float]:
+    """读取一路视频流的数据包索引，返回关键帧时间点
+
+    只选取该视频流，以 CSV 逐行读取并只保留关键帧，不解码；内存占用与关键帧数量成正比，
+    不随音视频数据包总数增长。
+    """
+    cmd = [
+        FFPROBE_PATH, "-v", "error", "-select_streams", str(stream_index),
+        "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", path,
+    ]
+    keyframes = []
+    try:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    except OSError as e:
+        raise MediaProbeError(f"无法执行 ffprobe: {str(e)}")
+    with process:
+        # 每行为 pts_time,flags，关键帧的 flags 含 K
+        for line in process.stdout:
+            pts_time, _, flags = line.strip().partition(",")
+            if "K" in flags and pts_time not in ("", "N/A"):
+                keyframes.append(round(float(pts_time), 3))
+        stderr = process.stderr.read()
+    if process.returncode != 0:
+        raise MediaProbeError(f"ffprobe 执行失败: {stderr.strip()}")
+    return keyframes
+
+
+def _cache_put(key: Tuple[str, int, int], info: Dict[str, Any]):
+    with _cache_lock:
+        _cache[key] = info
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def probe_media(path: str, keyframes: bool = True) -> Dict[str, Any]:
+    """探测媒体文件信息，文件未变化时直接返回缓存结果
+
+    Args:
+        path (str): 媒体文件路径
+        keyframes (bool): 是否同时获取视频关键帧时间点，需要再读取一遍视频流的数据包索引
+
+    Returns:
+        dict: 媒体信息，包括 path、mtime、size、format_name、duration、bit_rate、
+            has_video、has_audio、video、audio、keyframes
+
+    Raises:
+        MediaProbeError: ffprobe 执行失败时抛出
+    """
+    key = _file_key(path)
+    with _cache_lock:
+        info = _cache.get(key)
+        if info is not None:
+            _cache.move_to_end(key)
+    if info is not None and (not keyframes or info["keyframes"] is not None):
+        return info
+
+    if info is None:
+        cmd = [FFPROBE_PATH, "-v", "error", "-of", "json", "-show_format", "-show_streams", path]
+        try:
+            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+        except OSError as e:
+            raise MediaProbeError(f"无法执行 ffprobe: {str(e)}")
+        if result.returncode != 0:
+            raise MediaProbeError(f"ffprobe 执行失败: {result.stderr.decode(errors='ignore').strip()}")
+        try:
+            data = json.loads(result.stdout)
+        except ValueError as e:
+            raise MediaProbeError(f"无法解析 ffprobe 输出: {str(e)}")
+        info = _parse(data, key)
+
+    if keyframes:
+        # 已缓存的流信息不再重复探测，只补充关键帧
+        video = info["video"]
+        info = dict(info, keyframes=_probe_keyframes(path, video["index"]) if video else [])
+    _cache_put(key, info)
+    return info
+
+
+def matches_file(info: Optional[Dict[str, Any]], path: str) -> bool:
+    """判断媒体信息是否对应当前的文件（路径、修改时间和大小都一致）"""
+    if not info:
+        return False
+    try:
+        key = _file_key(path)
+    except OSError:
+        return False
+    return (info.get("path"), info.get("mtime"), info.get("size")) == key
+
+
+def resolve_media_info(path: str, info: Optional[Dict[str, Any]] = None,
+                       keyframes: bool = False) -> Dict[str, Any]:
+    """优先使用调用方传入的媒体信息，文件已变化或未传入时重新探测
+
+    Args:
+        path (str): 媒体文件路径
+        info (dict, optional): 上游探测得到的媒体信息
+        keyframes (bool): 重新探测时是否获取关键帧
+
+    Returns:
+        dict: 媒体信息
+
+    Raises:
+        MediaProbeError: 需要重新探测且 ffprobe 执行失败时抛出
+    """
+    if matches_file(info, path):
+        _cache_put(_file_key(path), info)
+        return info
+    return probe_media(path, keyframes=keyframes)
+
+
+def extension_for(info: Dict[str, Any]) -> Optional[str]:
+    """根据探测到的容器格式确定文件扩展名，无法确定时返回 None"""
+    format_name = info.get("format_name", "")
+    if "mp4" in format_name or "mov" in format_name:
+        return ".mov" if info.get("major_brand") == "qt" else ".mp4"
+    if "matroska" in format_name or "webm" in format_name:
+        video_codec = (info.get("video") or {}).get("codec", "")
+        return ".webm" if video_codec in ("vp8", "vp9", "av1") else ".mkv"
+    return _FORMAT_EXTENSIONS.get(format_name.split(",")[0])
+
+
+def normalize_extension(path: str, info: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """按实际容器格式修正文件扩展名
+
+    下载时只能根据 URL 和 Content-Type 猜测扩展名，猜错时下游按扩展名校验格式会失败。
+    只改为下游服务接受的扩展名（RENAME_EXTENSIONS），实际为 mkv、ts、flv 等其他容器时
+    保留原扩展名，避免改名后被场景分割服务拒绝。
+
+    Args:
+        path (str): 文件路径
+        info (dict): 该文件的媒体信息
+
+    Returns:
+        tuple: (修正后的路径, 对应的媒体信息)
+    """
+    ext = extension_for(info)
+    if ext not in RENAME_EXTENSIONS or os.path.splitext(path)[1].lower() == ext:
+        return path, info
+    new_path = os.path.splitext(path)[0] + ext
+    os.replace(path, new_path)
+    info = dict(info, path=os.path.abspath(new_path))
+    _cache_put(_file_key(new_path), info)
+    return new_path, info
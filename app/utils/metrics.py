@@ -0,0 +1,159 @@
+"""Prometheus 指标
+
+API 进程和 Celery worker 进程共用这里定义的指标。设置了环境变量
+PROMETHEUS_MULTIPROC_DIR 时启用 prometheus_client 的多进程模式，
+uvicorn 的多个 worker 和 Celery worker 的指标写入同一目录，由任意一个
+API worker 的 /metrics 接口汇总输出。
+
+计数器和直方图文件保存已退出进程累计的值，不能逐个删除，否则汇总值下降会被
+Prometheus 当作计数器重置；目录只在 supervisord 启动全部程序之前清空一次
+（supervisor-conf/media-symphony-metrics.conf）。Celery 子进程退出时调用
+mark_process_dead 删除其实时 gauge 文件。
+"""
+
+import os
+import time
+from contextlib import contextmanager
+import redis
+from app.utils.logger import Logger
+
+# 多进程模式下，目录必须在导入 prometheus_client 之前存在
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+if MULTIPROC_DIR:
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+from prometheus_client import (  # noqa: E402
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily  # noqa: E402
+
+logger = Logger("video_tasks")
+
+# Celery 队列名称
+QUEUE_NAMES = ("person", "batch")
+
+# HTTP 请求指标
+HTTP_REQUESTS_TOTAL = Counter(
+    "http_requests_total",
+    "HTTP 请求总数",
+    ["method", "path", "status"],
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP 请求处理耗时（秒）",
+    ["method", "path"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+# 视频处理任务指标
+TASK_STEP_DURATION = Histogram(
+    "video_task_step_duration_seconds",
+    "视频处理任务各步骤耗时（秒）",
+    ["step"],
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600),
+)
+TASK_STEP_FAILURES = Counter(
+    "video_task_step_failures_total",
+    "视频处理任务各步骤失败次数",
+    ["step"],
+)
+TASKS_TOTAL = Counter(
+    "video_tasks_total",
+    "视频处理任务总数",
+    ["queue", "status"],
+)
+
+
+@contextmanager
+def track_step(step: str):
+    """记录任务步骤的耗时，步骤抛出异常时累加失败次数
+
+    Args:
+        step (str): 步骤名称，如 download、scene_cut、audio_extract
+
+    Example:
+        with track_step("download"):
+            await download_video(video_url, video_path)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        TASK_STEP_FAILURES.labels(step=step).inc()
+        raise
+    finally:
+        TASK_STEP_DURATION.labels(step=step).observe(time.perf_counter() - start)
+
+
+class QueueDepthCollector:
+    """在抓取时读取 Celery 队列长度
+
+    队列长度只在 Prometheus 抓取时通过 LLEN 读取一次，不在请求路径上产生开销。
+    """
+
+    def __init__(self, client: redis.Redis, queue_names=QUEUE_NAMES):
+        self.client = client
+        self.queue_names = queue_names
+
+    def _family(self) -> GaugeMetricFamily:
+        return GaugeMetricFamily(
+            "celery_queue_length", "Celery 队列中等待处理的任务数", labels=["queue"]
+        )
+
+    def describe(self):
+        # 注册时只需要指标名称，避免注册阶段访问 Redis
+        yield self._family()
+
+    def collect(self):
+        gauge = self._family()
+        try:
+            with self.client.pipeline(transaction=False) as pipe:
+                for name in self.queue_names:
+                    pipe.llen(name)
+                lengths = pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("读取队列长度失败", {"error": str(e)})
+            return
+        for name, length in zip(self.queue_names, lengths):
+            gauge.add_metric([name], length)
+        yield gauge
+
+
+_registry = None
+
+
+def _get_registry(client: redis.Redis) -> CollectorRegistry:
+    global _registry
+    if _registry is None:
+        if MULTIPROC_DIR:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        registry.register(QueueDepthCollector(client))
+        _registry = registry
+    return _registry
+
+
+def render_metrics(client: redis.Redis) -> tuple[bytes, str]:
+    """生成 Prometheus 文本格式的指标
+
+    Args:
+        client (redis.Redis): 读取队列长度使用的 broker 客户端
+
+    Returns:
+        tuple[bytes, str]: (指标内容, Content-Type)
+    """
+    return generate_latest(_get_registry(client)), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int) -> None:
+    """进程退出后删除其实时 gauge 指标文件，未启用多进程模式时不做任何处理"""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid, MULTIPROC_DIR)
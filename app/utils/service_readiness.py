@@ -0,0 +1,146 @@
+"""媒体服务就绪检查
+
+Celery 任务调用场景分割、音频分离、语音转写服务之前先轮询服务的 /readyz：
+服务未监听或模型还在加载、预热时一直等待，就绪后再发送请求，任务不会落在冷启动的服务上。
+就绪结果在本进程内缓存一段时间，期间调用同一服务不再重复检查。
+
+服务队列已满（429）或暂时没有可用的工作进程（503）时，post_with_retry 按响应的 Retry-After
+等待后重新提交，重试有限次数后把最后一次响应交给调用方处理。
+"""
+
+import asyncio
+import time
+from typing import Dict, Iterable, Optional, Tuple
+import aiohttp
+from app.config import settings
+from app.utils.logger import Logger
+
+logger = Logger("celery_tasks")
+
+
+class ServiceNotReadyError(Exception):
+    """等待超时后服务仍未就绪"""
+
+
+class ServiceReadiness:
+    """等待媒体服务就绪，并按服务地址缓存就绪结果"""
+
+    def __init__(self, timeout: float, poll_interval: float, cache_ttl: float):
+        """
+        Args:
+            timeout (float): 等待服务就绪的最长时间（秒）
+            poll_interval (float): 两次检查之间的间隔（秒）
+            cache_ttl (float): 就绪结果的缓存时间（秒）
+        """
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.cache_ttl = cache_ttl
+        self._ready_at: Dict[str, float] = {}  # 服务地址 -> 最近一次确认就绪的时间（time.monotonic）
+
+    @staticmethod
+    async def _check(session: aiohttp.ClientSession, url: str) -> Tuple[bool, str]:
+        """请求一次 /readyz，返回是否就绪和未就绪的原因"""
+        try:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=5)) as response:
+                if response.status == 200:
+                    return True, ""
+                return False, f"HTTP {response.status}: {await response.text()}"
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return False, str(e) or type(e).__name__
+
+    async def wait_ready(self, name: str, port: int, host: str = "127.0.0.1") -> None:
+        """等待服务就绪
+
+        Args:
+            name (str): 服务名称，用于日志和错误信息
+            port (int): 服务端口
+            host (str): 服务地址
+
+        Raises:
+            ServiceNotReadyError: 超过 timeout 后服务仍未就绪
+        """
+        url = f"http://{host}:{port}/readyz"
+        ready_at = self._ready_at.get(url)
+        if ready_at is not None and time.monotonic() - ready_at < self.cache_ttl:
+            return
+
+        start = time.monotonic()
+        waited = False
+        async with aiohttp.ClientSession() as session:
+            while True:
+                ready, reason = await self._check(session, url)
+                if ready:
+                    break
+                if time.monotonic() - start >= self.timeout:
+                    raise ServiceNotReadyError(f"{name}服务在 {self.timeout:g} 秒内未就绪: {reason}")
+                # 只在开始等待时记录一次日志
+                if not waited:
+                    logger.info(f"等待{name}服务就绪", {"url": url, "reason": reason})
+                    waited = True
+                await asyncio.sleep(self.poll_interval)
+
+        self._ready_at[url] = time.monotonic()
+        if waited:
+            logger.info(f"{name}服务已就绪", {
+                "url": url,
+                "waited_seconds": round(time.monotonic() - start, 1)
+            })
+
+
+service_readiness = ServiceReadiness(
+    timeout=settings.SERVICE_READY_TIMEOUT,
+    poll_interval=settings.SERVICE_READY_POLL_INTERVAL,
+    cache_ttl=settings.SERVICE_READY_CACHE_TTL,
+)
+
+
+async def wait_for_service(name: str, port: int) -> None:
+    """等待本机指定端口上的媒体服务就绪，超时抛出 ServiceNotReadyError"""
+    await service_readiness.wait_ready(name, port)
+
+
+def _retry_delay(retry_after: Optional[str]) -> float:
+    """根据 Retry-After 计算重试等待时间，缺失或不是秒数时使用默认值"""
+    try:
+        delay = float(retry_after)
+    except (TypeError, ValueError):
+        delay = settings.SERVICE_RETRY_DELAY
+    return min(max(delay, 0.0), settings.SERVICE_RETRY_MAX_DELAY)
+
+
+async def post_with_retry(
+    session: aiohttp.ClientSession,
+    name: str,
+    url: str,
+    payload: dict,
+    headers: Dict[str, str],
+    retry_statuses: Iterable[int] = (429,),
+) -> Tuple[int, str]:
+    """提交请求，服务返回可重试的状态码时按 Retry-After 等待后重试
+
+    Args:
+        session (aiohttp.ClientSession): 请求使用的会话
+        name (str): 服务名称，用于日志
+        url (str): 请求地址
+        payload (dict): JSON 请求体
+        headers (Dict[str, str]): 请求头
+        retry_statuses (Iterable[int]): 需要重试的状态码
+
+    Returns:
+        Tuple[int, str]: 最后一次响应的状态码和响应体，重试次数用完时为最后一次的可重试响应
+    """
+    retry_statuses = set(retry_statuses)
+    for attempt in range(settings.SERVICE_RETRY_MAX_ATTEMPTS + 1):
+        async with session.post(url, json=payload, headers=headers) as response:
+            status, body = response.status, await response.text()
+            retry_after = response.headers.get("Retry-After")
+        if status not in retry_statuses or attempt == settings.SERVICE_RETRY_MAX_ATTEMPTS:
+            return status, body
+        delay = _retry_delay(retry_after)
+        logger.warning(f"{name}服务暂时无法处理请求，稍后重试", {
+            "url": url,
+            "status": status,
+            "attempt": attempt + 1,
+            "delay_seconds": delay,
+        })
+        await asyncio.sleep(delay)
@@ -0,0 +1,189 @@
+"""分布式链路追踪
+
+基于 OpenTelemetry 记录一个视频任务从 API、Celery worker 到各媒体服务的完整调用链。
+追踪上下文通过 W3C traceparent 头传递：API 写入 Celery 消息头，worker 再写入
+调用场景分割、音频分离、语音转写服务的 HTTP 请求头。
+
+导出方式由 TRACING_EXPORTER 配置：
+- none: 关闭追踪（默认），所有接口退化为空操作
+- otlp: 通过 OTLP/HTTP 上报到 TRACING_OTLP_ENDPOINT
+- file: 每个 span 以一行 JSON 写入 TRACING_FILE_PATH，便于离线分析
+
+未安装 opentelemetry 时同样退化为空操作。
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+from app.config import settings
+from app.utils.logger import Logger
+
+try:
+    from opentelemetry import trace, propagate
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import (
+        BatchSpanProcessor,
+        SpanExporter,
+        SpanExportResult,
+    )
+    from opentelemetry.trace import Status, StatusCode
+except ImportError:  # pragma: no cover - 未安装 opentelemetry
+    trace = None
+
+logger = Logger("video_tasks")
+
+# 需要随请求传递的追踪头
+TRACE_HEADERS = ("traceparent", "tracestate")
+
+
+class _NoopSpan:
+    """未启用追踪时使用的空 span"""
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def record_exception(self, exception):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+if trace is not None:
+
+    class JsonLinesSpanExporter(SpanExporter):
+        """将 span 以 JSON Lines 格式追加写入本地文件"""
+
+        def __init__(self, file_path: str):
+            self.file_path = file_path
+            self._lock = threading.Lock()
+            directory = os.path.dirname(file_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        def export(self, spans):
+            lines = [json.dumps(json.loads(span.to_json()), ensure_ascii=False) for span in spans]
+            try:
+                with self._lock, open(self.file_path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+            except OSError:
+                return SpanExportResult.FAILURE
+            return SpanExportResult.SUCCESS
+
+        def shutdown(self):
+            pass
+
+
+_tracer = None
+_provider = None
+_disabled = False
+
+
+def _create_exporter(exporter: str):
+    if exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        return OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT)
+    if exporter == "file":
+        return JsonLinesSpanExporter(settings.TRACING_FILE_PATH)
+    raise ValueError(f"不支持的追踪导出方式: {exporter}")
+
+
+def _get_tracer():
+    """按配置初始化 tracer，未启用时返回 None"""
+    global _tracer, _provider, _disabled
+    if _tracer is not None or _disabled:
+        return _tracer
+    if trace is None or settings.TRACING_EXPORTER == "none":
+        _disabled = True
+        return None
+
+    try:
+        exporter = _create_exporter(settings.TRACING_EXPORTER)
+    except Exception as e:
+        logger.error("初始化链路追踪失败", {"exporter": settings.TRACING_EXPORTER, "error": str(e)})
+        _disabled = True
+        return None
+
+    _provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.TRACING_SERVICE_NAME})
+    )
+    _provider.add_span_processor(BatchSpanProcessor(exporter))
+    _tracer = _provider.get_tracer("media_symphony")
+    return _tracer
+
+
+@contextmanager
+def start_span(name: str, attributes: Optional[Dict] = None, carrier: Optional[Dict] = None):
+    """创建一个 span 并设为当前 span
+
+    Args:
+        name (str): span 名称
+        attributes (dict, optional): span 属性，如 task_id
+        carrier (dict, optional): 上游传入的追踪头，提供时以其中的上下文作为父 span
+
+    Yields:
+        span 对象，可调用 set_attribute 补充属性；未启用追踪时为空操作对象
+    """
+    tracer = _get_tracer()
+    if tracer is None:
+        yield _NOOP_SPAN
+        return
+
+    context = propagate.extract(carrier) if carrier else None
+    with tracer.start_as_current_span(
+        name, context=context, attributes=attributes, record_exception=False
+    ) as span:
+        try:
+            yield span
+        except Exception as e:
+            span.record_exception(e)
+            span.set_status(Status(StatusCode.ERROR, str(e)))
+            raise
+
+
+def inject_headers(headers: Optional[Dict] = None) -> Dict:
+    """将当前追踪上下文写入请求头
+
+    Args:
+        headers (dict, optional): 已有的请求头
+
+    Returns:
+        dict: 包含 traceparent 等追踪头的请求头
+    """
+    headers = dict(headers or {})
+    if _get_tracer() is not None:
+        propagate.inject(headers)
+    return headers
+
+
+def flush(timeout_millis: int = 5000) -> None:
+    """导出缓冲区中尚未发送的 span
+
+    Celery worker 子进程可能在任务结束后直接退出，任务结束时调用以免丢失 span。
+    """
+    if _provider is not None:
+        _provider.force_flush(timeout_millis)
+
+
+def extract_task_headers(task_request) -> Dict:
+    """从 Celery 任务请求中读取上游写入的追踪头
+
+    Args:
+        task_request: Celery 任务的 self.request
+
+    Returns:
+        dict: 追踪头，没有时为空字典
+    """
+    headers = getattr(task_request, "headers", None) or {}
+    carrier = {}
+    for key in TRACE_HEADERS:
+        value = task_request.get(key) or headers.get(key)
+        if value:
+            carrier[key] = value
+    return carrier
@@ -0,0 +1,109 @@
+"""按场景切分转写文本
+
+转写服务对整段人声只识别一次，返回带起止时间的分段；场景分割给出每个场景的时间范围。
+这里在分段的起止时间上建立区间索引，逐个场景查询与其重叠的分段，一次遍历得到每个场景的文本，
+不需要再对每个场景单独识别。
+
+分段有 token 级时间戳时按 token 的中点归属场景，否则整段归属其中点所在的场景，
+保证场景首尾相接时每段文本只出现在一个场景中。
+"""
+
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _midpoint(item: Dict[str, Any]) -> float:
+    return (item["start"] + item["end"]) / 2
+
+
+def _join_tokens(tokens: List[Dict[str, Any]]) -> str:
+    # SentencePiece 用 ▁ 表示词首的空格
+    return "".join(token["token"] for token in tokens).replace("▁", " ").strip()
+
+
+class SegmentIndex:
+    """转写分段的区间索引
+
+    分段按开始时间排序，并记录结束时间的前缀最大值，查询 [start, end) 时两次二分即可
+    确定候选范围，分段之间有重叠时同样适用。建立索引 O(n log n)，每次查询 O(log n + k)。
+    """
+
+    def __init__(self, segments: List[Dict[str, Any]]):
+        self.segments = sorted(segments, key=lambda seg: seg["start"])
+        self._starts = [seg["start"] for seg in self.segments]
+        self._max_ends = []
+        max_end = float("-inf")
+        for seg in self.segments:
+            max_end = max(max_end, seg["end"])
+            self._max_ends.append(max_end)
+
+    def overlapping(self, start: float, end: float) -> List[Dict[str, Any]]:
+        """返回与 [start, end) 有重叠的分段，按开始时间排序"""
+        lo = bisect_right(self._max_ends, start)
+        hi = bisect_left(self._starts, end)
+        return [seg for seg in self.segments[lo:hi] if seg["end"] > start]
+
+
+def scene_time_ranges(scenes: List[Dict[str, Any]], fps: Optional[float] = None,
+                      duration: Optional[float] = None) -> List[Tuple[float, float]]:
+    """计算每个场景的起止时间（秒）
+
+    优先使用场景分割服务返回的 start_seconds / end_seconds；缺失时按帧号和帧率换算，
+    结束时间取下一个场景的开始时间，最后一个场景取视频时长。
+
+    Args:
+        scenes: 按开始帧排序的场景列表
+        fps: 视频帧率
+        duration: 视频时长（秒）
+
+    Returns:
+        list: 与 scenes 一一对应的 (开始, 结束)
+    """
+    starts = []
+    for scene in scenes:
+        if scene.get("start_seconds") is not None:
+            starts.append(float(scene["start_seconds"]))
+        elif fps:
+            starts.append(scene["start_frame"] / fps)
+        else:
+            raise ValueError("场景缺少开始时间且未提供帧率")
+
+    ranges = []
+    for i, scene in enumerate(scenes):
+        if scene.get("end_seconds") is not None:
+            end = float(scene["end_seconds"])
+        elif scene.get("end_frame") is not None and fps:
+            end = scene["end_frame"] / fps
+        elif i + 1 < len(starts):
+            end = starts[i + 1]
+        else:
+            end = duration if duration else float("inf")
+        ranges.append((starts[i], end))
+    return ranges
+
+
+def assign_scene_texts(segments: List[Dict[str, Any]],
+                       ranges: List[Tuple[float, float]]) -> List[str]:
+    """把转写分段分配到各场景
+
+    Args:
+        segments: 转写分段，包含 start、end、text，可选 tokens
+        ranges: 场景的 (开始, 结束) 时间，见 scene_time_ranges
+
+    Returns:
+        list: 与 ranges 一一对应的场景文本，没有语音的场景为空字符串
+    """
+    index = SegmentIndex(segments)
+    texts = []
+    for start, end in ranges:
+        parts = []
+        for seg in index.overlapping(start, end):
+            tokens = seg.get("tokens")
+            if tokens:
+                text = _join_tokens([token for token in tokens if start <= _midpoint(token) < end])
+            else:
+                text = seg["text"] if start <= _midpoint(seg) < end else ""
+            if text:
+                parts.append(text)
+        texts.append(" ".join(parts))
+    return texts
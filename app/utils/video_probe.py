@@ -0,0 +1,152 @@
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+import httpx
+from app.config import settings
+from app.utils.logger import Logger
+
+logger = Logger("video_tasks")
+
+# 源站不支持 HEAD 时常见的状态码
+HEAD_UNSUPPORTED_STATUS = {405, 501}
+
+CONTENT_RANGE_PATTERN = re.compile(r"bytes\s+\d+-\d+/(\d+)")
+
+
+@dataclass(frozen=True)
+class ProbeResult:
+    """视频URL探测结果"""
+
+    content_length: int  # 文件大小（字节），未知时为0
+    content_type: str  # 小写的Content-Type
+
+
+class VideoProbe:
+    """视频URL探测服务
+
+    使用共享的连接池客户端和严格的连接/读取超时探测视频URL的大小和类型，
+    结果按URL缓存在带TTL的LRU缓存中。同一URL的并发探测只会发出一次请求。
+    源站不支持HEAD时退化为 Range: bytes=0-0 的GET请求。
+    """
+
+    def __init__(
+        self,
+        connect_timeout: float,
+        read_timeout: float,
+        cache_ttl: float,
+        cache_size: int,
+        max_connections: int,
+    ):
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        )
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._cache: "OrderedDict[str, Tuple[float, ProbeResult]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+        return self._client
+
+    def _cache_get(self, url: str) -> Optional[ProbeResult]:
+        item = self._cache.get(url)
+        if item is None:
+            return None
+        expires_at, result = item
+        if expires_at < time.monotonic():
+            del self._cache[url]
+            return None
+        self._cache.move_to_end(url)
+        return result
+
+    def _cache_put(self, url: str, result: ProbeResult) -> None:
+        self._cache[url] = (time.monotonic() + self.cache_ttl, result)
+        self._cache.move_to_end(url)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def probe(self, url: str) -> ProbeResult:
+        """探测视频URL的大小和类型
+
+        Args:
+            url (str): 视频URL
+
+        Returns:
+            ProbeResult: 探测结果
+
+        Raises:
+            httpx.RequestError: 请求失败或超时时抛出
+        """
+        cached = self._cache_get(url)
+        if cached is not None:
+            return cached
+
+        task = self._inflight.get(url)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(url))
+            self._inflight[url] = task
+            task.add_done_callback(lambda _: self._inflight.pop(url, None))
+        # shield 防止单个请求被取消时影响其他等待同一结果的请求
+        return await asyncio.shield(task)
+
+    async def _fetch(self, url: str) -> ProbeResult:
+        client = self._get_client()
+        response = await client.head(url)
+
+        if response.status_code in HEAD_UNSUPPORTED_STATUS or (
+            response.is_success and "content-length" not in response.headers
+        ):
+            logger.info("HEAD 请求不可用，改用 Range GET 探测", {
+                "video_url": url,
+                "status_code": response.status_code,
+            })
+            return await self._ranged_get(client, url)
+
+        result = ProbeResult(
+            content_length=int(response.headers.get("content-length", 0)),
+            content_type=response.headers.get("content-type", "").lower(),
+        )
+        if response.is_success:
+            self._cache_put(url, result)
+        return result
+
+    async def _ranged_get(self, client: httpx.AsyncClient, url: str) -> ProbeResult:
+        # 只请求第一个字节，不读取响应体，退出上下文时连接即被关闭
+        async with client.stream("GET", url, headers={"Range": "bytes=0-0"}) as response:
+            content_type = response.headers.get("content-type", "").lower()
+            content_length = 0
+            match = CONTENT_RANGE_PATTERN.search(response.headers.get("content-range", ""))
+            if match:
+                content_length = int(match.group(1))
+            elif response.status_code == 200:
+                # 源站忽略了 Range 头，content-length 即为完整文件大小
+                content_length = int(response.headers.get("content-length", 0))
+
+            result = ProbeResult(content_length=content_length, content_type=content_type)
+            if response.is_success:
+                self._cache_put(url, result)
+            return result
+
+    async def aclose(self) -> None:
+        """关闭连接池"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+video_probe = VideoProbe(
+    connect_timeout=settings.VIDEO_PROBE_CONNECT_TIMEOUT,
+    read_timeout=settings.VIDEO_PROBE_READ_TIMEOUT,
+    cache_ttl=settings.VIDEO_PROBE_CACHE_TTL,
+    cache_size=settings.VIDEO_PROBE_CACHE_SIZE,
+    max_connections=settings.VIDEO_PROBE_MAX_CONNECTIONS,
+)
@@ -19,5 +19,13 @@ async def audio_transcription():
         ]
     }
 
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    return {"status": "ready"}
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=5002)
\ No newline at end of file
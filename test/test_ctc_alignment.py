@@ -0,0 +1,155 @@
+"""CTC 强制对齐的等价性测试
+
+NumPy 实现的 ctc_forced_align 必须与原来逐帧用 torch 运算的实现给出相同的对齐结果，
+包括得分相同时的路径选择。原实现在补齐后的第 T 帧选择结束状态，比较时批次内的音频等长。
+
+在仓库根目录运行：python -m pytest test/test_ctc_alignment.py
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app", "services", "audio_transcription")
+)
+
+from utils.ctc_alignment import ctc_forced_align  # noqa: E402
+
+IGNORE_ID = -1
+
+
+def reference_ctc_forced_align(
+    log_probs: torch.Tensor,
+    targets: torch.Tensor,
+    input_lengths: torch.Tensor,
+    target_lengths: torch.Tensor,
+    blank: int = 0,
+    ignore_id: int = -1,
+) -> torch.Tensor:
+    """ctc_forced_align 原来逐帧用 torch 运算的实现"""
+    targets[targets == ignore_id] = blank
+
+    batch_size, input_time_size, _ = log_probs.size()
+    bsz_indices = torch.arange(batch_size, device=input_lengths.device)
+
+    _t_a_r_g_e_t_s_ = torch.cat(
+        (
+            torch.stack((torch.full_like(targets, blank), targets), dim=-1).flatten(start_dim=1),
+            torch.full_like(targets[:, :1], blank),
+        ),
+        dim=-1,
+    )
+    diff_labels = torch.cat(
+        (
+            torch.as_tensor([[False, False]], device=targets.device).expand(batch_size, -1),
+            _t_a_r_g_e_t_s_[:, 2:] != _t_a_r_g_e_t_s_[:, :-2],
+        ),
+        dim=1,
+    )
+
+    neg_inf = torch.tensor(float("-inf"), device=log_probs.device, dtype=log_probs.dtype)
+    padding_num = 2
+    padded_t = padding_num + _t_a_r_g_e_t_s_.size(-1)
+    best_score = torch.full((batch_size, padded_t), neg_inf, device=log_probs.device, dtype=log_probs.dtype)
+    best_score[:, padding_num + 0] = log_probs[:, 0, blank]
+    best_score[:, padding_num + 1] = log_probs[bsz_indices, 0, _t_a_r_g_e_t_s_[:, 1]]
+
+    backpointers = torch.zeros((batch_size, input_time_size, padded_t), device=log_probs.device, dtype=targets.dtype)
+
+    for t in range(1, input_time_size):
+        prev = torch.stack(
+            (best_score[:, 2:], best_score[:, 1:-1], torch.where(diff_labels, best_score[:, :-2], neg_inf))
+        )
+        prev_max_value, prev_max_idx = prev.max(dim=0)
+        best_score[:, padding_num:] = log_probs[:, t].gather(-1, _t_a_r_g_e_t_s_) + prev_max_value
+        backpointers[:, t, padding_num:] = prev_max_idx
+
+    l1l2 = best_score.gather(
+        -1, torch.stack((padding_num + target_lengths * 2 - 1, padding_num + target_lengths * 2), dim=-1)
+    )
+
+    path = torch.zeros((batch_size, input_time_size), device=best_score.device, dtype=torch.long)
+    path[bsz_indices, input_lengths - 1] = padding_num + target_lengths * 2 - 1 + l1l2.argmax(dim=-1)
+
+    for t in range(input_time_size - 1, 0, -1):
+        target_indices = path[:, t]
+        prev_max_idx = backpointers[bsz_indices, t, target_indices]
+        path[:, t - 1] += target_indices - prev_max_idx
+
+    alignments = _t_a_r_g_e_t_s_.gather(dim=-1, index=(path - padding_num).clamp(min=0))
+    return alignments
+
+
+def _random_case(rng: np.random.Generator, ties: bool):
+    """随机生成一个可对齐的批次：批次内音频等长，目标序列长度不同，不足的位置填 IGNORE_ID"""
+    batch_size = int(rng.integers(1, 4))
+    num_classes = int(rng.integers(2, 9))
+    num_frames = int(rng.integers(1, 40))
+    targets, target_lengths = [], []
+    for _ in range(batch_size):
+        length = int(rng.integers(1, num_frames + 1))
+        tokens = rng.integers(1, num_classes, size=length)
+        # 相邻重复的标签之间至少需要一个 blank，帧数不够时截短
+        while length + int(np.sum(tokens[1:] == tokens[:-1])) > num_frames:
+            tokens = tokens[:-1]
+            length -= 1
+        targets.append(tokens)
+        target_lengths.append(length)
+    max_length = max(target_lengths)
+    target_array = np.full((batch_size, max_length), IGNORE_ID, dtype=np.int64)
+    for i, tokens in enumerate(targets):
+        target_array[i, : len(tokens)] = tokens
+
+    scores = rng.standard_normal((batch_size, num_frames, num_classes))
+    if ties:
+        # 得分只取少数几个值，制造大量得分相同的路径
+        scores = np.round(scores * 2) / 2
+    log_probs = torch.from_numpy(scores).float().log_softmax(dim=-1)
+    return (
+        log_probs,
+        torch.from_numpy(target_array),
+        torch.full((batch_size,), num_frames, dtype=torch.long),
+        torch.tensor(target_lengths, dtype=torch.long),
+    )
+
+
+@pytest.mark.parametrize("ties", [False, True])
+def test_matches_reference_on_random_cases(ties):
+    rng = np.random.default_rng(20240 + int(ties))
+    for _ in range(1000):
+        log_probs, targets, input_lengths, target_lengths = _random_case(rng, ties)
+        # 原实现会原地修改 targets
+        expected = reference_ctc_forced_align(
+            log_probs, targets.clone(), input_lengths, target_lengths, ignore_id=IGNORE_ID
+        )
+        actual = ctc_forced_align(log_probs, targets, input_lengths, target_lengths, ignore_id=IGNORE_ID)
+        assert torch.equal(actual, expected)
+
+
+def test_frames_after_input_length_are_blank():
+    rng = np.random.default_rng(7)
+    log_probs = torch.from_numpy(rng.standard_normal((2, 12, 5))).float().log_softmax(dim=-1)
+    targets = torch.tensor([[1, 2, 3], [4, IGNORE_ID, IGNORE_ID]])
+    alignments = ctc_forced_align(
+        log_probs, targets, torch.tensor([12, 6]), torch.tensor([3, 1]), ignore_id=IGNORE_ID
+    )
+    assert alignments.shape == (2, 12)
+    assert torch.all(alignments[1, 6:] == 0)
+    # 单独对齐前 6 帧的结果与批次中相同
+    single = ctc_forced_align(
+        log_probs[1:, :6], targets[1:, :1], torch.tensor([6]), torch.tensor([1]), ignore_id=IGNORE_ID
+    )
+    assert torch.equal(alignments[1, :6], single[0])
+
+
+def test_empty_target_aligns_to_blank():
+    log_probs = torch.zeros((1, 5, 3)).log_softmax(dim=-1)
+    alignments = ctc_forced_align(
+        log_probs, torch.full((1, 1), IGNORE_ID), torch.tensor([5]), torch.tensor([0]), ignore_id=IGNORE_ID
+    )
+    assert torch.equal(alignments, torch.zeros((1, 5), dtype=torch.long))
@@ -0,0 +1,225 @@
+"""语音转写前端 fbank / LFR / CMVN 的等价性测试
+
+WavFrontend.fbank、fbank_online 以及向量化后的 WavFrontend.apply_lfr、
+WavFrontendOnline.apply_lfr 和 WavFrontend.apply_cmvn 必须与原来的逐帧循环实现逐位一致。原实现在输出为空时会因为 np.vstack 空列表而抛出异常，
+这些情况只检查新实现返回空结果。
+
+在仓库根目录运行：python -m pytest test/test_frontend.py
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+pytest.importorskip("kaldi_native_fbank")
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app", "services", "audio_transcription")
+)
+
+import kaldi_native_fbank as knf  # noqa: E402
+from utils.frontend import WavFrontend, WavFrontendOnline  # noqa: E402
+
+FEAT_DIM = 80
+LFR_SETTINGS = [(1, 1), (3, 1), (5, 3), (7, 6), (4, 2), (6, 4)]
+# 采样点数：空输入、不足一帧、恰好一帧（25ms）、多帧和不整除帧移的长度
+WAVEFORM_LENGTHS = [0, 100, 400, 560, 16000, 3 * 16000 + 123]
+
+
+def reference_fbank(opts, waveform: np.ndarray) -> np.ndarray:
+    """WavFrontend.fbank 的原实现"""
+    waveform = waveform * (1 << 15)
+    fbank_fn = knf.OnlineFbank(opts)
+    fbank_fn.accept_waveform(opts.frame_opts.samp_freq, waveform.tolist())
+    frames = fbank_fn.num_frames_ready
+    mat = np.empty([frames, opts.mel_opts.num_bins])
+    for i in range(frames):
+        mat[i, :] = fbank_fn.get_frame(i)
+    feat = mat.astype(np.float32)
+    return feat
+
+
+def reference_apply_lfr(inputs: np.ndarray, lfr_m: int, lfr_n: int) -> np.ndarray:
+    """WavFrontend.apply_lfr 的原实现"""
+    LFR_inputs = []
+
+    T = inputs.shape[0]
+    T_lfr = int(np.ceil(T / lfr_n))
+    left_padding = np.tile(inputs[0], ((lfr_m - 1) // 2, 1))
+    inputs = np.vstack((left_padding, inputs))
+    T = T + (lfr_m - 1) // 2
+    for i in range(T_lfr):
+        if lfr_m <= T - i * lfr_n:
+            LFR_inputs.append((inputs[i * lfr_n : i * lfr_n + lfr_m]).reshape(1, -1))
+        else:
+            # process last LFR frame
+            num_padding = lfr_m - (T - i * lfr_n)
+            frame = inputs[i * lfr_n :].reshape(-1)
+            for _ in range(num_padding):
+                frame = np.hstack((frame, inputs[-1]))
+
+            LFR_inputs.append(frame)
+    LFR_outputs = np.vstack(LFR_inputs).astype(np.float32)
+    return LFR_outputs
+
+
+def reference_apply_lfr_online(inputs: np.ndarray, lfr_m: int, lfr_n: int, is_final: bool = False):
+    """WavFrontendOnline.apply_lfr 的原实现"""
+    LFR_inputs = []
+    T = inputs.shape[0]  # include the right context
+    T_lfr = int(
+        np.ceil((T - (lfr_m - 1) // 2) / lfr_n)
+    )  # minus the right context: (lfr_m - 1) // 2
+    splice_idx = T_lfr
+    for i in range(T_lfr):
+        if lfr_m <= T - i * lfr_n:
+            LFR_inputs.append((inputs[i * lfr_n : i * lfr_n + lfr_m]).reshape(1, -1))
+        else:  # process last LFR frame
+            if is_final:
+                num_padding = lfr_m - (T - i * lfr_n)
+                frame = (inputs[i * lfr_n :]).reshape(-1)
+                for _ in range(num_padding):
+                    frame = np.hstack((frame, inputs[-1]))
+                LFR_inputs.append(frame)
+            else:
+                # update splice_idx and break the circle
+                splice_idx = i
+                break
+    splice_idx = min(T - 1, splice_idx * lfr_n)
+    lfr_splice_cache = inputs[splice_idx:, :]
+    LFR_outputs = np.vstack(LFR_inputs)
+    return LFR_outputs.astype(np.float32), lfr_splice_cache, splice_idx
+
+
+def reference_apply_cmvn(cmvn: np.ndarray, inputs: np.ndarray) -> np.ndarray:
+    """WavFrontend.apply_cmvn 的原实现"""
+    frame, dim = inputs.shape
+    means = np.tile(cmvn[0:1, :dim], (frame, 1))
+    vars = np.tile(cmvn[1:2, :dim], (frame, 1))
+    inputs = (inputs + means) * vars
+    return inputs
+
+
+def _frontend() -> WavFrontend:
+    # 关闭抖动，两种实现的输入完全相同
+    return WavFrontend(dither=0.0)
+
+
+def _waveform(num_samples: int, dtype, seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).uniform(-1, 1, num_samples).astype(dtype)
+
+
+def _lengths(lfr_m: int, lfr_n: int):
+    """边界长度：不足一个 LFR 窗口、恰好一个窗口、窗口加一帧，以及普通长度"""
+    return sorted({1, 2, max(1, lfr_m - 1), lfr_m, lfr_m + 1, lfr_m + lfr_n, 37, 100, 251})
+
+
+def _features(num_frames: int, seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((num_frames, FEAT_DIM)).astype(np.float32)
+
+
+def _assert_identical(actual: np.ndarray, expected: np.ndarray):
+    assert actual.dtype == expected.dtype
+    assert actual.shape == expected.shape
+    # 逐位比较，NaN 以外的浮点值不允许有任何误差
+    assert np.array_equal(actual.view(np.uint32), expected.view(np.uint32))
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_fbank_matches_loop(dtype):
+    frontend = _frontend()
+    for num_samples in WAVEFORM_LENGTHS:
+        waveform = _waveform(num_samples, dtype, seed=num_samples)
+        feat, feat_len = frontend.fbank(waveform)
+        expected = reference_fbank(frontend.opts, waveform)
+        _assert_identical(feat, expected)
+        assert feat_len == expected.shape[0]
+
+
+@pytest.mark.parametrize("beg_idx", [0, 3])
+def test_fbank_online_matches_loop(beg_idx):
+    frontend = _frontend()
+    frontend.fbank_beg_idx = beg_idx
+    reference_fn = knf.OnlineFbank(frontend.opts)
+    waveform = _waveform(3 * 16000 + 123, np.float32, seed=1)
+    # 不同大小的分块依次送入，每次返回从第 0 帧起的全部帧
+    for chunk in np.split(waveform, [100, 960, 9600, 9700, 30000]):
+        feat, feat_len = frontend.fbank_online(chunk)
+        # 原实现逐帧调用 get_frame 写入 float64 矩阵后再转为 float32
+        reference_fn.accept_waveform(frontend.opts.frame_opts.samp_freq, (chunk * (1 << 15)).tolist())
+        frames = reference_fn.num_frames_ready
+        # 原实现用 np.empty，beg_idx 之前的行是未初始化的内存，这里填 0 避免转换时溢出告警
+        expected = np.zeros([frames, frontend.opts.mel_opts.num_bins])
+        for i in range(beg_idx, frames):
+            expected[i, :] = reference_fn.get_frame(i)
+        expected = expected.astype(np.float32)
+        assert feat_len == frames
+        # beg_idx 之前的行未写入，不参与比较
+        _assert_identical(feat[beg_idx:], expected[beg_idx:])
+
+
+@pytest.mark.parametrize("lfr_m,lfr_n", LFR_SETTINGS)
+def test_apply_lfr_matches_loop(lfr_m, lfr_n):
+    for num_frames in _lengths(lfr_m, lfr_n):
+        inputs = _features(num_frames, seed=num_frames)
+        _assert_identical(
+            WavFrontend.apply_lfr(inputs, lfr_m, lfr_n), reference_apply_lfr(inputs, lfr_m, lfr_n)
+        )
+
+
+@pytest.mark.parametrize("lfr_m,lfr_n", LFR_SETTINGS)
+def test_apply_lfr_empty_input(lfr_m, lfr_n):
+    inputs = np.empty((0, FEAT_DIM), dtype=np.float32)
+    # 原实现取 inputs[0] 做左侧补齐，空输入时抛出 IndexError
+    with pytest.raises(IndexError):
+        reference_apply_lfr(inputs, lfr_m, lfr_n)
+    outputs = WavFrontend.apply_lfr(inputs, lfr_m, lfr_n)
+    assert outputs.shape == (0, lfr_m * FEAT_DIM)
+    assert outputs.dtype == np.float32
+
+
+@pytest.mark.parametrize("is_final", [False, True])
+@pytest.mark.parametrize("lfr_m,lfr_n", LFR_SETTINGS)
+def test_online_apply_lfr_matches_loop(lfr_m, lfr_n, is_final):
+    for num_frames in _lengths(lfr_m, lfr_n):
+        inputs = _features(num_frames, seed=num_frames)
+        outputs, cache, splice_idx = WavFrontendOnline.apply_lfr(inputs, lfr_m, lfr_n, is_final)
+        try:
+            expected, expected_cache, expected_idx = reference_apply_lfr_online(
+                inputs, lfr_m, lfr_n, is_final
+            )
+        except ValueError:
+            # 原实现没有可输出的 LFR 帧时抛出异常，拼接缓存从第 0 帧开始
+            assert outputs.shape == (0, lfr_m * FEAT_DIM)
+            assert splice_idx == 0
+            _assert_identical(cache, inputs)
+            continue
+        _assert_identical(outputs, expected)
+        _assert_identical(cache, expected_cache)
+        assert splice_idx == expected_idx
+
+
+@pytest.mark.parametrize("is_final", [False, True])
+def test_online_apply_lfr_empty_input(is_final):
+    inputs = np.empty((0, FEAT_DIM), dtype=np.float32)
+    outputs, cache, _ = WavFrontendOnline.apply_lfr(inputs, 7, 6, is_final)
+    assert outputs.shape == (0, 7 * FEAT_DIM)
+    assert cache.shape == (0, FEAT_DIM)
+
+
+@pytest.mark.parametrize("lfr_m,lfr_n", LFR_SETTINGS)
+def test_apply_cmvn_matches_tile(lfr_m, lfr_n):
+    frontend = WavFrontend(lfr_m=lfr_m, lfr_n=lfr_n)
+    rng = np.random.default_rng(lfr_m * 10 + lfr_n)
+    dim = lfr_m * FEAT_DIM
+    # load_cmvn 读出的均值和方差按 float64 保存
+    frontend.cmvn = rng.standard_normal((2, dim + 7))
+    for num_frames in [0, 1] + _lengths(lfr_m, lfr_n):
+        inputs = frontend.apply_lfr(_features(max(num_frames, 1), seed=num_frames), lfr_m, lfr_n)
+        inputs = inputs[:num_frames]
+        expected = reference_apply_cmvn(frontend.cmvn, inputs)
+        actual = frontend.apply_cmvn(inputs)
+        assert actual.dtype == expected.dtype
+        assert np.array_equal(actual, expected)